@@ -1,8 +1,11 @@
 import json
 import logging
+import functools
 from _decimal import Decimal
-from typing import Optional, Dict, List, Union
+from typing import Any, Optional, Dict, Iterator, List, Union, IO
 
+import pyarrow as pa
+import pyarrow.compute as pc
 from datasets import load_dataset, Dataset, DatasetDict
 
 import sqlglot
@@ -18,7 +21,31 @@ from sqlglot.errors import (
     OptimizeError,
 )
 
-from .helpers import DataGenerator, create_gist
+from .helpers import (
+    DataGenerator,
+    ExecutionLimitError,
+    SQLBackend,
+    SchemaCache,
+    create_gist,
+    get_backend,
+    group_table_sets,
+    dump_column_types,
+    dump_filler_data,
+    dump_tuning_format,
+    empty_fingerprint,
+    encode_error,
+    encode_result,
+    load_column_types,
+    load_filler_data,
+    load_tuning_format,
+    mine_literals,
+    prune_context,
+    storage_array,
+    write_jsonl_lines,
+    RESULT_FORMATS,
+    STORAGE_CODECS,
+    STORAGE_FORMATS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -42,11 +69,63 @@ class SQLData:
         }
     """
 
-    def __init__(self) -> None:
-        """Initializes the class"""
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        storage_format: str = "json",
+        backend: Union[str, SQLBackend] = "sqlglot",
+        schema_cache_size: int = 100000,
+        schema_cache_path: Optional[str] = None,
+        generation_method: str = "faker",
+        num_records: int = 5,
+        mine_literals: bool = False,
+        result_format: str = "string",
+        fingerprint_options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Initializes the class
+
+        :param seed: The seed used to generate reproducible filler data, defaults to None (i.e., unseeded)
+        :type seed: Optional[int], optional
+        :param storage_format: How the column_types, filler_data and tuning_format columns are stored, either "json" (JSON strings) or "native" (nested arrow columns), defaults to "json"
+        :type storage_format: str, optional
+        :param backend: The backend used to validate queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param schema_cache_size: The maximum number of parsed contexts to cache, defaults to 100000
+        :type schema_cache_size: int, optional
+        :param schema_cache_path: The path of a JSON file to persist parsed contexts to across runs, defaults to None (i.e., in memory only)
+        :type schema_cache_path: Optional[str], optional
+        :param generation_method: How filler data is generated, either "faker" or "bulk" (vectorised numpy generation from pre-sampled value pools), defaults to "faker"
+        :type generation_method: str, optional
+        :param num_records: The number of filler data records generated for each table, defaults to 5
+        :type num_records: int, optional
+        :param mine_literals: Whether to place the literals the answer query filters on within the filler data, so that the filters match rows, defaults to False
+        :type mine_literals: bool, optional
+        :param result_format: How query results are stored, either "string" (the formatted rows), "fingerprint" (a compact fingerprint of the canonical rows, compared in order for queries with an ORDER BY clause and as a multiset otherwise) or "both" (the formatted rows, and the fingerprint in the query_result_fingerprint column), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint query results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        """
+
+        if storage_format not in STORAGE_FORMATS:
+            raise ValueError(
+                f"The storage format {storage_format} is not supported. Supported storage formats: {STORAGE_FORMATS}"
+            )
+
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(
+                f"The result format {result_format} is not supported. Supported result formats: {RESULT_FORMATS}"
+            )
 
         self.data = {}
-        self.data_generator = DataGenerator()
+        self.storage_format = storage_format
+        self.result_format = result_format
+        self.fingerprint_options = fingerprint_options
+        self.mine_literals = mine_literals
+        self.backend = get_backend(backend)
+        self.schema_cache = SchemaCache(maxsize=schema_cache_size, path=schema_cache_path)
+        self.data_generator = DataGenerator(
+            seed=seed, method=generation_method, num_records=num_records
+        )
         self.uploaded_gists = {}
 
     def __repr__(self):
@@ -224,17 +303,17 @@ class SQLData:
         return {"table_count": count}
 
     @staticmethod
-    def _abstract_column_types(dataset) -> Dict[str, Dict[str, str]]:
-        """Abstracts the column types for every CREATE table statement from the context of a datum
+    def _parse_column_types(context: str) -> Dict[str, Dict[str, str]]:
+        """Parses the column types for every CREATE table statement within a context
 
-        :param dataset: The dataset to abstract the column types for every CREATE table statement from the context of a datum
-        :type dataset: datasets.Dataset
-        :return: A dictionary containing the column types for every CREATE table statement from the context of a datum
-        :rtype: dict {"column_types": {"table_name": {"column_name": "column_type"}}
+        :param context: The context to parse
+        :type context: str
+        :return: A dictionary containing the column types for every CREATE table statement within the context
+        :rtype: dict {"table_name": {"column_name": "column_type"}}
         """
 
         try:
-            atls = sqlglot.parse(dataset["context"])
+            atls = sqlglot.parse(context)
         except Exception as e:
             logger.error(f"An error occured while trying to parse the context: {e}")
             raise
@@ -250,7 +329,34 @@ class SQLData:
                 column_types[column_name] = column_type
             tables[table_name] = column_types
 
-        return {"column_types": json.dumps(tables)}
+        return tables
+
+    @staticmethod
+    def _abstract_column_types(
+        dataset,
+        storage_format: str = "json",
+        schema_cache: Optional[SchemaCache] = None,
+    ) -> Dict[str, Dict[str, str]]:
+        """Abstracts the column types for every CREATE table statement from the context of a datum
+
+        :param dataset: The dataset to abstract the column types for every CREATE table statement from the context of a datum
+        :type dataset: datasets.Dataset
+        :param storage_format: The storage format of the column types, either "json" or "native", defaults to "json"
+        :type storage_format: str, optional
+        :param schema_cache: The cache of previously parsed contexts, defaults to None (i.e., every context is parsed)
+        :type schema_cache: Optional[SchemaCache], optional
+        :return: A dictionary containing the column types for every CREATE table statement from the context of a datum
+        :rtype: dict {"column_types": {"table_name": {"column_name": "column_type"}}
+        """
+
+        if schema_cache is None:
+            tables = SQLData._parse_column_types(dataset["context"])
+        else:
+            tables = schema_cache.get_or_parse(
+                dataset["context"], SQLData._parse_column_types
+            )
+
+        return {"column_types": dump_column_types(tables, storage_format)}
 
     @staticmethod
     def _identify_duplicate_create_table(dataset) -> Dict[str, bool]:
@@ -275,7 +381,7 @@ class SQLData:
             raise
 
         try:
-            table_count = len(json.loads(dataset["column_types"]).keys())
+            table_count = len(load_column_types(dataset["column_types"]).keys())
         except KeyError:
             logger.warning(
                 "The key 'column_types' does not exist in the dataset. Preprocess the dataset with the function _abstract_column_types(dataset) to create the key 'column_types'."
@@ -303,7 +409,7 @@ class SQLData:
         """
 
         try:
-            column_types = json.loads(dataset["column_types"])
+            column_types = load_column_types(dataset["column_types"])
         except KeyError:
             logger.warning(
                 "The key 'column_types' does not exist in the dataset. Preprocess the dataset with the function _abstract_column_types(dataset) to create the key 'column_types'."
@@ -314,24 +420,42 @@ class SQLData:
             logger.error(f"An error occured while trying to load the column types: {e}")
             raise
 
+        literals = None
+        if self.mine_literals and "answer" in dataset:
+            literals = mine_literals(dataset["answer"])
+
+        self.data_generator.seed_record(json.dumps(column_types))
+
         return {
-            "filler_data": json.dumps(
-                self.data_generator.generate_filler_data(column_types)
+            "filler_data": dump_filler_data(
+                self.data_generator.generate_filler_data(column_types, literals=literals),
+                self.storage_format,
             )
         }
 
     @staticmethod
-    def validate_query(dataset) -> Dict[str, Union[str, bool]]:
+    def validate_query(
+        dataset,
+        backend: Union[str, SQLBackend] = "sqlglot",
+        result_format: str = "string",
+        fingerprint_options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Union[str, bool]]:
         """Validates the query against the provided filler data and returns the query result
 
         :param dataset: The dataset to validate the query against the provided filler data and returns the query result
         :type dataset: datasets.Dataset
+        :param backend: The backend used to execute the query, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query result is stored, either "string", "fingerprint" or "both", see encode_result(), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint(), see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
         :return: A dictionary containing the query result and whether or not the query is valid
         :rtype: dict {"query_result": str, "valid_query": bool}
         """
 
         try:
-            tables = json.loads(dataset["filler_data"])
+            tables = load_filler_data(dataset["filler_data"])
         except KeyError:
             logger.warning(
                 "The key 'filler_data' does not exist in the dataset. Preprocess the dataset with the function _populate_data(dataset) to create the key 'filler_data'."
@@ -349,32 +473,83 @@ class SQLData:
             raise
 
         try:
-            result = execute(query, tables=tables)
-            result = str(result.rows) if result.rows is not None else ""
-            return {"query_result": result, "valid_query": True}
-        except ExecuteError as e:
-            return {"query_result": "ExecuteError", "valid_query": False}
-        except OptimizeError as e:
-            return {"query_result": "OptimizeError", "valid_query": False}
-        except TokenError as e:
-            return {"query_result": "TokenError", "valid_query": False}
-        except SchemaError as e:
-            return {"query_result": "SchemaError", "valid_query": False}
-        except ParseError as e:
-            return {"query_result": "ParseError", "valid_query": False}
-        except UnsupportedError as e:
-            return {"query_result": "UnsupportedError", "valid_query": False}
-        except SqlglotError as e:
-            return {"query_result": "SqlglotError", "valid_query": False}
+            session = get_backend(backend).connect(tables)
         except Exception as e:
-            return {"query_result": str(e), "valid_query": False}
+            return SQLData._invalid_query_result(e, result_format)
+
+        with session:
+            return SQLData._session_query_result(session, query, result_format, fingerprint_options)
+
+    @staticmethod
+    def _session_query_result(
+        session,
+        query: str,
+        result_format: str = "string",
+        fingerprint_options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Union[str, bool]]:
+        """Executes a query within a session of a backend and returns the query result
+
+        :param session: The session holding the tables to execute the query against
+        :type session: SQLSession
+        :param query: The query to execute
+        :type query: str
+        :param result_format: How the query result is stored, either "string", "fingerprint" or "both", defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint(), see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :return: A dictionary containing the query result and whether or not the query is valid
+        :rtype: dict {"query_result": str, "valid_query": bool}
+        """
+
+        try:
+            rows = session.execute(query)
+        except Exception as e:
+            return SQLData._invalid_query_result(e, result_format)
+
+        return {
+            **encode_result(rows, "query_result", result_format, session.backend.format_result, query, fingerprint_options),
+            "valid_query": True,
+        }
+
+    @staticmethod
+    def _invalid_query_result(
+        error: Exception, result_format: str = "string"
+    ) -> Dict[str, Union[str, bool]]:
+        """Returns the query result of a query that raised an error, the status of an exceeded execution limit ("Timeout" or "ResourceLimit"), naming the sqlglot error class or otherwise the error message
+
+        :param error: The error raised by the query
+        :type error: Exception
+        :param result_format: How the query result is stored, either "string", "fingerprint" or "both", defaults to "string"
+        :type result_format: str, optional
+        :return: A dictionary containing the query result and whether or not the query is valid
+        :rtype: dict {"query_result": str, "valid_query": bool}
+        """
+
+        if isinstance(error, ExecutionLimitError):
+            return {**encode_error(error.status, "query_result", result_format), "valid_query": False}
+
+        for error_type in (
+            ExecuteError,
+            OptimizeError,
+            TokenError,
+            SchemaError,
+            ParseError,
+            UnsupportedError,
+            SqlglotError,
+        ):
+            if isinstance(error, error_type):
+                return {**encode_error(error_type.__name__, "query_result", result_format), "valid_query": False}
+
+        return {**encode_error(str(error), "query_result", result_format), "valid_query": False}
     
     @staticmethod
-    def format_tuning_data(dataset) -> Dict[str, Dict[str, str]]:
+    def format_tuning_data(dataset, storage_format: str = "json") -> Dict[str, Dict[str, str]]:
         """Formats the data to be used for tuning by converting the context, prompt, and answer to {"prompt": "context: <context>, question: <question>", "completion": <answer>}
 
         :param dataset: The dataset to format
         :type dataset: datasets.Dataset
+        :param storage_format: The storage format of the formatted data, either "json" or "native", defaults to "json"
+        :type storage_format: str, optional
         :return: A dictionary containing the formatted data
         :rtype: dict {"tuning_format": str}
         """
@@ -384,7 +559,410 @@ class SQLData:
             "completion": dataset['answer']
         } # TODO: occassionally, a json character (\) will be added around quotation marks, which may impact the data quality. we should determine if this is resolved by the time we are ready to use this data for tuning
 
-        return {"tuning_format": json.dumps(formatted_data)}
+        return {"tuning_format": dump_tuning_format(formatted_data, storage_format)}
+
+    #################################
+    # Batched Transform Functions   #
+    #################################
+
+    @staticmethod
+    def _column_values(column) -> List:
+        """Converts a column of a batch to a list of python values
+
+        :param column: The column to convert, either a list or a pyarrow array
+        :type column: Union[list, pyarrow.Array, pyarrow.ChunkedArray]
+        :return: The values of the column
+        :rtype: list
+        """
+
+        if isinstance(column, (pa.Array, pa.ChunkedArray)):
+            return column.to_pylist()
+        return list(column)
+
+    @staticmethod
+    def _map_unique(column, function, column_name: Optional[str] = None) -> pa.Array:
+        """Applies a row level function to every distinct value of a column once, scattering the outputs back to the rows with pyarrow.compute.take, e.g. to parse each context of a batch once however many rows share it
+
+        :param column: The column to apply the function to, either a list or a pyarrow array
+        :type column: Union[list, pyarrow.Array, pyarrow.ChunkedArray]
+        :param function: The function applied to each distinct value, nulls included
+        :type function: function
+        :param column_name: The name of the output column, converted to its native type if it is stored natively, see storage_array(), defaults to None
+        :type column_name: Optional[str], optional
+        :return: The output of the function for every row
+        :rtype: pyarrow.Array
+        """
+
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+        elif not isinstance(column, pa.Array):
+            column = pa.array(column)
+
+        encoded = pc.dictionary_encode(column, null_encoding="encode")
+        outputs = storage_array(column_name, [function(value) for value in encoded.dictionary.to_pylist()])
+
+        return pc.take(outputs, encoded.indices)
+
+    @staticmethod
+    def _batch_rows(batch, columns: List[str]) -> List[Dict]:
+        """Converts the given columns of a batch into a list of rows, so that the row transformation functions can be applied to a batch
+
+        :param batch: The batch to convert
+        :type batch: Union[dict, pyarrow.Table]
+        :param columns: The columns to include in each row
+        :type columns: List[str]
+        :return: A list of rows containing the given columns
+        :rtype: List[dict]
+        """
+
+        values = [SQLData._column_values(batch[column]) for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    @staticmethod
+    def _batch_columns(rows: List[Dict], columns: List[str]) -> Dict[str, List]:
+        """Converts a list of row transformation outputs back into columns
+
+        :param rows: The outputs of a row transformation function
+        :type rows: List[dict]
+        :param columns: The columns contained within each output
+        :type columns: List[str]
+        :return: A dictionary containing a list of values for each column
+        :rtype: dict {"column_name": list}
+        """
+
+        return {column: [row[column] for row in rows] for column in columns}
+
+    @staticmethod
+    def _blanket_answer_syntax_batch(batch) -> Dict[str, pa.Array]:
+        """Batched version of _blanket_answer_syntax(dataset), replaces double quotes with single quotes in the answer column as a vectorised string operation
+
+        :param batch: The batch to replace double quotes with single quotes in the answer column
+        :type batch: Union[dict, pyarrow.Table]
+        :return: A dictionary containing the answers with double quotes replaced with single quotes
+        :rtype: dict {"answer": pyarrow.Array}
+        """
+
+        try:
+            answer = pc.replace_substring(batch["answer"], pattern='"', replacement="'")
+        except Exception as e:
+            logger.error(f"An error occured while trying to load the answer: {e}")
+            raise
+
+        return {"answer": answer}
+
+    @staticmethod
+    def _compute_table_count_batch(batch) -> Dict[str, pa.Array]:
+        """Batched version of _compute_table_count(dataset), counts the statements within the context column as a vectorised string operation
+
+        :param batch: The batch to compute the number of tables created within the context of each datum
+        :type batch: Union[dict, pyarrow.Table]
+        :return: A dictionary containing the number of tables created within the context of each datum
+        :rtype: dict {"table_count": pyarrow.Array}
+        """
+
+        try:
+            count = pc.add(pc.count_substring(batch["context"], pattern=";"), 1)
+        except Exception as e:
+            logger.error(
+                f"An error occured while trying to compute the table count: {e}"
+            )
+            raise
+
+        return {"table_count": count.cast(pa.int64())}
+
+    @staticmethod
+    def _abstract_column_types_batch(
+        batch,
+        storage_format: str = "json",
+        schema_cache: Optional[SchemaCache] = None,
+    ) -> Dict[str, pa.Array]:
+        """Batched version of _abstract_column_types(dataset), parsing each distinct context of the batch once
+
+        :param batch: The batch to abstract the column types for every CREATE table statement from the context of each datum
+        :type batch: Union[dict, pyarrow.Table]
+        :param storage_format: The storage format of the column types, either "json" or "native", defaults to "json"
+        :type storage_format: str, optional
+        :param schema_cache: The cache of previously parsed contexts, defaults to None (i.e., every context is parsed)
+        :type schema_cache: Optional[SchemaCache], optional
+        :return: A dictionary containing the column types for every CREATE table statement from the context of each datum
+        :rtype: dict {"column_types": pyarrow.Array}
+        """
+
+        column_types = SQLData._map_unique(
+            batch["context"],
+            lambda context: SQLData._abstract_column_types({"context": context}, storage_format, schema_cache)["column_types"],
+            "column_types",
+        )
+
+        return {"column_types": column_types}
+
+    @staticmethod
+    def _identify_duplicate_create_table_batch(batch) -> Dict[str, pa.Array]:
+        """Batched version of _identify_duplicate_create_table(dataset), comparing the statement and table counts as a vectorised operation
+
+        Natively stored column types are counted as list lengths, while JSON column types are decoded once per distinct value.
+
+        :param batch: The batch to identify whether or not a CREATE table statement is duplicated within the context of each datum
+        :type batch: Union[dict, pyarrow.Table]
+        :return: A dictionary containing whether or not a CREATE table statement is duplicated within the context of each datum
+        :rtype: dict {"duplicate_create_table": pyarrow.Array}
+        """
+
+        create_count = batch["table_count"]
+        column_types = batch["column_types"]
+
+        if not isinstance(create_count, (pa.Array, pa.ChunkedArray)):
+            create_count = pa.array(create_count)
+
+        if isinstance(column_types, (pa.Array, pa.ChunkedArray)) and pa.types.is_list(column_types.type):
+            table_count = pc.list_value_length(column_types)
+        else:
+            table_count = SQLData._map_unique(column_types, lambda value: len(load_column_types(value)))
+
+        return {"duplicate_create_table": pc.not_equal(pc.cast(create_count, pa.int64()), pc.cast(table_count, pa.int64()))}
+
+    def _populate_data_batch(self, batch) -> Dict[str, List[str]]:
+        """Batched version of _populate_data(dataset)
+
+        :param batch: The batch to create randomly generated data for, based upon the column types of each datum
+        :type batch: Union[dict, pyarrow.Table]
+        :return: A dictionary containing randomly generated data for each datum
+        :rtype: dict {"filler_data": List[str]}
+        """
+
+        columns = ["column_types"]
+        if self.mine_literals and "answer" in (
+            batch.column_names if isinstance(batch, pa.Table) else batch
+        ):
+            columns.append("answer")
+
+        rows = SQLData._batch_rows(batch, columns)
+        return SQLData._batch_columns(
+            [self._populate_data(row) for row in rows], ["filler_data"]
+        )
+
+    @staticmethod
+    def validate_query_batch(
+        batch,
+        backend: Union[str, SQLBackend] = "sqlglot",
+        result_format: str = "string",
+        fingerprint_options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, List[Union[str, bool]]]:
+        """Batched version of validate_query(dataset)
+
+        :param batch: The batch to validate the queries of against the provided filler data
+        :type batch: Union[dict, pyarrow.Table]
+        :param backend: The backend used to execute the queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query results are stored, either "string", "fingerprint" or "both", defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint(), see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :return: A dictionary containing the query results and whether or not each query is valid
+        :rtype: dict {"query_result": List[str], "valid_query": List[bool]}
+        """
+
+        rows = SQLData._batch_rows(batch, ["filler_data", "answer"])
+        backend = get_backend(backend)
+        results = [None] * len(rows)
+
+        # Rows sharing filler data share their tables, which are materialised once per group
+        for group in group_table_sets([row["filler_data"] for row in rows]):
+            try:
+                session = backend.connect(load_filler_data(rows[group[0]]["filler_data"]))
+            except Exception as e:
+                for index in group:
+                    results[index] = SQLData._invalid_query_result(e, result_format)
+                continue
+
+            with session:
+                for index in group:
+                    results[index] = SQLData._session_query_result(
+                        session, rows[index]["answer"], result_format, fingerprint_options
+                    )
+
+        columns = ["query_result", "valid_query"]
+        if result_format == "both":
+            columns.append("query_result_fingerprint")
+
+        return SQLData._batch_columns(results, columns)
+
+    @staticmethod
+    def format_tuning_data_batch(batch, storage_format: str = "json") -> Dict[str, List[str]]:
+        """Batched version of format_tuning_data(dataset)
+
+        :param batch: The batch to format
+        :type batch: Union[dict, pyarrow.Table]
+        :param storage_format: The storage format of the formatted data, either "json" or "native", defaults to "json"
+        :type storage_format: str, optional
+        :return: A dictionary containing the formatted data
+        :rtype: dict {"tuning_format": List[str]}
+        """
+
+        rows = SQLData._batch_rows(batch, ["context", "question", "answer"])
+        return SQLData._batch_columns(
+            [SQLData.format_tuning_data(row, storage_format) for row in rows],
+            ["tuning_format"],
+        )
+
+    @staticmethod
+    def _fused_batch_transform(batch: pa.Table, transforms) -> pa.Table:
+        """Applies a sequence of batched transformation functions to a batch in a single pass, passing the output of each function to the functions that follow it
+
+        :param batch: The batch to apply the transformation functions to, as provided by a dataset formatted as "arrow"
+        :type batch: pyarrow.Table
+        :param transforms: The batched transformation functions to apply, in order, e.g. [SQLData._compute_table_count_batch, SQLData._abstract_column_types_batch]
+        :type transforms: list
+        :return: The batch with the output of every transformation function added or replaced
+        :rtype: pyarrow.Table
+        """
+
+        columns = {name: batch[name] for name in batch.column_names}
+
+        for transform in transforms:
+            columns.update(transform(columns))
+
+        return pa.table(
+            {
+                name: column
+                if isinstance(column, (pa.Array, pa.ChunkedArray))
+                else storage_array(name, column)
+                for name, column in columns.items()
+            }
+        )
+
+    def _merge_schema_cache(
+        self, dataset: Union[Dataset, DatasetDict], batch_size: int = 1000
+    ) -> None:
+        """Merges the contexts parsed by the processes of a parallel map into the class schema cache, from the context and column_types columns of the processed dataset, as each process only fills its own copy of the cache
+
+        :param dataset: The processed dataset
+        :type dataset: Union[datasets.Dataset, datasets.DatasetDict]
+        :param batch_size: The number of rows read at once, defaults to 1000
+        :type batch_size: int, optional
+        """
+
+        splits = dataset.values() if isinstance(dataset, DatasetDict) else [dataset]
+        added = 0
+
+        for split in splits:
+            columns = split.select_columns(["context", "column_types"])
+            for batch in columns.iter(batch_size=batch_size):
+                added += self.schema_cache.merge(
+                    batch["context"], (load_column_types(value) for value in batch["column_types"])
+                )
+
+        logger.info(f"Merged {added} contexts parsed by the worker processes into the schema cache.")
+
+    @staticmethod
+    def _map_batched(
+        dataset: Union[Dataset, DatasetDict],
+        transforms,
+        batch_size: int = 1000,
+        num_proc: Optional[int] = None,
+    ) -> Union[Dataset, DatasetDict]:
+        """Maps a sequence of batched transformation functions over a dataset formatted as "arrow", so that vectorised functions operate on the pyarrow columns directly
+
+        :param dataset: The dataset to map the transformation functions over
+        :type dataset: Union[datasets.Dataset, datasets.DatasetDict]
+        :param transforms: The batched transformation functions to apply, in order
+        :type transforms: list
+        :param batch_size: The number of rows provided to the transformation functions at once, defaults to 1000
+        :type batch_size: int, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
+        :return: The transformed dataset
+        :rtype: Union[datasets.Dataset, datasets.DatasetDict]
+        """
+
+        dataset = dataset.with_format("arrow").map(
+            SQLData._fused_batch_transform,
+            batched=True,
+            batch_size=batch_size,
+            num_proc=num_proc,
+            fn_kwargs={"transforms": transforms},
+        )
+        return dataset.with_format(None)
+
+    @staticmethod
+    def _filter_batched(
+        dataset: Union[Dataset, DatasetDict],
+        mask,
+        batch_size: int = 1000,
+        num_proc: Optional[int] = None,
+    ) -> Union[Dataset, DatasetDict]:
+        """Filters a dataset formatted as "arrow" with a batched mask function, so that the mask is computed on the pyarrow columns directly
+
+        :param dataset: The dataset to filter
+        :type dataset: Union[datasets.Dataset, datasets.DatasetDict]
+        :param mask: The function returning a boolean array of the rows to keep for a batch
+        :type mask: function
+        :param batch_size: The number of rows provided to the mask function at once, defaults to 1000
+        :type batch_size: int, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
+        :return: The filtered dataset
+        :rtype: Union[datasets.Dataset, datasets.DatasetDict]
+        """
+
+        dataset = dataset.with_format("arrow").filter(
+            mask, batched=True, batch_size=batch_size, num_proc=num_proc
+        )
+        return dataset.with_format(None)
+
+    @staticmethod
+    def _valid_query_mask(batch) -> pa.Array:
+        """Identifies the rows of a batch containing a valid query"""
+
+        return pc.fill_null(pc.equal(batch["valid_query"], True), False)
+
+    @staticmethod
+    def _unique_create_table_mask(batch) -> pa.Array:
+        """Identifies the rows of a batch without a duplicated CREATE table statement"""
+
+        return pc.fill_null(pc.equal(batch["duplicate_create_table"], False), False)
+
+    @staticmethod
+    def _non_empty_query_result_mask(batch, bits: int = 64) -> pa.Array:
+        """Identifies the rows of a batch with a query result that is not empty, stored either as a string or as a fingerprint of the given size"""
+
+        return pc.fill_null(
+            pc.invert(pc.is_in(batch["query_result"], pa.array(["[]", empty_fingerprint(bits)]))), True
+        )
+
+    @staticmethod
+    def _bind_options(transform, **options):
+        """Binds options, such as the class storage format, to a transformation function, keeping the name of the function for logging
+
+        :param transform: The transformation function accepting the options as keyword arguments
+        :type transform: function
+        :return: The transformation function with the options applied
+        :rtype: functools.partial
+        """
+
+        return functools.update_wrapper(functools.partial(transform, **options), transform)
+
+    @staticmethod
+    def _fused_transform(dataset, transforms) -> Dict[str, Union[str, int, bool]]:
+        """Applies a sequence of transformation functions to a datum in a single pass, passing the output of each function to the functions that follow it
+
+        :param dataset: The dataset to apply the transformation functions to
+        :type dataset: datasets.Dataset
+        :param transforms: The transformation functions to apply, in order, e.g. [SQLData._compute_table_count, SQLData._abstract_column_types]
+        :type transforms: list
+        :return: A dictionary containing the combined output of every transformation function
+        :rtype: dict
+        """
+
+        datum = dict(dataset)
+        outputs = {}
+
+        for transform in transforms:
+            output = transform(datum)
+            datum.update(output)
+            outputs.update(output)
+
+        return outputs
 
     def preprocess_data(
         self,
@@ -396,6 +974,10 @@ class SQLData:
         populate_data: bool = True,
         validate_query: bool = True,
         update_class_dataset: bool = True,
+        fused: bool = False,
+        batched: bool = True,
+        batch_size: int = 1000,
+        num_proc: Optional[int] = None,
     ) -> Optional[Union[DatasetDict, None]]:
         """Preprocesses the data by applying the following functions to the dataset:
             - _blanket_answer_syntax(dataset): applies broad syntax corrections common to the dataset
@@ -421,6 +1003,14 @@ class SQLData:
         :type validate_query: bool, optional
         :param update_class_dataset: Whether or not to update the class instance self.data = {"dataset_name": dataset}, defaults to True
         :type update_class_dataset: bool, optional
+        :param fused: Whether or not to apply the enabled functions in a single pass over the dataset, passing intermediate values between them in memory rather than writing the dataset once per function, defaults to False
+        :type fused: bool, optional
+        :param batched: Whether or not to apply the batched versions of the functions, which operate on columns of the dataset rather than individual rows, defaults to True
+        :type batched: bool, optional
+        :param batch_size: The number of rows provided to the batched functions at once, defaults to 1000
+        :type batch_size: int, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
         """
 
         if dataset_name not in self.data.keys():
@@ -431,41 +1021,84 @@ class SQLData:
 
         dataset = self.data[dataset_name]
 
+        if self.storage_format == "native" and not batched:
+            raise ValueError(
+                "The native storage format requires the batched functions, which provide the arrow types of the native columns. Set batched=True."
+            )
+
+        transforms = []
+
         if blanket_answer_syntax:
-            logger.info(
-                f"Preprocessing the dataset with the function _blanket_answer_syntax(dataset)."
+            transforms.append(
+                SQLData._blanket_answer_syntax_batch if batched else SQLData._blanket_answer_syntax
             )
-            dataset = dataset.map(SQLData._blanket_answer_syntax)
 
         if compute_table_count:
-            logger.info(
-                f"Preprocessing the dataset with the function _compute_table_count(dataset)."
+            transforms.append(
+                SQLData._compute_table_count_batch if batched else SQLData._compute_table_count
             )
-            dataset = dataset.map(SQLData._compute_table_count)
 
         if abstract_column_types:
-            logger.info(
-                f"Preprocessing the dataset with the function _abstract_column_types(dataset)."
+            transforms.append(
+                self._bind_options(
+                    SQLData._abstract_column_types_batch if batched else SQLData._abstract_column_types,
+                    storage_format=self.storage_format,
+                    schema_cache=self.schema_cache,
+                )
             )
-            dataset = dataset.map(SQLData._abstract_column_types)
 
         if identify_duplicate_create_table:
-            logger.info(
-                f"Preprocessing the dataset with the function _identify_duplicate_create_table(dataset)."
+            transforms.append(
+                SQLData._identify_duplicate_create_table_batch if batched else SQLData._identify_duplicate_create_table
             )
-            dataset = dataset.map(SQLData._identify_duplicate_create_table)
 
         if populate_data:
-            logger.info(
-                f"Preprocessing the dataset with the function _populate_data(self, dataset)."
+            transforms.append(
+                self._populate_data_batch if batched else self._populate_data
             )
-            dataset = dataset.map(self._populate_data)
 
         if validate_query:
+            transforms.append(
+                self._bind_options(
+                    SQLData.validate_query_batch if batched else SQLData.validate_query,
+                    backend=self.backend,
+                    result_format=self.result_format,
+                    fingerprint_options=self.fingerprint_options,
+                )
+            )
+
+        if fused:
             logger.info(
-                f"Preprocessing the dataset with the function validate_query(dataset)."
+                f"Preprocessing the dataset in a single pass with the functions: {', '.join(transform.__name__ for transform in transforms)}."
             )
-            dataset = dataset.map(SQLData.validate_query)
+            if batched:
+                dataset = SQLData._map_batched(
+                    dataset, transforms, batch_size=batch_size, num_proc=num_proc
+                )
+            else:
+                dataset = dataset.map(
+                    SQLData._fused_transform,
+                    num_proc=num_proc,
+                    fn_kwargs={"transforms": transforms},
+                )
+        else:
+            for transform in transforms:
+                logger.info(
+                    f"Preprocessing the dataset with the function {transform.__name__}(dataset)."
+                )
+                if batched:
+                    dataset = SQLData._map_batched(
+                        dataset, [transform], batch_size=batch_size, num_proc=num_proc
+                    )
+                else:
+                    dataset = dataset.map(transform, num_proc=num_proc)
+
+        if abstract_column_types:
+            if num_proc is not None and num_proc > 1:
+                self._merge_schema_cache(dataset)
+            logger.info(f"Schema cache statistics: {self.schema_cache.stats()}")
+            if self.schema_cache.path is not None:
+                self.schema_cache.save()
 
         if update_class_dataset:
             self.data[dataset_name] = dataset
@@ -480,6 +1113,9 @@ class SQLData:
         drop_duplicate_tables: bool = True,
         drop_empty_query_result: bool = False,
         update_class_dataset: bool = True,
+        batched: bool = True,
+        batch_size: int = 1000,
+        num_proc: Optional[int] = None,
     ) -> Optional[Union[DatasetDict, None]]:
         """Filters the data by applying the following functions to the dataset:
             - drop_invalid_query: filters out invalid queries where the query type is not supported by the CREATE context
@@ -496,6 +1132,12 @@ class SQLData:
         :type drop_empty_query_result: bool, optional
         :param update_class_dataset: Whether or not to update the class instance self.data = {"dataset_name": dataset}, defaults to True
         :type update_class_dataset: bool, optional
+        :param batched: Whether or not to evaluate the filters on columns of the dataset rather than individual rows, defaults to True
+        :type batched: bool, optional
+        :param batch_size: The number of rows evaluated by the filters at once, defaults to 1000
+        :type batch_size: int, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
         """
 
         if dataset_name not in self.data.keys():
@@ -508,7 +1150,15 @@ class SQLData:
 
         if drop_invalid_query:
             try:
-                dataset = dataset.filter(lambda x: x["valid_query"] == True)
+                if batched:
+                    dataset = SQLData._filter_batched(
+                        dataset,
+                        SQLData._valid_query_mask,
+                        batch_size=batch_size,
+                        num_proc=num_proc,
+                    )
+                else:
+                    dataset = dataset.filter(lambda x: x["valid_query"] == True, num_proc=num_proc)
             except KeyError:
                 logger.warning(
                     "The key 'valid_query' does not exist in the dataset. Preprocess the dataset with the function validate_query(dataset) to create the key 'valid_query'."
@@ -524,7 +1174,15 @@ class SQLData:
 
         if drop_duplicate_tables:
             try:
-                dataset = dataset.filter(lambda x: x["duplicate_create_table"] == False)
+                if batched:
+                    dataset = SQLData._filter_batched(
+                        dataset,
+                        SQLData._unique_create_table_mask,
+                        batch_size=batch_size,
+                        num_proc=num_proc,
+                    )
+                else:
+                    dataset = dataset.filter(lambda x: x["duplicate_create_table"] == False, num_proc=num_proc)
             except KeyError:
                 logger.warning(
                     "The key 'duplicate_create_table' does not exist in the dataset. Preprocess the dataset with the function _identify_duplicate_create_table(dataset) to create the key 'duplicate_create_table'."
@@ -539,8 +1197,21 @@ class SQLData:
                 raise
 
         if drop_empty_query_result:
+            # Empty results are fingerprinted with the size the class fingerprints results with
+            bits = (self.fingerprint_options or {}).get("bits", 64)
             try:
-                dataset = dataset.filter(lambda x: x["query_result"] != "[]")
+                if batched:
+                    dataset = SQLData._filter_batched(
+                        dataset,
+                        SQLData._bind_options(SQLData._non_empty_query_result_mask, bits=bits),
+                        batch_size=batch_size,
+                        num_proc=num_proc,
+                    )
+                else:
+                    empty_results = ("[]", empty_fingerprint(bits))
+                    dataset = dataset.filter(
+                        lambda x: x["query_result"] not in empty_results, num_proc=num_proc
+                    )
             except KeyError:
                 logger.warning(
                     "The key 'query_result' does not exist in the dataset. Preprocess the dataset with the function validate_query(dataset) to create the key 'query_result'."
@@ -560,6 +1231,144 @@ class SQLData:
         else:
             return dataset
         
+    @staticmethod
+    def _convert_storage_format_batch(batch, storage_format: str = "json") -> Dict[str, List]:
+        """Converts the column_types, filler_data and tuning_format columns of a batch to the given storage format
+
+        :param batch: The batch to convert
+        :type batch: Union[dict, pyarrow.Table]
+        :param storage_format: The storage format to convert the columns to, either "json" or "native", defaults to "json"
+        :type storage_format: str, optional
+        :return: A dictionary containing the converted columns present in the batch
+        :rtype: dict
+        """
+
+        columns = {}
+
+        for column_name, (dump, load) in STORAGE_CODECS.items():
+            if column_name in batch:
+                columns[column_name] = [
+                    None if value is None else dump(load(value), storage_format)
+                    for value in SQLData._column_values(batch[column_name])
+                ]
+
+        return columns
+
+    def convert_storage_format(
+        self,
+        dataset_name: str,
+        storage_format: str = "json",
+        update_class_dataset: bool = False,
+        batch_size: int = 1000,
+        num_proc: Optional[int] = None,
+    ) -> Optional[Union[DatasetDict, None]]:
+        """Converts the column_types, filler_data and tuning_format columns of a dataset to the given storage format. By default returns a JSON string view of a natively stored dataset, e.g. for export.
+
+        :param dataset_name: The name of the dataset to convert
+        :type dataset_name: str
+        :param storage_format: The storage format to convert the columns to, either "json" or "native", defaults to "json"
+        :type storage_format: str, optional
+        :param update_class_dataset: Whether or not to update the class instance self.data = {"dataset_name": dataset}, defaults to False
+        :type update_class_dataset: bool, optional
+        :param batch_size: The number of rows converted at once, defaults to 1000
+        :type batch_size: int, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
+        """
+
+        if dataset_name not in self.data.keys():
+            logger.warning(
+                f"The dataset {dataset_name} has not been loaded. Load the dataset with the function load_data(dataset_name)."
+            )
+            return None
+
+        if storage_format not in STORAGE_FORMATS:
+            raise ValueError(
+                f"The storage format {storage_format} is not supported. Supported storage formats: {STORAGE_FORMATS}"
+            )
+
+        dataset = SQLData._map_batched(
+            self.data[dataset_name],
+            [
+                functools.partial(
+                    SQLData._convert_storage_format_batch, storage_format=storage_format
+                )
+            ],
+            batch_size=batch_size,
+            num_proc=num_proc,
+        )
+
+        if update_class_dataset:
+            self.data[dataset_name] = dataset
+            return None
+        else:
+            return dataset
+
+    @staticmethod
+    def _prune_schema(dataset, prune_columns: bool = False) -> Dict[str, str]:
+        """Removes the CREATE table statements, and optionally the columns, of the context of a datum that are not relevant to its question, keeping the original context
+
+        :param dataset: The dataset item to prune the context of
+        :type dataset: datasets.Dataset
+        :param prune_columns: Whether or not to remove the columns of relevant tables that do not match the question, defaults to False
+        :type prune_columns: bool, optional
+        :return: A dictionary containing the pruned context and the original context
+        :rtype: dict {"context": str, "original_context": str}
+        """
+
+        context = dataset.get("original_context") or dataset["context"]
+
+        try:
+            if dataset.get("column_types") is not None:
+                column_types = load_column_types(dataset["column_types"])
+            else:
+                column_types = SQLData._parse_column_types(context)
+            pruned = prune_context(context, dataset["question"], column_types, prune_columns)
+        except Exception as e:
+            logger.warning(f"An error occured while trying to prune the context, keeping the original context: {e}")
+            pruned = context
+
+        return {"context": pruned, "original_context": context}
+
+    def prune_schema(
+        self,
+        dataset_name: str,
+        prune_columns: bool = False,
+        update_class_dataset: bool = True,
+        num_proc: Optional[int] = None,
+    ) -> Optional[Union[DatasetDict, None]]:
+        """Prunes the context of every datum to the tables, and optionally the columns, that are lexically linked to its question, so that prompts built from the context use fewer tokens. The original context is kept in the original_context column, and pruning a pruned dataset starts from it.
+
+        Lexical matching misses columns referenced through synonyms (e.g. "older" for an age column), so column pruning is disabled by default. SQLEval.schema_pruning_report(dataset) reports the token savings and whether the pruned contexts still contain the tables and columns of the answers.
+
+        :param dataset_name: The name of the dataset to prune
+        :type dataset_name: str
+        :param prune_columns: Whether or not to remove the columns of relevant tables that do not match the question, defaults to False
+        :type prune_columns: bool, optional
+        :param update_class_dataset: Whether or not to update the class instance self.data = {"dataset_name": dataset}, defaults to True
+        :type update_class_dataset: bool, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
+        """
+
+        if dataset_name not in self.data.keys():
+            logger.warning(
+                f"The dataset {dataset_name} has not been loaded. Load the dataset with the function load_data(dataset_name)."
+            )
+            return None
+
+        dataset = self.data[dataset_name].map(
+            SQLData._prune_schema,
+            num_proc=num_proc,
+            fn_kwargs={"prune_columns": prune_columns},
+        )
+
+        if update_class_dataset:
+            self.data[dataset_name] = dataset
+            return None
+        else:
+            return dataset
+
     #################################
     # Data Loading Functions        #
     #################################
@@ -568,6 +1377,9 @@ class SQLData:
         self, 
         dataset_name: str,
         dataset_type: str = 'train',
+        batched: bool = True,
+        batch_size: int = 1000,
+        num_proc: Optional[int] = None,
     ) -> Optional[str]: 
         """Creates a jsonl object from a dataset
 
@@ -575,6 +1387,12 @@ class SQLData:
         :type dataset_name: str
         :param dataset_type: The type of dataset to create a jsonl object from, defaults to 'train'
         :type dataset_type: str, optional
+        :param batched: Whether or not to format the dataset with format_tuning_data_batch(batch), defaults to True
+        :type batched: bool, optional
+        :param batch_size: The number of rows formatted at once, defaults to 1000
+        :type batch_size: int, optional
+        :param num_proc: The number of processes to shard the dataset across, defaults to None (i.e., a single process)
+        :type num_proc: Optional[int], optional
         :return: A jsonl object
         :rtype: Optional[str]
         """
@@ -593,7 +1411,15 @@ class SQLData:
             raise
         
         try:
-            dataset = dataset.map(SQLData.format_tuning_data)
+            if batched:
+                dataset = SQLData._map_batched(
+                    dataset,
+                    [SQLData.format_tuning_data_batch],
+                    batch_size=batch_size,
+                    num_proc=num_proc,
+                )
+            else:
+                dataset = dataset.map(SQLData.format_tuning_data, num_proc=num_proc)
             jsonl_string = '\n'.join(dataset['tuning_format'])
         except Exception as e:
             logger.error(f"An error occured while trying to format the dataset: {e}")
@@ -601,6 +1427,99 @@ class SQLData:
 
         return jsonl_string
 
+    def _jsonl_batches(
+        self, dataset_name: str, dataset_type: str = "train", batch_size: int = 1000
+    ) -> Iterator[List[str]]:
+        """Returns the JSONL lines of a dataset one batch at a time, formatting batches that have not been formatted with format_tuning_data_batch(batch)
+
+        The dataset is looked up when the method is called rather than when the batches are consumed, so that a missing dataset raises before any file or request is created.
+
+        :param dataset_name: The name of the dataset to create JSONL lines from
+        :type dataset_name: str
+        :param dataset_type: The type of dataset to create JSONL lines from, defaults to 'train'
+        :type dataset_type: str, optional
+        :param batch_size: The number of rows formatted at once, defaults to 1000
+        :type batch_size: int, optional
+        :raises KeyError: If the dataset has not been loaded
+        :return: The JSONL lines of each batch
+        :rtype: Iterator[List[str]]
+        """
+
+        if dataset_name not in self.data.keys():
+            logger.error(
+                f"The dataset {dataset_name} has not been loaded. Load the dataset with the function load_data(dataset_name)."
+            )
+            raise KeyError(f"The dataset {dataset_name} has not been loaded.")
+
+        try:
+            dataset = self.data[dataset_name][dataset_type]
+        except Exception as e:
+            logger.error(f"An error occured while trying to load the dataset: {e}")
+            raise
+
+        def batches():
+            for batch in dataset.with_format("arrow").iter(batch_size=batch_size):
+                if "tuning_format" in batch.column_names:
+                    values = batch["tuning_format"].to_pylist()
+                else:
+                    values = SQLData.format_tuning_data_batch(batch)["tuning_format"]
+
+                yield [
+                    value if isinstance(value, str) else json.dumps(load_tuning_format(value))
+                    for value in values
+                ]
+
+        return batches()
+
+    def iter_jsonl(
+        self, dataset_name: str, dataset_type: str = "train", batch_size: int = 1000
+    ) -> Iterator[str]:
+        """Yields the lines of a jsonl object from a dataset one at a time, formatting batch_size rows at once so that memory use does not grow with the size of the dataset
+
+        :param dataset_name: The name of the dataset to create a jsonl object from
+        :type dataset_name: str
+        :param dataset_type: The type of dataset to create a jsonl object from, defaults to 'train'
+        :type dataset_type: str, optional
+        :param batch_size: The number of rows formatted at once, defaults to 1000
+        :type batch_size: int, optional
+        :return: The lines of the jsonl object
+        :rtype: Iterator[str]
+        """
+
+        for lines in self._jsonl_batches(dataset_name, dataset_type, batch_size):
+            yield from lines
+
+    def write_jsonl(
+        self,
+        dataset_name: str,
+        file: Union[str, IO],
+        dataset_type: str = "train",
+        compression: Optional[str] = "infer",
+        batch_size: int = 1000,
+    ) -> int:
+        """Writes a jsonl object from a dataset to a file or file-like object one batch at a time, so that memory use does not grow with the size of the dataset
+
+        :param dataset_name: The name of the dataset to create a jsonl object from
+        :type dataset_name: str
+        :param file: The path of the file or a file-like object (binary, or text when uncompressed)
+        :type file: Union[str, IO]
+        :param dataset_type: The type of dataset to create a jsonl object from, defaults to 'train'
+        :type dataset_type: str, optional
+        :param compression: The compression of the file, either "gzip", "zstd" (requires zstandard), None or "infer" (from the suffix of the path), defaults to "infer"
+        :type compression: Optional[str], optional
+        :param batch_size: The number of rows formatted and written at once, defaults to 1000
+        :type batch_size: int, optional
+        :raises KeyError: If the dataset has not been loaded
+        :return: The number of lines written
+        :rtype: int
+        """
+
+        return write_jsonl_lines(
+            self._jsonl_batches(dataset_name, dataset_type, batch_size),
+            file,
+            compression=compression,
+        )
+
     def upload_jsonl_gist(
         self, 
         dataset_name: str,
@@ -610,8 +1529,10 @@ class SQLData:
         description: str="", 
         is_public: bool=True, 
         store_url: bool=True,
+        session=None,
+        batch_size: int = 1000,
     ):
-        """Uploads a jsonl object to a gist
+        """Uploads a jsonl object to a gist, streaming it one batch of rows at a time
 
         :param dataset_name: The name of the dataset to upload a jsonl object from
         :type dataset_name: str
@@ -625,21 +1546,24 @@ class SQLData:
         :type description: str, optional
         :param is_public: Whether or not the gist is public, defaults to True
         :type is_public: bool, optional
+        :param session: A requests session to reuse the connection of, e.g. across uploads, defaults to None
+        :type session: Optional[requests.Session], optional
+        :param batch_size: The number of rows formatted and streamed within the request at once, defaults to 1000
+        :type batch_size: int, optional
+        :raises KeyError: If the dataset has not been loaded
         """
-        
-        jsonl = self.create_jsonl_object(dataset_name, dataset_type)
 
-        if jsonl is None:
-            logger.error(f"An error occured while trying to create the jsonl object.")
-            return
-        
+        # The jsonl object is streamed within the request one batch at a time, rather than built in memory
+        batches = self._jsonl_batches(dataset_name, dataset_type, batch_size)
+
         try:
             response = create_gist(
                 token=token, 
                 filename=filename, 
-                content=jsonl, 
+                content=("\n".join(lines) for lines in batches if lines), 
                 description=description, 
-                is_public=is_public
+                is_public=is_public,
+                session=session,
             )
             
             if store_url:
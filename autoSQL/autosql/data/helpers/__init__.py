@@ -1,2 +1,11 @@
+from .backends import *
+from .cache import *
+from .equivalence import *
+from .export import *
+from .extraction import *
+from .fingerprint import *
 from .generate import *
+from .pruning import *
+from .storage import *
+from .tokens import *
 from .upload import *
\ No newline at end of file
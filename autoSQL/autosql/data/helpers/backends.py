@@ -0,0 +1,859 @@
+import os
+import abc
+import json
+import pickle
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from typing import Optional, Dict, List, Union
+
+import sqlglot
+from sqlglot import expressions as exp
+from sqlglot.executor import execute
+from sqlglot.executor.table import ensure_tables
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.optimizer.annotate_types import annotate_types
+
+logger = logging.getLogger(__name__)
+
+_DUCKDB_TYPES = {int: "BIGINT", float: "DOUBLE", str: "VARCHAR", bool: "BOOLEAN"}
+
+
+class ExecutionLimitError(Exception):
+    """Raised when a query exceeds a limit of a SandboxedBackend, its status is stored as the query result"""
+
+    status = None
+
+
+class QueryTimeout(ExecutionLimitError):
+    """Raised when a query does not complete within the timeout of a SandboxedBackend"""
+
+    status = "Timeout"
+
+
+class ResourceLimitExceeded(ExecutionLimitError):
+    """Raised when a query exceeds the row or memory limit of a SandboxedBackend"""
+
+    status = "ResourceLimit"
+
+
+class SQLSession(abc.ABC):
+    """A set of tables materialised once by a backend, against which any number of queries can be executed
+
+    Sessions are context managers, closing any underlying database connection on exit. Subclasses implement execute(query, max_rows).
+    """
+
+    def __init__(self, backend: "SQLBackend") -> None:
+        """Initializes the class
+
+        :param backend: The backend that created the session
+        :type backend: SQLBackend
+        """
+
+        self.backend = backend
+
+    def __repr__(self):
+        return "{}(backend={!r})".format(type(self).__name__, self.backend)
+
+    def __enter__(self) -> "SQLSession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @abc.abstractmethod
+    def execute(self, query: str, max_rows: Optional[int] = None) -> Optional[List[tuple]]:
+        """Executes a query against the tables of the session
+
+        :param query: The query to execute
+        :type query: str
+        :param max_rows: The maximum number of result rows, defaults to None (i.e., unlimited)
+        :type max_rows: Optional[int], optional
+        :raises ResourceLimitExceeded: If the query returns more than max_rows rows
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+    def close(self) -> None:
+        """Releases the resources held by the session"""
+
+        pass
+
+
+class SQLGlotSession(SQLSession):
+    """A session holding tables converted once into sqlglot executor tables"""
+
+    def __init__(
+        self,
+        backend: "SQLBackend",
+        tables: Dict[str, List[Dict[str, Union[str, int, None]]]],
+    ) -> None:
+        """Initializes the class, converting the provided tables
+
+        :param backend: The backend that created the session
+        :type backend: SQLBackend
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        """
+
+        super().__init__(backend)
+        self.tables = ensure_tables(tables).mapping
+
+    def execute(self, query: str, max_rows: Optional[int] = None) -> Optional[List[tuple]]:
+        """Executes a query against the tables of the session with sqlglot.executor.execute
+
+        The sqlglot executor materialises the whole result, so max_rows is checked once the query completes.
+
+        :param query: The query to execute
+        :type query: str
+        :param max_rows: The maximum number of result rows, defaults to None (i.e., unlimited)
+        :type max_rows: Optional[int], optional
+        :raises ResourceLimitExceeded: If the query returns more than max_rows rows
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+        rows = execute(query, tables=self.tables).rows
+
+        if max_rows is not None and rows is not None and len(rows) > max_rows:
+            raise ResourceLimitExceeded(f"The query returned {len(rows)} rows, more than the limit of {max_rows}.")
+
+        return rows
+
+
+class ConnectionSession(SQLSession):
+    """A session holding an in-memory database connection the tables are loaded into once. Every query runs within a transaction that is rolled back, so a query cannot modify the tables seen by the queries that follow it."""
+
+    def __init__(
+        self,
+        backend: "SQLBackend",
+        connection,
+        tables: Dict[str, List[Dict[str, Union[str, int, None]]]],
+    ) -> None:
+        """Initializes the class, loading the provided tables into the connection
+
+        :param backend: The backend that created the session
+        :type backend: SQLBackend
+        :param connection: The in-memory database connection, in autocommit mode
+        :type connection: sqlite3.Connection or duckdb.DuckDBPyConnection
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        """
+
+        super().__init__(backend)
+        self.connection = connection
+
+        try:
+            backend._load_tables(connection, tables)
+        except Exception:
+            connection.close()
+            raise
+
+    def execute(self, query: str, max_rows: Optional[int] = None) -> Optional[List[tuple]]:
+        """Executes a query against the tables of the session, transpiled to the dialect of the backend
+
+        With max_rows, at most max_rows + 1 rows are fetched, so that a query returning too many rows is stopped before its result is materialised.
+
+        :param query: The query to execute
+        :type query: str
+        :param max_rows: The maximum number of result rows, defaults to None (i.e., unlimited)
+        :type max_rows: Optional[int], optional
+        :raises ResourceLimitExceeded: If the query returns more than max_rows rows
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+        query = self.backend.transpile(query)
+        self.connection.execute("BEGIN TRANSACTION")
+
+        try:
+            cursor = self.connection.execute(query)
+
+            if max_rows is None:
+                return cursor.fetchall()
+
+            rows = cursor.fetchmany(max_rows + 1)
+            if len(rows) > max_rows:
+                raise ResourceLimitExceeded(f"The query returned more than the limit of {max_rows} rows.")
+
+            return rows
+        finally:
+            self.connection.execute("ROLLBACK")
+
+    def close(self) -> None:
+        """Closes the database connection"""
+
+        self.connection.close()
+
+
+class SQLiteSession(ConnectionSession):
+    """A session holding an in-memory SQLite database, which reads back as booleans the result columns sqlglot types as BOOLEAN, e.g. columns of booleans or comparisons, as SQLite stores booleans as the integers 1 and 0"""
+
+    def __init__(
+        self,
+        backend: "SQLBackend",
+        connection,
+        tables: Dict[str, List[Dict[str, Union[str, int, None]]]],
+    ) -> None:
+        """Initializes the class, loading the provided tables into the connection
+
+        :param backend: The backend that created the session
+        :type backend: SQLBackend
+        :param connection: The in-memory database connection, in autocommit mode
+        :type connection: sqlite3.Connection
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        """
+
+        super().__init__(backend, connection, tables)
+        self.schema = {
+            table_name: {
+                column_name: "BOOLEAN" if {type(record.get(column_name)) for record in records} - {type(None)} == {bool} else "UNKNOWN"
+                for column_name in records[0]
+            }
+            for table_name, records in tables.items()
+            if records
+        }
+        self._boolean_columns = {}
+
+    def boolean_columns(self, query: str) -> List[int]:
+        """Returns the positions of the result columns of a query typed as BOOLEAN by sqlglot, none if the query cannot be typed
+
+        :param query: The query
+        :type query: str
+        :return: The positions of the boolean result columns
+        :rtype: List[int]
+        """
+
+        if query not in self._boolean_columns:
+            try:
+                expression = qualify(sqlglot.parse_one(query), schema=self.schema, validate_qualify_columns=False)
+                expression = annotate_types(expression, schema=self.schema)
+                self._boolean_columns[query] = [
+                    index
+                    for index, projection in enumerate(expression.selects)
+                    if projection.type is not None and projection.type.this == exp.DataType.Type.BOOLEAN
+                ]
+            except Exception:
+                self._boolean_columns[query] = []
+
+        return self._boolean_columns[query]
+
+    def execute(self, query: str, max_rows: Optional[int] = None) -> Optional[List[tuple]]:
+        """Executes a query against the tables of the session, see ConnectionSession.execute(), reading its boolean result columns back as booleans
+
+        :param query: The query to execute
+        :type query: str
+        :param max_rows: The maximum number of result rows, defaults to None (i.e., unlimited)
+        :type max_rows: Optional[int], optional
+        :raises ResourceLimitExceeded: If the query returns more than max_rows rows
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+        rows = super().execute(query, max_rows)
+        columns = self.boolean_columns(query) if rows else []
+
+        if not columns:
+            return rows
+
+        return [
+            tuple(
+                bool(value) if index in columns and type(value) is int and value in (0, 1) else value
+                for index, value in enumerate(row)
+            )
+            for row in rows
+        ]
+
+
+class SQLBackend(abc.ABC):
+    """Base class for the engines used to execute queries against filler data
+
+    Subclasses implement connect(tables), returning a SQLSession that materialises the tables once. Result rows are returned as a list of tuples so that results remain comparable across backends.
+    """
+
+    name = None
+    dialect = None
+
+    def __repr__(self):
+        return "{}()".format(type(self).__name__)
+
+    def transpile(self, query: str) -> str:
+        """Transpiles a query to the dialect of the backend
+
+        :param query: The query to transpile
+        :type query: str
+        :return: The transpiled query
+        :rtype: str
+        """
+
+        if self.dialect is None:
+            return query
+
+        return sqlglot.transpile(query, write=self.dialect)[0]
+
+    @abc.abstractmethod
+    def connect(
+        self, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> SQLSession:
+        """Materialises the provided tables once, returning a session to execute any number of queries against them
+
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The session holding the tables
+        :rtype: SQLSession
+        """
+
+    def execute(
+        self, query: str, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> Optional[List[tuple]]:
+        """Executes a single query against the provided tables
+
+        :param query: The query to execute
+        :type query: str
+        :param tables: The tables to execute the query against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+        with self.connect(tables) as session:
+            return session.execute(query)
+
+    @staticmethod
+    def format_result(rows: Optional[List[tuple]]) -> str:
+        """Formats result rows as stored in the query_result column, matching str(result.rows) of the sqlglot executor
+
+        :param rows: The result rows of a query
+        :type rows: Optional[List[tuple]]
+        :return: The formatted result
+        :rtype: str
+        """
+
+        return str(rows) if rows is not None else ""
+
+    def _column_definition(self, column_name: str, values: List) -> str:
+        """Returns the definition of a column within a CREATE table statement, untyped by default
+
+        :param column_name: The name of the column
+        :type column_name: str
+        :param values: The values of the column
+        :type values: list
+        :return: The column definition
+        :rtype: str
+        """
+
+        return f'"{column_name}"'
+
+    def _load_tables(
+        self, connection, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> None:
+        """Creates and populates the provided tables within a database connection
+
+        :param connection: The database connection to load the tables into
+        :type connection: sqlite3.Connection or duckdb.DuckDBPyConnection
+        :param tables: The tables to load
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        """
+
+        for table_name, records in tables.items():
+            if not records:
+                continue
+
+            column_names = list(records[0].keys())
+            rows = [tuple(record.get(name) for name in column_names) for record in records]
+            columns = ", ".join(
+                self._column_definition(name, [row[i] for row in rows])
+                for i, name in enumerate(column_names)
+            )
+            placeholders = ", ".join("?" for _ in column_names)
+
+            connection.execute(f'CREATE TABLE "{table_name}" ({columns})')
+            connection.executemany(
+                f'INSERT INTO "{table_name}" VALUES ({placeholders})', rows
+            )
+
+
+class SQLGlotBackend(SQLBackend):
+    """Executes queries with the sqlglot python executor"""
+
+    name = "sqlglot"
+
+    def connect(
+        self, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> SQLSession:
+        """Converts the provided tables into sqlglot executor tables once
+
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The session holding the tables
+        :rtype: SQLSession
+        """
+
+        return SQLGlotSession(self, tables)
+
+    def execute(
+        self, query: str, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> Optional[List[tuple]]:
+        """Executes a single query against the provided tables with sqlglot.executor.execute
+
+        :param query: The query to execute
+        :type query: str
+        :param tables: The tables to execute the query against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+        return execute(query, tables=tables).rows
+
+
+class SQLiteBackend(SQLBackend):
+    """Executes queries with an in-memory SQLite database
+
+    SQLite is configured to match the sqlglot executor: result columns typed as BOOLEAN by sqlglot (columns of booleans and boolean expressions, e.g. SELECT age > 56) are read back as python booleans, divisions are true divisions rather than integer divisions, and LIKE is case sensitive.
+    """
+
+    name = "sqlite"
+    dialect = "sqlite"
+
+    def transpile(self, query: str) -> str:
+        """Transpiles a query to the SQLite dialect, casting the dividend of every division to REAL so that integers are divided as by the sqlglot executor
+
+        :param query: The query to transpile
+        :type query: str
+        :return: The transpiled query
+        :rtype: str
+        """
+
+        def true_division(node):
+            if isinstance(node, exp.Div):
+                return exp.Div(
+                    this=exp.Cast(this=node.this, to=exp.DataType.build("REAL")),
+                    expression=node.expression,
+                )
+            return node
+
+        return sqlglot.parse_one(query).transform(true_division).sql(dialect=self.dialect)
+
+    def connect(
+        self, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> SQLSession:
+        """Loads the provided tables into an in-memory SQLite database once
+
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The session holding the database connection
+        :rtype: SQLSession
+        """
+
+        connection = sqlite3.connect(":memory:", isolation_level=None)
+        connection.execute("PRAGMA case_sensitive_like = ON")
+
+        return SQLiteSession(self, connection, tables)
+
+
+class DuckDBBackend(SQLBackend):
+    """Executes queries with an in-memory DuckDB database, requires the optional duckdb package"""
+
+    name = "duckdb"
+    dialect = "duckdb"
+
+    def __init__(self) -> None:
+        """Initializes the class, raising an ImportError if duckdb is not installed"""
+
+        try:
+            import duckdb
+        except ImportError:
+            logger.error(
+                "The duckdb backend requires the duckdb package. Install it with: pip install duckdb"
+            )
+            raise
+
+        self.duckdb = duckdb
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state) -> None:
+        self.__init__()
+
+    def _column_definition(self, column_name: str, values: List) -> str:
+        """Returns the definition of a column within a CREATE table statement, typed by the python type of its values as DuckDB requires a type for every column
+
+        :param column_name: The name of the column
+        :type column_name: str
+        :param values: The values of the column
+        :type values: list
+        :return: The column definition
+        :rtype: str
+        """
+
+        value_types = {type(value) for value in values if value is not None}
+        column_type = (
+            _DUCKDB_TYPES.get(value_types.pop(), "VARCHAR")
+            if len(value_types) == 1
+            else "VARCHAR"
+        )
+
+        return f'"{column_name}" {column_type}'
+
+    def connect(
+        self, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> SQLSession:
+        """Loads the provided tables into an in-memory DuckDB database once
+
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The session holding the database connection
+        :rtype: SQLSession
+        """
+
+        return ConnectionSession(self, self.duckdb.connect(":memory:"), tables)
+
+
+BACKENDS = {
+    SQLGlotBackend.name: SQLGlotBackend,
+    SQLiteBackend.name: SQLiteBackend,
+    DuckDBBackend.name: DuckDBBackend,
+}
+
+
+def get_backend(backend: Union[str, SQLBackend] = "sqlglot") -> SQLBackend:
+    """Returns the backend used to execute queries
+
+    :param backend: The name of the backend ("sqlglot", "sqlite" or "duckdb") or a backend instance, defaults to "sqlglot"
+    :type backend: Union[str, SQLBackend], optional
+    :return: The backend instance
+    :rtype: SQLBackend
+    """
+
+    if isinstance(backend, SQLBackend):
+        return backend
+
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(
+            f"The backend {backend} is not supported. Supported backends: {list(BACKENDS.keys())}"
+        )
+
+
+def _address_space() -> int:
+    """Returns the address space of the current process in bytes, or 0 where /proc is unavailable"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _sandbox_worker(
+    connection,
+    parent_connection,
+    backend: SQLBackend,
+    max_memory: Optional[int],
+) -> None:
+    """Runs within the worker process of a SandboxedBackend, holding the tables of one session at a time and executing the commands received over the connection until it is closed:
+
+    - ("connect", tables): materialises the tables, replacing those of the previous session
+    - ("execute", (query, max_rows)): executes a query against the tables
+    - ("close", None): releases the tables, without a response
+    """
+
+    # The worker exits once the process owning it exits, as long as it does not hold the other end of the connection itself
+    parent_connection.close()
+
+    if max_memory is not None:
+        try:
+            import resource
+            limit = _address_space() + max_memory
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            logger.warning(f"The memory limit could not be applied, queries run without it: {e}")
+
+    def send(status, value):
+        try:
+            connection.send((status, value))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            connection.send((status, Exception(str(value))))
+
+    session = None
+
+    try:
+        while True:
+            try:
+                command, value = connection.recv()
+            except EOFError:
+                return
+
+            if command in ("connect", "close") and session is not None:
+                session.close()
+                session = None
+
+            if command == "close":
+                continue
+
+            try:
+                if command == "connect":
+                    session = backend.connect(value)
+                    send("ok", None)
+                else:
+                    query, max_rows = value
+                    send("ok", session.execute(query, max_rows=max_rows))
+            except ExecutionLimitError as e:
+                send("error", e)
+            except MemoryError:
+                send("error", ResourceLimitExceeded("The query exceeded the memory limit."))
+            except Exception as e:
+                # The sqlglot executor wraps the errors of its steps, including running out of memory
+                if isinstance(e.__cause__, MemoryError):
+                    e = ResourceLimitExceeded("The query exceeded the memory limit.")
+                send("error", e)
+    finally:
+        if session is not None:
+            session.close()
+
+
+class SandboxedSession(SQLSession):
+    """A session whose tables are held by the worker process of a SandboxedBackend
+
+    The worker holds the tables of one session at a time: a session whose tables were replaced by another session, or lost when the worker was killed, sends them again before its next query.
+    """
+
+    def __init__(
+        self,
+        backend: "SandboxedBackend",
+        tables: Dict[str, List[Dict[str, Union[str, int, None]]]],
+    ) -> None:
+        """Initializes the class, materialising the tables within the worker process of the backend
+
+        :param backend: The backend that created the session
+        :type backend: SandboxedBackend
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        """
+
+        super().__init__(backend)
+        self.tables = tables
+        backend._load(self)
+
+    def execute(self, query: str, max_rows: Optional[int] = None) -> Optional[List[tuple]]:
+        """Executes a query within the worker process of the backend
+
+        :param query: The query to execute
+        :type query: str
+        :param max_rows: The maximum number of result rows, applied along with the limit of the backend, defaults to None
+        :type max_rows: Optional[int], optional
+        :raises QueryTimeout: If the query does not complete within the timeout
+        :raises ResourceLimitExceeded: If the query exceeds the row or memory limit
+        :return: The result rows of the query
+        :rtype: Optional[List[tuple]]
+        """
+
+        return self.backend._execute(self, query, max_rows)
+
+    def close(self) -> None:
+        """Releases the tables held by the worker process, which keeps running for the next session"""
+
+        self.backend._release(self)
+
+
+class SandboxedBackend(SQLBackend):
+    """Executes the queries of another backend within a worker process, bounding the time, result rows and memory of every query
+
+    A query exceeding a limit raises a QueryTimeout or ResourceLimitExceeded error, stored as the status "Timeout" or "ResourceLimit" by the validation methods, so that a pathological query (e.g. a cartesian join) cannot stall a whole dataset.map.
+    A single worker process serves every session of the backend, so that validating a dataset does not start a process per set of tables. The worker is only restarted, for the next query, after it was killed for exceeding the timeout or died for its memory use.
+    """
+
+    def __init__(
+        self,
+        backend: Union[str, SQLBackend] = "sqlglot",
+        timeout: Optional[float] = 5.0,
+        max_rows: Optional[int] = None,
+        max_memory: Optional[int] = None,
+    ) -> None:
+        """Initializes the class, the worker process is started by the first session
+
+        :param backend: The backend executing the queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param timeout: The number of seconds a query (or the materialisation of the tables) may run before the worker process is killed, defaults to 5.0
+        :type timeout: Optional[float], optional
+        :param max_rows: The maximum number of result rows of a query, defaults to None (i.e., unlimited)
+        :type max_rows: Optional[int], optional
+        :param max_memory: The number of bytes of memory the worker process may allocate beyond its memory at startup, applied on POSIX systems, defaults to None (i.e., unlimited)
+        :type max_memory: Optional[int], optional
+        """
+
+        self.backend = get_backend(backend)
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_memory = max_memory
+        self._reset()
+
+    def __repr__(self):
+        return "{}(backend={!r}, timeout={!r}, max_rows={!r}, max_memory={!r})".format(
+            type(self).__name__, self.backend, self.timeout, self.max_rows, self.max_memory
+        )
+
+    def __getstate__(self):
+        # The worker process belongs to the process that started it
+        return {key: self.__dict__[key] for key in ("backend", "timeout", "max_rows", "max_memory")}
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._reset()
+
+    def _reset(self) -> None:
+        """Forgets the worker process, without stopping it"""
+
+        self._process = None
+        self._connection = None
+        self._session = None
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    @property
+    def dialect(self) -> Optional[str]:
+        return self.backend.dialect
+
+    def _start(self) -> None:
+        """Starts the worker process, unless it is running"""
+
+        # A forked process, e.g. a dataset.map worker, inherits the worker process of its parent but cannot use it
+        if self._pid != os.getpid():
+            self._reset()
+
+        if self._process is not None:
+            return
+
+        self._connection, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_sandbox_worker, args=(child, self._connection, self.backend, self.max_memory), daemon=True
+        )
+        self._process.start()
+        child.close()
+
+    def _request(self, command: str, value) -> Optional[List[tuple]]:
+        """Sends a command to the worker process and waits for its response, killing the worker when the timeout is exceeded or it dies
+
+        :param command: The command, either "connect" or "execute", see _sandbox_worker()
+        :type command: str
+        :param value: The value of the command
+        :raises QueryTimeout: If the worker does not respond within the timeout
+        :raises ResourceLimitExceeded: If the worker dies
+        :return: The response of the worker
+        :rtype: Optional[List[tuple]]
+        """
+
+        self._start()
+
+        try:
+            self._connection.send((command, value))
+            if not self._connection.poll(self.timeout):
+                self.close()
+                raise QueryTimeout(f"The query did not complete within {self.timeout} seconds.")
+            status, response = self._connection.recv()
+        except (EOFError, ConnectionError):
+            # The worker died without responding, e.g. killed by the operating system for its memory use
+            self.close()
+            raise ResourceLimitExceeded("The worker process executing the query died.")
+
+        if status == "error":
+            raise response
+
+        return response
+
+    def _load(self, session: SandboxedSession) -> None:
+        """Materialises the tables of a session within the worker process, replacing the tables it holds"""
+
+        with self._lock:
+            self._session = None
+            self._request("connect", session.tables)
+            self._session = session
+
+    def _execute(self, session: SandboxedSession, query: str, max_rows: Optional[int] = None) -> Optional[List[tuple]]:
+        """Executes a query of a session within the worker process, sending the tables of the session first if the worker does not hold them"""
+
+        limits = [limit for limit in (self.max_rows, max_rows) if limit is not None]
+
+        with self._lock:
+            if self._session is not session or self._pid != os.getpid():
+                self._load(session)
+            return self._request("execute", (query, min(limits) if limits else None))
+
+    def _release(self, session: SandboxedSession) -> None:
+        """Releases the tables of a session if the worker process holds them"""
+
+        with self._lock:
+            if self._session is not session or self._pid != os.getpid():
+                return
+
+            self._session = None
+            try:
+                self._connection.send(("close", None))
+            except (OSError, ValueError):
+                self.close()
+
+    def connect(
+        self, tables: Dict[str, List[Dict[str, Union[str, int, None]]]]
+    ) -> SQLSession:
+        """Materialises the provided tables once with the wrapped backend, within the worker process
+
+        :param tables: The tables to execute queries against
+        :type tables: dict {"table_name": [{"column_name": value}, ...]}
+        :return: The session holding the tables
+        :rtype: SQLSession
+        """
+
+        return SandboxedSession(self, tables)
+
+    def close(self) -> None:
+        """Stops the worker process, a later session starts a new one"""
+
+        with self._lock:
+            if self._process is not None and self._pid == os.getpid():
+                self._connection.close()
+                self._process.join(0.1)
+                if self._process.is_alive():
+                    self._process.kill()
+                    self._process.join()
+
+            self._process = None
+            self._connection = None
+            self._session = None
+
+    def format_result(self, rows: Optional[List[tuple]]) -> str:
+        """Formats result rows with the wrapped backend, see SQLBackend.format_result()
+
+        :param rows: The result rows of a query
+        :type rows: Optional[List[tuple]]
+        :return: The formatted result
+        :rtype: str
+        """
+
+        return self.backend.format_result(rows)
+
+
+def group_table_sets(filler_data: List) -> List[List[int]]:
+    """Groups the indices of rows with identical filler data, so that each set of tables is materialised once and every query of the group runs against it
+
+    :param filler_data: The filler data of each row, in either storage format
+    :type filler_data: list
+    :return: The row indices of each group, in order of first appearance
+    :rtype: List[List[int]]
+    """
+
+    groups = {}
+
+    for index, value in enumerate(filler_data):
+        key = value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+        groups.setdefault(key, []).append(index)
+
+    return list(groups.values())
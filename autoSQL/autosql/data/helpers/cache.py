@@ -0,0 +1,186 @@
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCache:
+    """A least recently used cache of parsed CREATE table contexts, keyed on a hash of the context
+
+    Column types are parsed once per unique context, and the cache can be persisted to disk so that repeated runs are cache hits.
+    When a dataset is processed with multiple processes, each process holds its own copy of the cache, and the contexts parsed by the processes are merged back from the processed dataset with merge(contexts, column_types).
+    """
+
+    def __init__(self, maxsize: int = 100000, path: Optional[str] = None) -> None:
+        """Initializes the class, loading the cache from path if it exists
+
+        :param maxsize: The maximum number of contexts to cache, defaults to 100000
+        :type maxsize: int, optional
+        :param path: The path of a JSON file to persist the cache to, defaults to None (i.e., in memory only)
+        :type path: Optional[str], optional
+        """
+
+        self.maxsize = maxsize
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __repr__(self):
+        return "{}(maxsize={!r}, path={!r}, size={!r})".format(
+            type(self).__name__, self.maxsize, self.path, len(self.entries)
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(context: str) -> str:
+        """Returns the cache key of a context
+
+        :param context: The CREATE table context
+        :type context: str
+        :return: The hash of the context
+        :rtype: str
+        """
+
+        return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+    def get(self, context: str) -> Optional[Dict[str, Dict[str, str]]]:
+        """Returns the cached column types of a context, or None if the context is not cached
+
+        :param context: The CREATE table context
+        :type context: str
+        :return: The column types of the context
+        :rtype: Optional[dict] {"table_name": {"column_name": "column_type"}}
+        """
+
+        key = SchemaCache.key(context)
+
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, context: str, column_types: Dict[str, Dict[str, str]]) -> None:
+        """Caches the column types of a context, evicting the least recently used context if the cache is full
+
+        :param context: The CREATE table context
+        :type context: str
+        :param column_types: The column types of the context
+        :type column_types: dict {"table_name": {"column_name": "column_type"}}
+        """
+
+        key = SchemaCache.key(context)
+        self.entries[key] = column_types
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get_or_parse(
+        self, context: str, parse: Callable[[str], Dict[str, Dict[str, str]]]
+    ) -> Dict[str, Dict[str, str]]:
+        """Returns the cached column types of a context, parsing and caching them on a miss
+
+        :param context: The CREATE table context
+        :type context: str
+        :param parse: The function parsing a context into column types
+        :type parse: Callable[[str], dict]
+        :return: The column types of the context
+        :rtype: dict {"table_name": {"column_name": "column_type"}}
+        """
+
+        column_types = self.get(context)
+
+        if column_types is None:
+            column_types = parse(context)
+            self.put(context, column_types)
+
+        return column_types
+
+    def merge(
+        self, contexts: Iterable[str], column_types: Iterable[Dict[str, Dict[str, str]]]
+    ) -> int:
+        """Caches the column types of contexts that are not cached yet, e.g. the contexts parsed by the other processes of a parallel map, without counting hits or misses
+
+        :param contexts: The CREATE table contexts
+        :type contexts: Iterable[str]
+        :param column_types: The column types of each context
+        :type column_types: Iterable[dict] {"table_name": {"column_name": "column_type"}}
+        :return: The number of contexts added to the cache
+        :rtype: int
+        """
+
+        added = 0
+
+        for context, types in zip(contexts, column_types):
+            if SchemaCache.key(context) not in self.entries:
+                self.put(context, types)
+                added += 1
+
+        return added
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit and miss statistics of the cache
+
+        :return: The statistics of the cache
+        :rtype: dict {"hits": int, "misses": int, "hit_rate": float, "size": int, "maxsize": int}
+        """
+
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+        }
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Persists the cache to a JSON file
+
+        :param path: The path of the JSON file, defaults to None (i.e., the class path)
+        :type path: Optional[str], optional
+        """
+
+        path = path or self.path
+
+        if path is None:
+            logger.warning("No path was provided to save the schema cache to.")
+            return
+
+        with open(path, "w") as f:
+            json.dump(self.entries, f)
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Loads a cache persisted with save(path), keeping the most recently saved entries up to maxsize
+
+        :param path: The path of the JSON file, defaults to None (i.e., the class path)
+        :type path: Optional[str], optional
+        """
+
+        path = path or self.path
+
+        try:
+            with open(path, "r") as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"An error occured while trying to load the schema cache: {e}")
+            return
+
+        self.entries.update(entries)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
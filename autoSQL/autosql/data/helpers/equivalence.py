@@ -0,0 +1,98 @@
+import logging
+import functools
+from typing import Optional
+
+import sqlglot
+from sqlglot import expressions as exp
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.optimizer.canonicalize import canonicalize
+
+logger = logging.getLogger(__name__)
+
+# The methods recorded for a validated query: matched to the answer without executing, or executed
+VALIDATION_METHODS = ("ast_match", "execution")
+
+
+def _canonical_aliases(expression: exp.Expression) -> exp.Expression:
+    """Renames the table aliases of a qualified query, and the output aliases of its outermost select, by position, so that queries differing only by their alias names share an AST"""
+
+    tables = {}
+
+    for table in expression.find_all(exp.Table):
+        if table.alias and table.alias not in tables:
+            tables[table.alias] = f"_t{len(tables)}"
+
+    for table in expression.find_all(exp.Table):
+        if table.alias in tables:
+            table.set("alias", exp.TableAlias(this=exp.to_identifier(tables[table.alias])))
+
+    for column in expression.find_all(exp.Column):
+        if column.table in tables:
+            column.set("table", exp.to_identifier(tables[column.table]))
+
+    # Output aliases only name the result columns, which are not compared, unless the ORDER BY references them
+    if isinstance(expression, exp.Select):
+        outputs = {}
+
+        for index, projection in enumerate(expression.expressions):
+            if isinstance(projection, exp.Alias):
+                outputs[projection.alias] = f"_col_{index}"
+                projection.set("alias", exp.to_identifier(outputs[projection.alias]))
+
+        if expression.args.get("order"):
+            for column in expression.args["order"].find_all(exp.Column):
+                if not column.table and column.name in outputs:
+                    column.set("this", exp.to_identifier(outputs[column.name]))
+
+    return expression
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_query(query: Optional[str], dialect: Optional[str] = None) -> Optional[str]:
+    """Normalises a query with the sqlglot optimizer, so that queries differing only by whitespace, identifier casing, quoting or alias names normalise to the same string
+
+    The query is qualified (normalising the case of unquoted identifiers), canonicalised, and its aliases are renamed by position. Normalised queries are cached, as the same answer is compared against the inferences of every model.
+
+    :param query: The query to normalise
+    :type query: Optional[str]
+    :param dialect: The dialect of the query, defaults to None
+    :type dialect: Optional[str], optional
+    :return: The normalised query, or None if the query cannot be parsed or qualified
+    :rtype: Optional[str]
+    """
+
+    if not query:
+        return None
+
+    try:
+        expression = sqlglot.parse_one(query, read=dialect)
+        expression = qualify(expression, dialect=dialect, validate_qualify_columns=False, quote_identifiers=False)
+        expression = _canonical_aliases(canonicalize(expression))
+    except Exception:
+        return None
+
+    # Quoting an identifier whose case is already normalised does not change its meaning
+    for identifier in expression.find_all(exp.Identifier):
+        if identifier.quoted and identifier.this == identifier.this.lower():
+            identifier.set("quoted", False)
+
+    return expression.sql(dialect=dialect)
+
+
+def queries_equivalent(query: Optional[str], reference: Optional[str], dialect: Optional[str] = None) -> bool:
+    """Returns whether two queries share their normalised AST, see normalize_query(), in which case they return the same result without being executed
+
+    Queries that are not matched may still be equivalent, e.g. when their predicates are written in another order.
+
+    :param query: The query to check, e.g. an inference
+    :type query: Optional[str]
+    :param reference: The query to check against, e.g. the answer
+    :type reference: Optional[str]
+    :param dialect: The dialect of the queries, defaults to None
+    :type dialect: Optional[str], optional
+    :return: Whether the queries are equivalent
+    :rtype: bool
+    """
+
+    normalized = normalize_query(query, dialect)
+    return normalized is not None and normalized == normalize_query(reference, dialect)
@@ -0,0 +1,126 @@
+import io
+import gzip
+import logging
+from contextlib import contextmanager
+from typing import Optional, Iterable, Iterator, Union, IO
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIONS = ("gzip", "zstd")
+
+_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+
+
+def infer_compression(path: str) -> Optional[str]:
+    """Infers the compression of a file from the suffix of its path
+
+    :param path: The path of the file
+    :type path: str
+    :return: The compression, either "gzip", "zstd" or None
+    :rtype: Optional[str]
+    """
+
+    for suffix, compression in _SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+
+    return None
+
+
+@contextmanager
+def open_jsonl(
+    file: Union[str, IO], compression: Optional[str] = "infer"
+) -> Iterator[IO[bytes]]:
+    """Opens a file, or wraps a file-like object, as a binary stream to write JSONL lines to, compressing it if requested. A file-like object is left open.
+
+    :param file: The path of the file or a file-like object (binary, or text when uncompressed)
+    :type file: Union[str, IO]
+    :param compression: The compression of the file, either "gzip", "zstd", None or "infer" (from the suffix of the path), defaults to "infer"
+    :type compression: Optional[str], optional
+    :return: A binary stream to write to
+    :rtype: Iterator[IO[bytes]]
+    """
+
+    if compression == "infer":
+        compression = infer_compression(file) if isinstance(file, str) else None
+
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(
+            f"The compression {compression} is not supported. Supported compressions: {COMPRESSIONS}"
+        )
+
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            logger.error(
+                "zstd compression requires the zstandard package. Install it with: pip install zstandard"
+            )
+            raise
+
+    owned = isinstance(file, str)
+    raw = open(file, "wb") if owned else file
+
+    if isinstance(raw, io.TextIOBase):
+        if compression is not None:
+            raise ValueError("A compressed file must be opened in binary mode.")
+        raw = _TextWriter(raw)
+
+    if compression == "gzip":
+        stream = gzip.GzipFile(fileobj=raw, mode="wb")
+    elif compression == "zstd":
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    else:
+        stream = None
+
+    try:
+        yield stream if stream is not None else raw
+    finally:
+        if stream is not None:
+            stream.close()
+        if owned:
+            raw.close()
+        else:
+            raw.flush()
+
+
+class _TextWriter:
+    """Adapts a text file-like object to the binary writes of write_jsonl_lines"""
+
+    def __init__(self, file: IO[str]) -> None:
+        self.file = file
+
+    def write(self, data: bytes) -> int:
+        return self.file.write(data.decode("utf-8"))
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def write_jsonl_lines(
+    batches: Iterable[Iterable[str]],
+    file: Union[str, IO],
+    compression: Optional[str] = "infer",
+) -> int:
+    """Writes batches of JSONL lines to a file or file-like object, one batch at a time so that memory use is bounded by the batch size
+
+    :param batches: The batches of lines to write, each line a JSON string without a trailing newline
+    :type batches: Iterable[Iterable[str]]
+    :param file: The path of the file or a file-like object (binary, or text when uncompressed)
+    :type file: Union[str, IO]
+    :param compression: The compression of the file, either "gzip", "zstd", None or "infer" (from the suffix of the path), defaults to "infer"
+    :type compression: Optional[str], optional
+    :return: The number of lines written
+    :rtype: int
+    """
+
+    num_lines = 0
+
+    with open_jsonl(file, compression) as stream:
+        for lines in batches:
+            lines = list(lines)
+            if lines:
+                stream.write(("\n".join(lines) + "\n").encode("utf-8"))
+                num_lines += len(lines)
+
+    return num_lines
@@ -0,0 +1,142 @@
+import re
+import logging
+from typing import List, Optional, Pattern, Sequence, Tuple, Union
+
+import sqlglot
+from sqlglot.errors import SqlglotError
+
+from .backends import ExecutionLimitError, SQLSession
+
+logger = logging.getLogger(__name__)
+
+# A SQL statement ends at a new line or an instruction marker the fine-tuned Llama models generate
+SQL_STATEMENT_PATTERN = re.compile(r"SELECT.*?(?=\n|\[/|,\[INST\])", re.DOTALL)
+
+EXTRACTION_STRATEGIES = ("first-valid", "last-valid", "longest")
+
+
+class SQLExtractor:
+    """Extracts the SQL query from a model response, e.g. a Replicate inference that continues past the query
+
+    Candidate queries are found with precompiled patterns, and candidates that do not parse are discarded before any is executed. The candidates are then executed in the order of the strategy until one returns a result:
+
+    - "first-valid": the first candidate of the response
+    - "last-valid": the last candidate of the response
+    - "longest": the longest candidate
+    """
+
+    def __init__(
+        self,
+        patterns: Sequence[Union[str, Pattern]] = (SQL_STATEMENT_PATTERN,),
+        strategy: str = "last-valid",
+        prefilter: bool = True,
+        dialect: Optional[str] = None,
+    ) -> None:
+        """Initializes the class, compiling the patterns
+
+        :param patterns: The patterns matching candidate queries, as strings (compiled with re.DOTALL) or compiled patterns, defaults to (SQL_STATEMENT_PATTERN,)
+        :type patterns: Sequence[Union[str, Pattern]], optional
+        :param strategy: The candidate kept, either "first-valid", "last-valid" or "longest", defaults to "last-valid"
+        :type strategy: str, optional
+        :param prefilter: Whether to discard the candidates that do not parse with sqlglot before executing any, defaults to True
+        :type prefilter: bool, optional
+        :param dialect: The dialect the candidates are parsed with, defaults to None
+        :type dialect: Optional[str], optional
+        """
+
+        if strategy not in EXTRACTION_STRATEGIES:
+            raise ValueError(
+                f"The extraction strategy {strategy} is not supported. Supported strategies: {EXTRACTION_STRATEGIES}"
+            )
+
+        self.patterns = [
+            pattern if isinstance(pattern, re.Pattern) else re.compile(pattern, re.DOTALL)
+            for pattern in patterns
+        ]
+        self.strategy = strategy
+        self.prefilter = prefilter
+        self.dialect = dialect
+
+    def __repr__(self):
+        return "{}(patterns={!r}, strategy={!r}, prefilter={!r}, dialect={!r})".format(
+            type(self).__name__, [pattern.pattern for pattern in self.patterns], self.strategy, self.prefilter, self.dialect
+        )
+
+    def _parses(self, query: str) -> bool:
+        """Returns whether a candidate query parses, without executing it"""
+
+        try:
+            return sqlglot.parse_one(query, read=self.dialect) is not None
+        except SqlglotError:
+            return False
+
+    def candidates(self, text: Optional[str]) -> List[str]:
+        """Returns the candidate queries of a response, in the order they are executed by the strategy
+
+        :param text: The model response
+        :type text: Optional[str]
+        :return: The unique candidate queries that parse (if prefilter)
+        :rtype: List[str]
+        """
+
+        if not text:
+            return []
+
+        # Candidates matched by several patterns are executed once, at their first position
+        candidates = list(dict.fromkeys(
+            match.group(0) for pattern in self.patterns for match in pattern.finditer(text)
+        ))
+
+        if self.prefilter:
+            candidates = [candidate for candidate in candidates if self._parses(candidate)]
+
+        if self.strategy == "last-valid":
+            candidates.reverse()
+        elif self.strategy == "longest":
+            candidates.sort(key=len, reverse=True)
+
+        return candidates
+
+    def run(
+        self, candidates: List[str], session: SQLSession
+    ) -> Tuple[Optional[str], Optional[List[tuple]], Optional[str]]:
+        """Executes candidate queries in order within a session, stopping at the first that returns a result
+
+        :param candidates: The candidate queries, see candidates(text)
+        :type candidates: List[str]
+        :param session: The session holding the tables to execute the candidates against
+        :type session: SQLSession
+        :return: The query kept and its result rows, or None and None if no candidate is valid, and the status of the last execution limit exceeded ("Timeout" or "ResourceLimit") if any
+        :rtype: Tuple[Optional[str], Optional[List[tuple]], Optional[str]]
+        """
+
+        limit_status = None
+
+        for candidate in candidates:
+            try:
+                rows = session.execute(candidate)
+            except ExecutionLimitError as e:
+                limit_status = e.status
+                continue
+            except Exception:
+                continue
+
+            if rows is not None:
+                return candidate, rows, limit_status
+
+        return None, None, limit_status
+
+    def extract(
+        self, text: Optional[str], session: SQLSession
+    ) -> Tuple[Optional[str], Optional[List[tuple]], Optional[str]]:
+        """Extracts the query of a response, see candidates(text) and run(candidates, session)
+
+        :param text: The model response
+        :type text: Optional[str]
+        :param session: The session holding the tables to execute the candidates against
+        :type session: SQLSession
+        :return: The query kept, its result rows and the status of the last execution limit exceeded if any
+        :rtype: Tuple[Optional[str], Optional[List[tuple]], Optional[str]]
+        """
+
+        return self.run(self.candidates(text), session)
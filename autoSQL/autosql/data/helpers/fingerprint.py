@@ -0,0 +1,252 @@
+import json
+import math
+import hashlib
+import logging
+import datetime
+import functools
+from _decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import sqlglot
+from sqlglot import expressions as exp
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMATS = ("string", "fingerprint", "both")
+
+
+def canonical_value(value: Any, float_precision: int = 6) -> Any:
+    """Normalises a result value so that equal values returned by different engines compare equal
+
+    Booleans become integers, floats and decimals are rounded to float_precision significant digits (becoming integers when integral), temporal values become ISO formatted strings and bytes become hex strings.
+
+    :param value: The value to normalise
+    :type value: Any
+    :param float_precision: The number of significant digits floats are compared to, defaults to 6
+    :type float_precision: int, optional
+    :return: The normalised value
+    :rtype: Any
+    """
+
+    if value is None or isinstance(value, (str, int)) and not isinstance(value, bool):
+        return value
+
+    if isinstance(value, bool):
+        return int(value)
+
+    if isinstance(value, (float, Decimal)):
+        value = float(value)
+        if math.isnan(value) or math.isinf(value):
+            return str(value)
+        value = float(f"{value:.{float_precision}g}")
+        return int(value) if value.is_integer() else value
+
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+
+    return str(value)
+
+
+@functools.lru_cache(maxsize=65536)
+def query_is_ordered(query: Optional[str]) -> bool:
+    """Returns whether the order of the result rows of a query matters, i.e. whether the query has a top-level ORDER BY clause
+
+    :param query: The query
+    :type query: Optional[str]
+    :return: Whether the query is ordered, False if it cannot be parsed
+    :rtype: bool
+    """
+
+    if not query:
+        return False
+
+    try:
+        expression = sqlglot.parse_one(query)
+    except Exception:
+        return False
+
+    return isinstance(expression, (exp.Select, exp.Union)) and bool(expression.args.get("order"))
+
+
+def result_fingerprint(
+    rows: Optional[Iterable[tuple]],
+    ordered: bool = False,
+    float_precision: int = 6,
+    bits: int = 64,
+) -> str:
+    """Returns a compact fingerprint of a result, equal for results with the same canonical rows, see canonical_value()
+
+    The rows are compared as a multiset: the fingerprint is the sum of the hashes of the rows, computed in a single pass without sorting them. With ordered, the fingerprint of the rows in order is appended after a colon, so that ordered fingerprints still compare against unordered ones, see fingerprints_match(). The fingerprint of an empty result is all zeros.
+
+    :param rows: The result rows of a query
+    :type rows: Optional[Iterable[tuple]]
+    :param ordered: Whether the order of the rows matters, e.g. for queries with an ORDER BY clause, defaults to False
+    :type ordered: bool, optional
+    :param float_precision: The number of significant digits floats are compared to, defaults to 6
+    :type float_precision: int, optional
+    :param bits: The size of the fingerprint, either 64 or 128, defaults to 64
+    :type bits: int, optional
+    :return: The fingerprint as a hex string
+    :rtype: str
+    """
+
+    if bits not in (64, 128):
+        raise ValueError("bits must be either 64 or 128.")
+
+    digest_size = bits // 8
+    digest = hashlib.blake2b(digest_size=digest_size)
+    total = 0
+    count = 0
+
+    for row in rows or []:
+        encoded = json.dumps(
+            [canonical_value(value, float_precision) for value in row], default=str
+        ).encode("utf-8")
+        count += 1
+        total += int.from_bytes(hashlib.blake2b(encoded, digest_size=digest_size).digest(), "little")
+
+        if ordered:
+            digest.update(len(encoded).to_bytes(8, "little") + encoded)
+
+    if count == 0:
+        return empty_fingerprint(bits)
+
+    fingerprint = format(total % (1 << bits), f"0{bits // 4}x")
+
+    if ordered:
+        return f"{fingerprint}:{digest.hexdigest()}"
+
+    return fingerprint
+
+
+def fingerprints_match(fingerprint: str, correct_fingerprint: str) -> bool:
+    """Returns whether a fingerprint matches the correct fingerprint, comparing the rows in order if the correct fingerprint is ordered (i.e. its query has an ORDER BY clause) and as a multiset otherwise
+
+    :param fingerprint: The fingerprint to check
+    :type fingerprint: str
+    :param correct_fingerprint: The correct fingerprint
+    :type correct_fingerprint: str
+    :return: Whether the fingerprints match
+    :rtype: bool
+    """
+
+    multiset, _, ordered = fingerprint.partition(":")
+    correct_multiset, _, correct_ordered = correct_fingerprint.partition(":")
+
+    if correct_ordered:
+        return multiset == correct_multiset and ordered == correct_ordered
+
+    return multiset == correct_multiset
+
+
+def empty_fingerprint(bits: int = 64) -> str:
+    """Returns the fingerprint of an empty result
+
+    :param bits: The size of the fingerprint, either 64 or 128, defaults to 64
+    :type bits: int, optional
+    :return: The fingerprint as a hex string
+    :rtype: str
+    """
+
+    return "0" * (bits // 4)
+
+
+def encode_result(
+    rows: Optional[List[tuple]],
+    result_label: str,
+    result_format: str = "string",
+    format_result: Callable[[Optional[List[tuple]]], str] = str,
+    query: Optional[str] = None,
+    fingerprint_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Optional[str]]:
+    """Encodes the result of a valid query as stored within a dataset
+
+    :param rows: The result rows of the query
+    :type rows: Optional[List[tuple]]
+    :param result_label: The column to store the result in
+    :type result_label: str
+    :param result_format: How the result is stored, either "string" (the formatted rows), "fingerprint" (a fingerprint of the rows, see result_fingerprint()) or "both" (the formatted rows, and the fingerprint in the column result_label + "_fingerprint"), defaults to "string"
+    :type result_format: str, optional
+    :param format_result: The function formatting the rows, e.g. SQLBackend.format_result, defaults to str
+    :type format_result: Callable, optional
+    :param query: The query, whose rows are fingerprinted in order if it has an ORDER BY clause, see query_is_ordered(), defaults to None
+    :type query: Optional[str], optional
+    :param fingerprint_options: The arguments of result_fingerprint(): "ordered" (overriding the detection from the query), "float_precision" and "bits", defaults to None
+    :type fingerprint_options: Optional[Dict[str, Any]], optional
+    :return: The stored columns
+    :rtype: dict {result_label: str, result_label + "_fingerprint": str}
+    """
+
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            f"The result format {result_format} is not supported. Supported result formats: {RESULT_FORMATS}"
+        )
+
+    if result_format == "string":
+        return {result_label: format_result(rows)}
+
+    options = {"ordered": query_is_ordered(query), **(fingerprint_options or {})}
+    fingerprint = result_fingerprint(rows, **options)
+
+    if result_format == "fingerprint":
+        return {result_label: fingerprint}
+
+    return {result_label: format_result(rows), f"{result_label}_fingerprint": fingerprint}
+
+
+def encode_error(
+    error_result: str,
+    result_label: str,
+    result_format: str = "string",
+) -> Dict[str, Optional[str]]:
+    """Encodes the result of an invalid query as stored within a dataset, i.e. the error, without a fingerprint
+
+    :param error_result: The stored error, e.g. the name of the sqlglot error class
+    :type error_result: str
+    :param result_label: The column to store the result in
+    :type result_label: str
+    :param result_format: How results are stored, see encode_result(), defaults to "string"
+    :type result_format: str, optional
+    :return: The stored columns
+    :rtype: dict {result_label: str, result_label + "_fingerprint": None}
+    """
+
+    if result_format == "both":
+        return {result_label: error_result, f"{result_label}_fingerprint": None}
+
+    return {result_label: error_result}
+
+
+def results_match(
+    row: Dict[str, Any],
+    result_label: str,
+    correct_label: str,
+    result_format: str = "string",
+) -> bool:
+    """Returns whether two results of a row match, comparing their fingerprints with fingerprints_match() when both are stored
+
+    :param row: The dataset item
+    :type row: dict
+    :param result_label: The column holding the result to check
+    :type result_label: str
+    :param correct_label: The column holding the correct result
+    :type correct_label: str
+    :param result_format: How the results are stored, either "string", "fingerprint" or "both", defaults to "string"
+    :type result_format: str, optional
+    :return: Whether the results match
+    :rtype: bool
+    """
+
+    result_fingerprint_label = f"{result_label}_fingerprint"
+    correct_fingerprint_label = f"{correct_label}_fingerprint"
+
+    if row.get(result_fingerprint_label) is not None and row.get(correct_fingerprint_label) is not None:
+        return fingerprints_match(row[result_fingerprint_label], row[correct_fingerprint_label])
+
+    if result_format == "fingerprint" and row[result_label] is not None and row[correct_label] is not None:
+        return fingerprints_match(row[result_label], row[correct_label])
+
+    return row[result_label] == row[correct_label]
@@ -1,53 +1,309 @@
+import json
+import hashlib
 import logging
 from typing import Optional, Dict, List, Union
 
+import numpy as np
 from faker import Faker
 
+import sqlglot
+from sqlglot import expressions as exp
+
 logger = logging.getLogger(__name__)
 
+GENERATION_METHODS = ("faker", "bulk")
+
+# The family of values generated for every sqlglot DataType.Type, types without a scalar representation are generated as None
+TYPE_FAMILIES = {
+    **dict.fromkeys(
+        [
+            "TINYINT", "SMALLINT", "MEDIUMINT", "INT", "BIGINT", "INT128", "INT256",
+            "UTINYINT", "USMALLINT", "UMEDIUMINT", "UINT", "UBIGINT", "UINT128", "UINT256",
+            "SERIAL", "SMALLSERIAL", "BIGSERIAL",
+        ],
+        "int",
+    ),
+    **dict.fromkeys(
+        ["FLOAT", "DOUBLE", "DECIMAL", "BIGDECIMAL", "MONEY", "SMALLMONEY"], "float"
+    ),
+    **dict.fromkeys(
+        [
+            "CHAR", "NCHAR", "VARCHAR", "NVARCHAR", "TEXT", "TINYTEXT", "MEDIUMTEXT", "LONGTEXT",
+            "FIXEDSTRING", "LOWCARDINALITY", "ENUM", "ENUM8", "ENUM16", "SET", "USER-DEFINED", "UNKNOWN",
+        ],
+        "str",
+    ),
+    **dict.fromkeys(["BOOLEAN", "BIT"], "bool"),
+    "DATE": "date",
+    **dict.fromkeys(
+        ["DATETIME", "DATETIME64", "TIMESTAMP", "TIMESTAMPTZ", "TIMESTAMPLTZ"], "datetime"
+    ),
+    **dict.fromkeys(["TIME", "TIMETZ"], "time"),
+    "YEAR": "year",
+    "INTERVAL": "interval",
+    **dict.fromkeys(["UUID", "UNIQUEIDENTIFIER"], "uuid"),
+    **dict.fromkeys(["JSON", "JSONB", "VARIANT", "SUPER", "OBJECT", "HSTORE"], "json"),
+    "XML": "xml",
+    **dict.fromkeys(["INET", "IPADDRESS", "IPPREFIX"], "ip"),
+    **dict.fromkeys(
+        [
+            "BINARY", "VARBINARY", "TINYBLOB", "MEDIUMBLOB", "LONGBLOB", "IMAGE", "ROWVERSION",
+            "HLLSKETCH",
+        ],
+        "binary",
+    ),
+    **dict.fromkeys(["GEOGRAPHY", "GEOMETRY"], "geometry"),
+    **dict.fromkeys(
+        [
+            "ARRAY", "MAP", "STRUCT", "NESTED", "NULLABLE", "NULL",
+            "INT4RANGE", "INT4MULTIRANGE", "INT8RANGE", "INT8MULTIRANGE", "NUMRANGE", "NUMMULTIRANGE",
+            "TSRANGE", "TSMULTIRANGE", "TSTZRANGE", "TSTZMULTIRANGE", "DATERANGE", "DATEMULTIRANGE",
+        ],
+        "null",
+    ),
+}
+
+# The families whose bulk values are drawn from a pool of values pre-sampled with Faker
+POOLED_FAMILIES = ("str", "interval", "uuid", "json", "xml", "ip", "binary", "geometry")
+
+_EPOCH = np.datetime64("2000-01-01T00:00:00", "s")
+_EPOCH_SPAN = 25 * 365 * 86400
+
 
 class DataGenerator:
     """A helper class for generating data for the autoSQL dataset"""
 
-    def __init__(self) -> None:
-        """Initializes the class"""
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        method: str = "faker",
+        num_records: int = 5,
+        pool_size: int = 1000,
+    ) -> None:
+        """Initializes the class
+
+        :param seed: The seed used to make the generated data reproducible, defaults to None (i.e., unseeded)
+        :type seed: Optional[int], optional
+        :param method: How filler data is generated, either "faker" (one Faker call per cell) or "bulk" (whole columns drawn at once with numpy from pre-sampled value pools), defaults to "faker"
+        :type method: str, optional
+        :param num_records: The number of records generated for each table, defaults to 5
+        :type num_records: int, optional
+        :param pool_size: The number of values pre-sampled with Faker for each data type of the bulk method, defaults to 1000
+        :type pool_size: int, optional
+        """
+
+        if method not in GENERATION_METHODS:
+            raise ValueError(
+                f"The generation method {method} is not supported. Supported generation methods: {GENERATION_METHODS}"
+            )
 
+        self.seed = seed
+        self.method = method
+        self.num_records = num_records
+        self.pool_size = pool_size
         self.fake = Faker()
+        self.rng = np.random.default_rng(seed)
+        self.pools = {}
+        self.unsupported_types = {}
+
+        if seed is not None:
+            self.fake.seed_instance(seed)
 
     def __repr__(self):
         items = ("{}={!r}".format(k, self.__dict__[k]) for k in self.__dict__)
         return "{}({})".format(type(self).__name__, ", ".join(items))
 
+    def __setstate__(self, state) -> None:
+        """Restores the class when unpickled, e.g. within a worker process. An unseeded generator is reseeded so that worker processes do not repeat the random state of the process they were copied from."""
+
+        self.__dict__.update(state)
+
+        if self.seed is None:
+            self.fake.seed_instance(None)
+            self.rng = np.random.default_rng()
+
+    def seed_record(self, key: str) -> None:
+        """Reseeds the generator from the class seed and a key, so that the data generated for a key is reproducible regardless of the process, or the order, in which it is generated. Does nothing for an unseeded generator.
+
+        :param key: The key to reseed the generator with, e.g. the column types of a datum
+        :type key: str
+        """
+
+        if self.seed is not None:
+            self.fake.seed_instance(f"{self.seed}:{key}")
+            self.rng = np.random.default_rng(DataGenerator._key_seed(f"{self.seed}:{key}"))
+
+    @staticmethod
+    def _key_seed(key: str) -> int:
+        """Returns a numpy seed derived from a key, which is stable across processes unlike hash(key)"""
+
+        return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "little")
+
+    def value_pool(self, family: str) -> np.ndarray:
+        """Returns the pool of values the bulk method draws the values of a type family from, sampling it with Faker on first use. The pool of a seeded generator depends only on the seed and the type family.
+
+        :param family: The type family of the pool, one of POOLED_FAMILIES
+        :type family: str
+        :return: The values of the pool
+        :rtype: numpy.ndarray
+        """
+
+        if family not in self.pools:
+            fake = Faker()
+
+            if self.seed is not None:
+                fake.seed_instance(f"{self.seed}:pool:{family}")
+
+            self.pools[family] = np.array(
+                [DataGenerator._fake_value(fake, family) for _ in range(self.pool_size)],
+                dtype=object,
+            )
+
+        return self.pools[family]
+
+    def type_family(self, data_type: str) -> str:
+        """Returns the family of values generated for a data type, warning once per unsupported data type rather than once per value
+
+        :param data_type: The data type, a sqlglot DataType.Type value
+        :type data_type: str
+        :return: The type family, "null" for unsupported data types
+        :rtype: str
+        """
+
+        family = TYPE_FAMILIES.get(data_type)
+
+        if family is None:
+            if data_type not in self.unsupported_types:
+                logger.warning(f"Data type {data_type} is not supported. Returning None.")
+            self.unsupported_types[data_type] = self.unsupported_types.get(data_type, 0) + 1
+            return "null"
+
+        return family
+
+    @staticmethod
+    def _fake_value(fake: Faker, family: str) -> Union[str, int, float, bool, None]:
+        """Generates a random value of a type family with Faker. Temporal values are generated as ISO formatted strings."""
+
+        if family == "int":
+            return fake.random_int(min=1, max=100)
+        elif family == "float":
+            return round(fake.pyfloat(min_value=1, max_value=100), 2)
+        elif family == "str":
+            return fake.name()
+        elif family == "bool":
+            return fake.pybool()
+        elif family == "date":
+            return fake.date()
+        elif family == "datetime":
+            return fake.date_time().strftime("%Y-%m-%d %H:%M:%S")
+        elif family == "time":
+            return fake.time()
+        elif family == "year":
+            return int(fake.year())
+        elif family == "interval":
+            return f"{fake.random_int(min=1, max=30)} days"
+        elif family == "uuid":
+            return fake.uuid4()
+        elif family == "json":
+            return json.dumps({fake.word(): fake.random_int(min=1, max=100)})
+        elif family == "xml":
+            return f"<value>{fake.word()}</value>"
+        elif family == "ip":
+            return fake.ipv4()
+        elif family == "binary":
+            return fake.sha1()
+        elif family == "geometry":
+            return f"POINT({fake.longitude()} {fake.latitude()})"
+        return None
+
     #################################
     # Data Generation Functions     #
     #################################
 
-    def generate_random_data(self, data_type) -> Union[str, int, None]:
-        """Generates random data for a given data type. Currently only supports VARCHAR and INT data types.
+    def generate_random_data(self, data_type) -> Union[str, int, float, bool, None]:
+        """Generates random data for a given data type. Supports every sqlglot DataType.Type, see TYPE_FAMILIES.
 
         :param data_type: The data type to generate random data for
         :type data_type: str
         :return: Random data for a given data type
-        :rtype: str, int, or None
+        :rtype: str, int, float, bool, or None
         """
 
-        if data_type == "VARCHAR":
-            return self.fake.name()
-        elif data_type == "INT":
-            return self.fake.random_int(min=1, max=100)
-        else:
-            logger.warning(f"Data type {data_type} is not supported. Returning None.")
-            return None
+        return DataGenerator._fake_value(self.fake, self.type_family(data_type))
+
+    def generate_random_column(
+        self, data_type, num_records
+    ) -> List[Union[str, int, float, bool, None]]:
+        """Generates a column of random data for a given data type at once with numpy. Supports every sqlglot DataType.Type, see TYPE_FAMILIES.
+
+        :param data_type: The data type to generate random data for
+        :type data_type: str
+        :param num_records: The number of values to generate
+        :type num_records: int
+        :return: Random data for a given data type
+        :rtype: list
+        """
+
+        family = self.type_family(data_type)
+
+        if family in POOLED_FAMILIES:
+            pool = self.value_pool(family)
+            return pool[self.rng.integers(0, len(pool), size=num_records)].tolist()
+        elif family == "int":
+            return self.rng.integers(1, 101, size=num_records).tolist()
+        elif family == "float":
+            return np.round(self.rng.uniform(1, 100, size=num_records), 2).tolist()
+        elif family == "bool":
+            return (self.rng.random(size=num_records) < 0.5).tolist()
+        elif family == "year":
+            return self.rng.integers(1990, 2024, size=num_records).tolist()
+        elif family in ("date", "datetime"):
+            offsets = self.rng.integers(0, _EPOCH_SPAN, size=num_records)
+            unit = "D" if family == "date" else "s"
+            values = np.datetime_as_string(_EPOCH + offsets, unit=unit).tolist()
+            return [value.replace("T", " ") for value in values]
+        elif family == "time":
+            seconds = self.rng.integers(0, 86400, size=num_records).tolist()
+            return [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds]
+        return [None] * num_records
 
     def generate_filler_data(
-        self, column_types, num_records=5
+        self, column_types, num_records=None, literals=None
     ) -> Dict[str, List[Dict[str, Union[str, int, None]]]]:
-        """Generates filler data for a given set of column types. Currently only supports VARCHAR and INT data types.
+        """Generates filler data for a given set of column types. Supports every sqlglot DataType.Type, see TYPE_FAMILIES.
 
         :param column_types: The column types to generate filler data for
         :type column_types: dict {"table_name": {"column_name": "column_type"}}
-        :param num_records: The number of records to generate for each table, defaults to 5
+        :param num_records: The number of records to generate for each table, defaults to None (i.e., the num_records of the class)
         :type num_records: int, optional
+        :param literals: Values to place within the first records of the columns of the same name, e.g. mined from a query with mine_literals(query), defaults to None
+        :type literals: dict {"column_name": [value, ...]}, optional
+        :return: Filler data for a given set of column types
+        :rtype: dict {"table_name": [{"column_name": generate_random_data()}, ... num_records]}
+        """
+
+        if num_records is None:
+            num_records = self.num_records
+
+        if self.method == "bulk":
+            filler_data = self.generate_bulk_filler_data(column_types, num_records)
+        else:
+            filler_data = self.generate_faker_filler_data(column_types, num_records)
+
+        if literals:
+            DataGenerator._insert_literals(filler_data, column_types, literals)
+
+        return filler_data
+
+    def generate_faker_filler_data(
+        self, column_types, num_records
+    ) -> Dict[str, List[Dict[str, Union[str, int, None]]]]:
+        """Generates filler data for a given set of column types one value at a time with generate_random_data(). Supports every sqlglot DataType.Type, see TYPE_FAMILIES.
+
+        :param column_types: The column types to generate filler data for
+        :type column_types: dict {"table_name": {"column_name": "column_type"}}
+        :param num_records: The number of records to generate for each table
+        :type num_records: int
         :return: Filler data for a given set of column types
         :rtype: dict {"table_name": [{"column_name": generate_random_data()}, ... num_records]}
         """
@@ -64,3 +320,136 @@ class DataGenerator:
                 filler_data[table_name].append(record)
 
         return filler_data
+
+    def generate_bulk_filler_data(
+        self, column_types, num_records
+    ) -> Dict[str, List[Dict[str, Union[str, int, None]]]]:
+        """Generates filler data for a given set of column types one column at a time with generate_random_column(). Supports every sqlglot DataType.Type, see TYPE_FAMILIES.
+
+        :param column_types: The column types to generate filler data for
+        :type column_types: dict {"table_name": {"column_name": "column_type"}}
+        :param num_records: The number of records to generate for each table
+        :type num_records: int
+        :return: Filler data for a given set of column types
+        :rtype: dict {"table_name": [{"column_name": value}, ... num_records]}
+        """
+
+        filler_data = {}
+
+        for table_name, columns in column_types.items():
+            column_names = list(columns.keys())
+            values = [
+                self.generate_random_column(data_type, num_records)
+                for data_type in columns.values()
+            ]
+
+            if column_names:
+                filler_data[table_name] = [
+                    dict(zip(column_names, row)) for row in zip(*values)
+                ]
+            else:
+                filler_data[table_name] = [{} for _ in range(num_records)]
+
+        return filler_data
+
+    @staticmethod
+    def _insert_literals(filler_data, column_types, literals) -> None:
+        """Overwrites the first records of every column with a mined literal of the same name, cast to the type family of the column, so that the filters of the query match rows"""
+
+        for table_name, columns in column_types.items():
+            records = filler_data[table_name]
+            for column_name, data_type in columns.items():
+                values = literals.get(column_name.lower(), [])
+                family = TYPE_FAMILIES.get(data_type, "null")
+                for record, value in zip(records, values):
+                    value = _cast_literal(value, family)
+                    if value is not None:
+                        record[column_name] = value
+
+
+def _cast_literal(value: Union[str, int, float], family: str) -> Union[str, int, float, bool, None]:
+    """Casts a literal to the values generated for a type family, returning None if it cannot be cast"""
+
+    try:
+        if family in ("int", "year"):
+            return int(float(value))
+        elif family == "float":
+            return float(value)
+        elif family == "bool":
+            return str(value).lower() in ("1", "true", "t", "yes")
+        elif family == "null":
+            return None
+        return str(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _literal_value(expression) -> Union[str, int, float, None]:
+    """Returns the python value of a literal expression, or None if the expression is not a literal"""
+
+    if isinstance(expression, exp.Neg):
+        value = _literal_value(expression.this)
+        return -value if isinstance(value, (int, float)) else None
+
+    if not isinstance(expression, exp.Literal):
+        return None
+
+    if expression.is_string:
+        return expression.this
+
+    try:
+        return int(expression.this)
+    except ValueError:
+        return float(expression.this)
+
+
+def mine_literals(query: str) -> Dict[str, List[Union[str, int, float]]]:
+    """Mines the literals that the columns of a query are compared against within its WHERE and HAVING clauses, so that filler data can be generated that the filters of the query match
+
+    Comparisons are adjusted to a matching value (e.g. age > 56 mines 57), and LIKE patterns are filled in (e.g. 'A%' mines 'A').
+
+    :param query: The query to mine
+    :type query: str
+    :return: The mined literals of every compared column, keyed on the lowercased column name
+    :rtype: dict {"column_name": [value, ...]}
+    """
+
+    try:
+        expression = sqlglot.parse_one(query)
+    except Exception:
+        return {}
+
+    if expression is None:
+        return {}
+
+    literals = {}
+
+    def add(column, value):
+        if isinstance(column, exp.Column) and value is not None:
+            values = literals.setdefault(column.name.lower(), [])
+            if value not in values:
+                values.append(value)
+
+    for clause in expression.find_all(exp.Where, exp.Having):
+        for node in clause.find_all(exp.Predicate):
+            if isinstance(node, exp.In):
+                for value in node.expressions:
+                    add(node.this, _literal_value(value))
+            elif isinstance(node, exp.Between):
+                add(node.this, _literal_value(node.args.get("low")))
+            elif isinstance(node, (exp.Like, exp.ILike)):
+                value = _literal_value(node.expression)
+                if isinstance(value, str):
+                    add(node.this, value.replace("%", "").replace("_", "a"))
+            elif isinstance(node, (exp.EQ, exp.GT, exp.GTE, exp.LT, exp.LTE)):
+                column, value = node.this, _literal_value(node.expression)
+                flipped = not isinstance(column, exp.Column)
+                if flipped:
+                    column, value = node.expression, _literal_value(node.this)
+                if isinstance(value, (int, float)) and isinstance(node, (exp.GT, exp.LT)):
+                    # Step over strict bounds, e.g. age > 56 and its flipped form 56 < age both mine 57, age < 56 mines 55
+                    step = 1 if isinstance(node, exp.GT) != flipped else -1
+                    value = value + step
+                add(column, value)
+
+    return literals
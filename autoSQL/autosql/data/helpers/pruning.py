@@ -0,0 +1,168 @@
+import re
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import sqlglot
+
+logger = logging.getLogger(__name__)
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _terms(text: str) -> Set[str]:
+    """Returns the lower case terms of a question or an identifier, splitting identifiers on underscores and reducing plurals, e.g. "num_employees" -> {"num", "employee"}"""
+
+    terms = set()
+
+    for term in _TERM_PATTERN.findall(text.lower()):
+        if len(term) > 3 and term.endswith("ies"):
+            term = term[:-3] + "y"
+        elif len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.add(term)
+
+    return terms
+
+
+def link_schema(
+    column_types: Dict[str, Dict[str, str]],
+    question: str,
+    prune_columns: bool = False,
+) -> Dict[str, Dict[str, str]]:
+    """Links the tables and columns of a schema to a question by lexical matching, returning the part of the schema relevant to the question
+
+    A table is relevant if its name or one of its columns shares a term with the question. With prune_columns, only the columns sharing a term with the question and key columns (e.g. "head_id") are kept, unless no column of the table matches.
+    If no table matches, the whole schema is returned.
+
+    :param column_types: The column types of every table, as {"table_name": {"column_name": "column_type"}}
+    :type column_types: Dict[str, Dict[str, str]]
+    :param question: The question asked of the schema
+    :type question: str
+    :param prune_columns: Whether to remove the columns of relevant tables that do not match the question, defaults to False
+    :type prune_columns: bool, optional
+    :return: The relevant tables and columns
+    :rtype: dict {"table_name": {"column_name": "column_type"}}
+    """
+
+    question_terms = _terms(question)
+    linked = {}
+
+    for table, columns in column_types.items():
+        matched = {column for column in columns if _terms(column) & question_terms}
+
+        if not matched and not _terms(table) & question_terms:
+            continue
+
+        if prune_columns and matched:
+            linked[table] = {
+                column: column_type
+                for column, column_type in columns.items()
+                if column in matched or "id" in _terms(column)
+            }
+        else:
+            linked[table] = dict(columns)
+
+    return linked or column_types
+
+
+def _split_definitions(text: str) -> Optional[Tuple[str, List[str], str]]:
+    """Splits the text of a CREATE table statement around the commas separating its column definitions and constraints, ignoring the commas within parentheses (e.g. DECIMAL(10, 2)) and quotes
+
+    :param text: The CREATE table statement
+    :type text: str
+    :return: The text up to the opening parenthesis, the text of every definition and the text from the closing parenthesis, or None if the parentheses are unbalanced
+    :rtype: Optional[Tuple[str, List[str], str]]
+    """
+
+    start = text.find("(")
+
+    if start == -1:
+        return None
+
+    definitions = []
+    depth = 0
+    quote = None
+    last = start + 1
+
+    for index in range(start + 1, len(text)):
+        character = text[index]
+
+        if quote is not None:
+            if character == quote:
+                quote = None
+        elif character in "'\"`":
+            quote = character
+        elif character == "(":
+            depth += 1
+        elif character == ")":
+            if depth == 0:
+                definitions.append(text[last:index])
+                return text[:start + 1], definitions, text[index:]
+            depth -= 1
+        elif character == "," and depth == 0:
+            definitions.append(text[last:index])
+            last = index + 1
+
+    return None
+
+
+def prune_context(
+    context: str,
+    question: str,
+    column_types: Dict[str, Dict[str, str]],
+    prune_columns: bool = False,
+) -> str:
+    """Removes the CREATE table statements, and optionally the columns, of a context that are not relevant to a question, see link_schema()
+
+    The statements retain their original text, the definitions of the pruned columns being cut out of the statements that lose columns.
+
+    :param context: The CREATE table statements, separated by semicolons
+    :type context: str
+    :param question: The question asked of the context
+    :type question: str
+    :param column_types: The column types parsed from the context
+    :type column_types: Dict[str, Dict[str, str]]
+    :param prune_columns: Whether to remove the columns of relevant tables that do not match the question, defaults to False
+    :type prune_columns: bool, optional
+    :return: The pruned context
+    :rtype: str
+    """
+
+    linked = link_schema(column_types, question, prune_columns)
+
+    if linked == column_types:
+        return context
+
+    statements = sqlglot.parse(context)
+    texts = [text.strip() for text in context.split(";") if text.strip()]
+    pruned = []
+
+    for index, statement in enumerate(statements):
+        table = statement.find(sqlglot.expressions.Identifier).this
+
+        if table not in linked:
+            continue
+
+        if len(linked[table]) == len(column_types.get(table, {})) and len(texts) == len(statements):
+            pruned.append(texts[index])
+            continue
+
+        kept = [
+            column.find(sqlglot.expressions.Identifier).this in linked[table]
+            for column in statement.this.expressions
+        ]
+        split = _split_definitions(texts[index]) if len(texts) == len(statements) else None
+
+        if split is not None and len(split[1]) == len(kept):
+            head, definitions, tail = split
+            definitions = [definition for definition, keep in zip(definitions, kept) if keep]
+            pruned.append(head + ",".join(definitions).lstrip() + tail)
+            continue
+
+        # The definitions cannot be matched to the text of the statement, which is regenerated instead
+        for column, keep in zip(list(statement.this.expressions), kept):
+            if not keep:
+                column.pop()
+        pruned.append(statement.sql())
+
+    return "; ".join(pruned)
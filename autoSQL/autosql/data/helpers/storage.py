@@ -0,0 +1,276 @@
+import json
+import logging
+from typing import Optional, Dict, List, Union
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+STORAGE_FORMATS = ("json", "native")
+
+COLUMN_TYPES_TYPE = pa.list_(
+    pa.struct(
+        [
+            ("table_name", pa.string()),
+            ("column_names", pa.list_(pa.string())),
+            ("column_types", pa.list_(pa.string())),
+        ]
+    )
+)
+
+FILLER_DATA_TYPE = pa.list_(
+    pa.struct(
+        [
+            ("table_name", pa.string()),
+            ("num_rows", pa.int64()),
+            (
+                "columns",
+                pa.list_(
+                    pa.struct(
+                        [
+                            ("column_name", pa.string()),
+                            ("value_type", pa.string()),
+                            ("int_values", pa.list_(pa.int64())),
+                            ("float_values", pa.list_(pa.float64())),
+                            ("str_values", pa.list_(pa.string())),
+                            ("bool_values", pa.list_(pa.bool_())),
+                        ]
+                    )
+                ),
+            ),
+        ]
+    )
+)
+
+TUNING_FORMAT_TYPE = pa.struct([("prompt", pa.string()), ("completion", pa.string())])
+
+NATIVE_TYPES = {
+    "column_types": COLUMN_TYPES_TYPE,
+    "filler_data": FILLER_DATA_TYPE,
+    "tuning_format": TUNING_FORMAT_TYPE,
+}
+
+_VALUE_TYPES = {int: "int", float: "float", str: "str", bool: "bool"}
+
+
+def _check_storage_format(storage_format: str) -> None:
+    """Raises a ValueError if the storage format is not supported
+
+    :param storage_format: The storage format to check
+    :type storage_format: str
+    """
+
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(
+            f"The storage format {storage_format} is not supported. Supported storage formats: {STORAGE_FORMATS}"
+        )
+
+
+def dump_column_types(
+    column_types: Dict[str, Dict[str, str]], storage_format: str = "json"
+) -> Union[str, List[Dict]]:
+    """Encodes column types for storage within a dataset
+
+    :param column_types: The column types to encode
+    :type column_types: dict {"table_name": {"column_name": "column_type"}}
+    :param storage_format: The storage format to encode the column types as, either "json" or "native", defaults to "json"
+    :type storage_format: str, optional
+    :return: A JSON string, or a list of tables matching COLUMN_TYPES_TYPE
+    :rtype: Union[str, List[dict]]
+    """
+
+    _check_storage_format(storage_format)
+
+    if storage_format == "json":
+        return json.dumps(column_types)
+
+    return [
+        {
+            "table_name": table_name,
+            "column_names": list(columns.keys()),
+            "column_types": list(columns.values()),
+        }
+        for table_name, columns in column_types.items()
+    ]
+
+
+def load_column_types(value: Union[str, List[Dict]]) -> Dict[str, Dict[str, str]]:
+    """Decodes column types stored within a dataset in either storage format
+
+    :param value: The stored column types
+    :type value: Union[str, List[dict]]
+    :return: The column types
+    :rtype: dict {"table_name": {"column_name": "column_type"}}
+    """
+
+    if isinstance(value, str):
+        return json.loads(value)
+
+    return {
+        table["table_name"]: dict(zip(table["column_names"], table["column_types"]))
+        for table in value
+    }
+
+
+def _dump_values(values: List) -> Dict[str, Union[str, List, None]]:
+    """Encodes the values of a filler data column into the typed value list matching their python type. Columns of mixed types are stored as JSON strings."""
+
+    value_types = {type(value) for value in values if value is not None}
+
+    if not value_types:
+        value_type = "str"
+    elif len(value_types) == 1:
+        value_type = _VALUE_TYPES.get(value_types.pop(), "json")
+    else:
+        value_type = "json"
+
+    column = {
+        "value_type": value_type,
+        "int_values": [],
+        "float_values": [],
+        "str_values": [],
+        "bool_values": [],
+    }
+
+    if value_type == "json":
+        column["str_values"] = [json.dumps(value) for value in values]
+    else:
+        column[f"{value_type}_values"] = list(values)
+
+    return column
+
+
+def _load_values(column: Dict) -> List:
+    """Decodes the values of a filler data column"""
+
+    if column["value_type"] == "json":
+        return [json.loads(value) for value in column["str_values"]]
+
+    return column[f"{column['value_type']}_values"]
+
+
+def dump_filler_data(
+    filler_data: Dict[str, List[Dict[str, Union[str, int, None]]]],
+    storage_format: str = "json",
+) -> Union[str, List[Dict]]:
+    """Encodes filler data for storage within a dataset
+
+    :param filler_data: The filler data to encode
+    :type filler_data: dict {"table_name": [{"column_name": value}, ...]}
+    :param storage_format: The storage format to encode the filler data as, either "json" or "native", defaults to "json"
+    :type storage_format: str, optional
+    :return: A JSON string, or a list of column oriented tables matching FILLER_DATA_TYPE
+    :rtype: Union[str, List[dict]]
+    """
+
+    _check_storage_format(storage_format)
+
+    if storage_format == "json":
+        return json.dumps(filler_data)
+
+    tables = []
+
+    for table_name, records in filler_data.items():
+        column_names = list(records[0].keys()) if records else []
+        columns = []
+        for column_name in column_names:
+            column = _dump_values([record.get(column_name) for record in records])
+            column["column_name"] = column_name
+            columns.append(column)
+        tables.append(
+            {"table_name": table_name, "num_rows": len(records), "columns": columns}
+        )
+
+    return tables
+
+
+def load_filler_data(
+    value: Union[str, List[Dict]]
+) -> Dict[str, List[Dict[str, Union[str, int, None]]]]:
+    """Decodes filler data stored within a dataset in either storage format
+
+    :param value: The stored filler data
+    :type value: Union[str, List[dict]]
+    :return: The filler data
+    :rtype: dict {"table_name": [{"column_name": value}, ...]}
+    """
+
+    if isinstance(value, str):
+        return json.loads(value)
+
+    filler_data = {}
+
+    for table in value:
+        column_names = [column["column_name"] for column in table["columns"]]
+        columns = [_load_values(column) for column in table["columns"]]
+
+        if columns:
+            records = [dict(zip(column_names, row)) for row in zip(*columns)]
+        else:
+            records = [{} for _ in range(table["num_rows"])]
+
+        filler_data[table["table_name"]] = records
+
+    return filler_data
+
+
+def dump_tuning_format(
+    tuning_format: Dict[str, str], storage_format: str = "json"
+) -> Union[str, Dict[str, str]]:
+    """Encodes tuning data for storage within a dataset
+
+    :param tuning_format: The tuning data to encode
+    :type tuning_format: dict {"prompt": str, "completion": str}
+    :param storage_format: The storage format to encode the tuning data as, either "json" or "native", defaults to "json"
+    :type storage_format: str, optional
+    :return: A JSON string, or the tuning data matching TUNING_FORMAT_TYPE
+    :rtype: Union[str, dict]
+    """
+
+    _check_storage_format(storage_format)
+
+    if storage_format == "json":
+        return json.dumps(tuning_format)
+
+    return tuning_format
+
+
+def load_tuning_format(value: Union[str, Dict[str, str]]) -> Dict[str, str]:
+    """Decodes tuning data stored within a dataset in either storage format
+
+    :param value: The stored tuning data
+    :type value: Union[str, dict]
+    :return: The tuning data
+    :rtype: dict {"prompt": str, "completion": str}
+    """
+
+    if isinstance(value, str):
+        return json.loads(value)
+
+    return value
+
+
+STORAGE_CODECS = {
+    "column_types": (dump_column_types, load_column_types),
+    "filler_data": (dump_filler_data, load_filler_data),
+    "tuning_format": (dump_tuning_format, load_tuning_format),
+}
+
+
+def storage_array(column_name: str, values: List) -> pa.Array:
+    """Converts the values of a column to a pyarrow array, using the native type of the column if it is stored natively
+
+    :param column_name: The name of the column
+    :type column_name: str
+    :param values: The values of the column
+    :type values: list
+    :return: The values of the column as a pyarrow array
+    :rtype: pyarrow.Array
+    """
+
+    if column_name in NATIVE_TYPES and any(
+        not isinstance(value, str) for value in values if value is not None
+    ):
+        return pa.array(values, type=NATIVE_TYPES[column_name])
+
+    return pa.array(values)
@@ -0,0 +1,36 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text, at roughly four characters per token
+
+    :param text: The text to estimate the tokens of
+    :type text: str
+    :return: The estimated number of tokens
+    :rtype: int
+    """
+
+    return len(text) // 4 + 1
+
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens of a text with tiktoken's cl100k_base encoding if tiktoken is installed, otherwise estimates them with estimate_tokens()
+
+    :param text: The text to count the tokens of
+    :type text: str
+    :return: The number of tokens
+    :rtype: int
+    """
+
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+
+    return estimate_tokens(text)
@@ -1,12 +1,38 @@
 import json
 import requests
+from typing import Iterable, Iterator, Optional, Union
+
+def _streamed_gist_body(data: dict, filename: str, chunks: Iterable[str]) -> Iterator[bytes]:
+    """Yields the JSON body of a gist request one chunk of the file content at a time, so that the content is never held in memory as a whole
+
+    :param data: The data of the gist request, whose file content is empty
+    :type data: dict
+    :param filename: The name of the file of the gist
+    :type filename: str
+    :param chunks: The chunks of the file content, joined with new lines
+    :type chunks: Iterable[str]
+    :return: The encoded chunks of the request body
+    :rtype: Iterator[bytes]
+    """
+
+    # The body ends with the empty content string of the file, i.e. ""}}}
+    body = json.dumps(data)
+    yield body[:-4].encode("utf-8")
+
+    for index, chunk in enumerate(chunks):
+        yield (("\\n" if index else "") + json.dumps(chunk)[1:-1]).encode("utf-8")
+
+    yield body[-4:].encode("utf-8")
+
 
 def create_gist(
         token: str, 
         filename: str, 
-        content: any, 
+        content: Union[str, Iterable[str]], 
         description: str="", 
-        is_public: bool=True
+        is_public: bool=True,
+        session: Optional[requests.Session]=None,
+        timeout: Optional[float]=60.0,
     ):
     """Create a gist on GitHub.
 
@@ -14,12 +40,16 @@ def create_gist(
     :type token: str
     :param filename: Name of the file to be created in the gist
     :type filename: str
-    :param content: Content of the file
-    :type content: any
+    :param content: Content of the file, or chunks of the content joined with new lines, which are streamed within the request
+    :type content: Union[str, Iterable[str]]
     :param description: Description for the gist, defaults to ""
     :type description: str, optional
     :param is_public: Whether the gist should be public, defaults to True
     :type is_public: bool, optional
+    :param session: A session to reuse the connection of, defaults to None (i.e., a new connection)
+    :type session: Optional[requests.Session], optional
+    :param timeout: The number of seconds before the request times out, defaults to 60.0
+    :type timeout: Optional[float], optional
     :return: Response from the GitHub API
     :rtype: dict
     """
@@ -39,13 +69,16 @@ def create_gist(
         "public": is_public,
         "files": {
             filename: {
-                "content": content
+                "content": content if isinstance(content, str) else ""
             }
         }
     }
 
+    # Stream the content rather than encoding it in memory as a whole
+    body = json.dumps(data) if isinstance(content, str) else _streamed_gist_body(data, filename, content)
+
     # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+    response = (session or requests).post(url, headers=headers, data=body, timeout=timeout)
     
     # Return the response as a dictionary
     return response.json()
\ No newline at end of file
@@ -1,8 +1,10 @@
 import re
 import json
 import logging
+import itertools
+from collections import Counter
 from _decimal import Decimal
-from typing import Optional, Dict, List, Union
+from typing import Any, Optional, Dict, List, Tuple, Union
 
 from datasets import load_dataset, Dataset, DatasetDict
 
@@ -19,6 +21,20 @@ from sqlglot.errors import (
     OptimizeError,
 )
 
+from ..data.helpers import (
+    ExecutionLimitError,
+    SQLBackend,
+    SQLExtractor,
+    count_tokens,
+    encode_error,
+    encode_result,
+    get_backend,
+    group_table_sets,
+    load_filler_data,
+    queries_equivalent,
+    results_match,
+)
+
 logger = logging.getLogger(__name__)
 
 class SQLEval: 
@@ -41,31 +57,205 @@ class SQLEval:
         query_label: str="openai_inference", 
         data_label: str="filler_data", 
         result_label: str="openai_result", 
-        valid_label: str="openai_valid"
+        valid_label: str="openai_valid",
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        answer_label: Optional[str]=None,
+        correct_label: str="query_result",
     ):
         """Validates the query against the provided filler data and returns the query result
         
         :param dataset: The dataset item to validate.
         :type dataset: dict
+        :param backend: The backend used to execute the query, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query result is stored, either "string", "fingerprint" (a compact fingerprint of the canonical rows) or "both" (the string, and the fingerprint in the column result_label + "_fingerprint"), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param answer_label: The column holding the answer, see validate_queries_batch(). A query sharing the normalised AST of the answer is given the correct result without being executed, and the method used ("ast_match" or "execution") is stored in the column result_label + "_method". Defaults to None (i.e., the query is executed)
+        :type answer_label: Optional[str], optional
+        :param correct_label: The column holding the result of the answer, defaults to "query_result"
+        :type correct_label: str, optional
         :return: A dictionary containing the query result and whether or not the query is valid
         :rtype: dict {result_label: str, valid_label: bool}
         """
         
+        if answer_label is not None:
+            dataset[f"{result_label}_method"] = "execution"
+
         try:
-            tables = json.loads(dataset[data_label])
             query = dataset[query_label]["choices"][0]["message"]['content']
-            result = execute(query, tables=tables)
-            dataset[result_label] = str(result.rows) if result.rows is not None else ""
+            matched = SQLEval._ast_match_result(query, dataset, answer_label, correct_label, result_label, result_format)
+            if matched is not None:
+                dataset.update(matched)
+                dataset[valid_label] = True
+                dataset[f"{result_label}_method"] = "ast_match"
+                return dataset
+
+            tables = load_filler_data(dataset[data_label])
+            backend = get_backend(backend)
+            dataset.update(encode_result(backend.execute(query, tables), result_label, result_format, backend.format_result, query, fingerprint_options))
             dataset[valid_label] = True
             return dataset
-        except (ExecuteError, OptimizeError, TokenError, SchemaError, ParseError, UnsupportedError, SqlglotError) as specific_error:
-            dataset[result_label] = type(specific_error).__name__
-            dataset[valid_label] = False
-            return dataset
-        except Exception as general_error:
-            dataset[result_label] = str(general_error)
+        except Exception as e:
+            dataset.update(encode_error(SQLEval._error_result(e), result_label, result_format))
             dataset[valid_label] = False
             return dataset
+
+    @staticmethod
+    def _error_result(error: Exception) -> str:
+        """Returns the result stored for a query that raised an error, the status of an exceeded execution limit ("Timeout" or "ResourceLimit"), naming the sqlglot error class or otherwise the error message"""
+
+        if isinstance(error, ExecutionLimitError):
+            return error.status
+        if isinstance(error, (ExecuteError, OptimizeError, TokenError, SchemaError, ParseError, UnsupportedError, SqlglotError)):
+            return type(error).__name__
+        return str(error)
+
+    @staticmethod
+    def _inference_query(inference) -> str:
+        """Returns the query of an inference, either an OpenAI chat completion response or the query itself"""
+
+        if isinstance(inference, dict):
+            return inference["choices"][0]["message"]["content"]
+        return inference
+
+    @staticmethod
+    def _answer_succeeded(row: Dict, correct_label: str, result_format: str) -> bool:
+        """Returns whether the answer of a row ran, according to its valid_query column if the row has one (see SQLData.validate_query()), otherwise whether its stored result is a result rather than an error status"""
+
+        if "valid_query" in row:
+            return bool(row["valid_query"])
+
+        result = row.get(correct_label)
+
+        if result is None:
+            return False
+        if result_format == "both":
+            return row.get(f"{correct_label}_fingerprint") is not None
+        if result_format == "fingerprint":
+            return re.fullmatch(r"[0-9a-f]+(:[0-9a-f]+)?", result) is not None
+        return result.startswith("[")
+
+    @staticmethod
+    def _ast_match_result(
+        query: str,
+        row: Dict,
+        answer_label: Optional[str],
+        correct_label: str,
+        result_label: str,
+        result_format: str,
+    ) -> Optional[Dict]:
+        """Returns the correct result stored as the result of a query sharing the normalised AST of the answer, see queries_equivalent(), or None if the query has to be executed, e.g. because the answer is invalid"""
+
+        if answer_label is None or not SQLEval._answer_succeeded(row, correct_label, result_format):
+            return None
+
+        if not queries_equivalent(query, row[answer_label]):
+            return None
+
+        columns = {result_label: row[correct_label]}
+        if result_format == "both":
+            columns[f"{result_label}_fingerprint"] = row.get(f"{correct_label}_fingerprint")
+        return columns
+
+    @staticmethod
+    def validate_queries_batch(
+        batch: Dict[str, List],
+        query_labels: List[str]=["openai_inference", "replicate_inference"],
+        result_labels: List[str]=["openai_result", "replicate_result"],
+        valid_labels: List[str]=["openai_valid", "replicate_valid"],
+        data_label: str="filler_data",
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        answer_label: Optional[str]=None,
+        correct_label: str="query_result",
+    ):
+        """Validates the queries of several inference columns against the provided filler data in one pass, for use with dataset.map(..., batched=True)
+
+        The tables of each unique filler data within the batch are materialised once, and every query of the rows sharing them is executed against the same tables.
+        With answer_label, queries sharing the normalised AST of the answer (e.g. differing only by whitespace, casing, quoting or alias names) are given the correct result without being executed, and the method used for each query, "ast_match" or "execution", is stored in the column result_label + "_method". The tables of a filler data are only materialised if a query sharing them has to be executed.
+
+        :param batch: The batch of dataset items to validate.
+        :type batch: dict {column_name: list}
+        :param query_labels: The columns holding the queries, either OpenAI responses or the queries themselves
+        :type query_labels: List[str], optional
+        :param result_labels: The columns to store the query results of each query column in
+        :type result_labels: List[str], optional
+        :param valid_labels: The columns to store whether or not the queries of each query column are valid in
+        :type valid_labels: List[str], optional
+        :param backend: The backend used to execute the queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query results are stored, either "string", "fingerprint" or "both", see validate_openai_query(), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param answer_label: The column holding the answers, whose queries are matched without executing them, defaults to None (i.e., every query is executed). The answers must be valid, and their results stored in correct_label with the same result format.
+        :type answer_label: Optional[str], optional
+        :param correct_label: The column holding the results of the answers, defaults to "query_result"
+        :type correct_label: str, optional
+        :return: The batch with the query results and whether or not each query is valid
+        :rtype: dict {result_label: List[str], valid_label: List[bool]}
+        """
+
+        num_rows = len(batch[data_label])
+        backend = get_backend(backend)
+        labels = list(zip(query_labels, result_labels, valid_labels))
+
+        for result_label, valid_label in zip(result_labels, valid_labels):
+            batch[result_label] = [None] * num_rows
+            batch[valid_label] = [False] * num_rows
+            if result_format == "both":
+                batch[f"{result_label}_fingerprint"] = [None] * num_rows
+            if answer_label is not None:
+                batch[f"{result_label}_method"] = ["execution"] * num_rows
+
+        def store(index, columns):
+            for label, value in columns.items():
+                batch[label][index] = value
+
+        for group in group_table_sets(batch[data_label]):
+            pending = []
+
+            for index in group:
+                row = {label: values[index] for label, values in batch.items()} if answer_label is not None else None
+                for query_label, result_label, valid_label in labels:
+                    try:
+                        query = SQLEval._inference_query(batch[query_label][index])
+                        matched = SQLEval._ast_match_result(query, row, answer_label, correct_label, result_label, result_format)
+                    except Exception:
+                        query, matched = None, None
+
+                    if matched is None:
+                        pending.append((index, query_label, result_label, valid_label))
+                    else:
+                        store(index, matched)
+                        batch[valid_label][index] = True
+                        batch[f"{result_label}_method"][index] = "ast_match"
+
+            if not pending:
+                continue
+
+            try:
+                session = backend.connect(load_filler_data(batch[data_label][group[0]]))
+            except Exception as e:
+                for index, _, result_label, _ in pending:
+                    store(index, encode_error(SQLEval._error_result(e), result_label, result_format))
+                continue
+
+            with session:
+                for index, query_label, result_label, valid_label in pending:
+                    try:
+                        query = SQLEval._inference_query(batch[query_label][index])
+                        store(index, encode_result(session.execute(query), result_label, result_format, backend.format_result, query, fingerprint_options))
+                        batch[valid_label][index] = True
+                    except Exception as e:
+                        store(index, encode_error(SQLEval._error_result(e), result_label, result_format))
+
+        return batch
         
     @staticmethod
     def validate_replicate_query(
@@ -74,51 +264,71 @@ class SQLEval:
         data_label: str="filler_data",
         result_label: str="replicate_result",
         valid_label: str="replicate_valid",
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        answer_label: Optional[str]=None,
+        correct_label: str="query_result",
     ):
         """Validates the query against the provided filler data and returns the query result
         
         :param dataset: The dataset item to validate.
         :type dataset: dict
+        :param backend: The backend used to execute the query, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query result is stored, either "string", "fingerprint" (a compact fingerprint of the canonical rows) or "both" (the string, and the fingerprint in the column result_label + "_fingerprint"), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param answer_label: The column holding the answer, see validate_queries_batch(). A query sharing the normalised AST of the answer is given the correct result without being executed, and the method used ("ast_match" or "execution") is stored in the column result_label + "_method". Defaults to None (i.e., the query is executed)
+        :type answer_label: Optional[str], optional
+        :param correct_label: The column holding the result of the answer, defaults to "query_result"
+        :type correct_label: str, optional
         :return: A dictionary containing the query result and whether or not the query is valid
         :rtype: dict {result_label: str, valid_label: bool}
         """
         
+        if answer_label is not None:
+            dataset[f"{result_label}_method"] = "execution"
+
         try:
-            tables = json.loads(dataset[data_label])
             query = dataset[query_label]
-            result = execute(query, tables=tables)
-            dataset[result_label] = str(result.rows) if result.rows is not None else ""
+            matched = SQLEval._ast_match_result(query, dataset, answer_label, correct_label, result_label, result_format)
+            if matched is not None:
+                dataset.update(matched)
+                dataset[valid_label] = True
+                dataset[f"{result_label}_method"] = "ast_match"
+                return dataset
+
+            tables = load_filler_data(dataset[data_label])
+            backend = get_backend(backend)
+            dataset.update(encode_result(backend.execute(query, tables), result_label, result_format, backend.format_result, query, fingerprint_options))
             dataset[valid_label] = True
             return dataset
-        except (ExecuteError, OptimizeError, TokenError, SchemaError, ParseError, UnsupportedError, SqlglotError) as specific_error:
-            dataset[result_label] = type(specific_error).__name__
-            dataset[valid_label] = False
-            return dataset
-        except Exception as general_error:
-            dataset[result_label] = str(general_error)
+        except Exception as e:
+            dataset.update(encode_error(SQLEval._error_result(e), result_label, result_format))
             dataset[valid_label] = False
             return dataset
         
     @staticmethod
     def inference_result_check(
         dataset: Dataset,
+        result_format: str="string",
     ): 
-        """Checks the results of the inference against the correct result and returns the result of the check
+        """Checks the results of the inference against the correct result and returns the result of the check. Results are compared by their fingerprints when both are stored, with fingerprints_match(), in order if the correct query has an ORDER BY clause and as a multiset otherwise.
 
         :param dataset: The dataset item to check.
         :type dataset: dict
+        :param result_format: How the results are stored, either "string", "fingerprint" or "both", defaults to "string"
+        :type result_format: str, optional
         :return: A dictionary containing the result of the check
         :rtype: dict {openai_correct: bool, replicate_correct: bool, openai_replicate_match: bool}
         """
         
         try: 
-            openai_result = dataset['openai_result']
-            replicate_result = dataset['replicate_result']
-            correct_result = dataset['query_result']
-
-            dataset['openai_correct'] = openai_result == correct_result
-            dataset['replicate_correct'] = replicate_result == correct_result
-            dataset['openai_replicate_match'] = openai_result == replicate_result
+            dataset['openai_correct'] = results_match(dataset, 'openai_result', 'query_result', result_format)
+            dataset['replicate_correct'] = results_match(dataset, 'replicate_result', 'query_result', result_format)
+            dataset['openai_replicate_match'] = results_match(dataset, 'openai_result', 'replicate_result', result_format)
             return dataset
         except Exception as e:
             logger.warning(f"Result check failed with error: {e}")
@@ -129,20 +339,20 @@ class SQLEval:
         dataset: Dataset,
         column_result_label: str="column_result",
         outcome_label: str="model_correct",
+        result_format: str="string",
     ): 
-        """Checks the results of the inference against the correct result and returns the result of the check
+        """Checks the results of the inference against the correct result and returns the result of the check. Results are compared by their fingerprints when both are stored, with fingerprints_match(), in order if the correct query has an ORDER BY clause and as a multiset otherwise.
 
         :param dataset: The dataset item to check.
         :type dataset: dict
+        :param result_format: How the results are stored, either "string", "fingerprint" or "both", defaults to "string"
+        :type result_format: str, optional
         :return: A dictionary containing the result of the check
         :rtype: dict 
         """
         
         try: 
-            result = dataset[column_result_label]
-            correct_result = dataset['query_result']
-
-            dataset[outcome_label] = result == correct_result
+            dataset[outcome_label] = results_match(dataset, column_result_label, 'query_result', result_format)
             return dataset
         except Exception as e:
             logger.warning(f"Result check failed with error: {e}")
@@ -155,47 +365,406 @@ class SQLEval:
         result_label: str="replicate_result",
         filler_data_label: str="filler_data",
         valid_label: str="replicate_valid",
-    ): # TODO: update to allow for regex values to be passed in
-        """Parses the replicate inference to find a valid SQL query and returns the parsed query and result
-
-        currently, utilizes the regex pattern: r"SELECT.*?(?=\n|\[/|,\[INST\])"
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        extractor: Optional[SQLExtractor]=None,
+    ):
+        """Parses the replicate inference to find a valid SQL query and returns the parsed query and result, see replicate_response_parser_batch(batch)
 
         :param dataset: The dataset item to parse.
         :type dataset: dict
+        :param backend: The backend used to execute the parsed queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the result of the parsed query is stored, either "string", "fingerprint" or "both", see validate_openai_query(), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param extractor: The extractor finding the candidate queries and the strategy choosing between them, defaults to None (i.e., SQLExtractor(), matching SQL_STATEMENT_PATTERN and keeping the last valid candidate)
+        :type extractor: Optional[SQLExtractor], optional
         :return: A dictionary containing the parsed query and result
         :rtype: dict {replicate_inference: str, replicate_result: str}
         """
 
-        
-        replicate_inference = dataset[inference_label]
-        replicate_result = dataset[result_label]
-        
-        tables = json.loads(dataset[filler_data_label])
-        
-        pattern = r"SELECT.*?(?=\n|\[/|,\[INST\])"
-        matches = re.findall(pattern, replicate_inference, re.DOTALL)
-        
-        result = None
-        valid_result = None 
-        valid_statement = None
-        
-        for match in matches:
-            try: 
-                result = execute(match, tables=tables)
-                if result.rows is not None: 
-                    valid_result = str(result.rows)
-                    valid_statement = match
-            except:
-                pass
-
-        if valid_result and valid_statement: 
-            dataset[inference_label] = valid_statement 
-            dataset[result_label] = valid_result 
-            dataset[valid_label] = True
-        else: 
-            dataset[inference_label] = replicate_inference 
-            dataset[result_label] = replicate_result
-            dataset[valid_label] = False
-        return dataset
+        batch = SQLEval.replicate_response_parser_batch(
+            {label: [value] for label, value in dataset.items()},
+            inference_label=inference_label,
+            result_label=result_label,
+            filler_data_label=filler_data_label,
+            valid_label=valid_label,
+            backend=backend,
+            result_format=result_format,
+            fingerprint_options=fingerprint_options,
+            extractor=extractor,
+        )
+        return {label: values[0] for label, values in batch.items()}
+
+    @staticmethod
+    def replicate_response_parser_batch(
+        batch: Dict[str, List],
+        inference_label: str="replicate_inference",
+        result_label: str="replicate_result",
+        filler_data_label: str="filler_data",
+        valid_label: str="replicate_valid",
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        extractor: Optional[SQLExtractor]=None,
+    ):
+        """Parses the replicate inferences of a batch to find their valid SQL queries and returns the parsed queries and results, for use with dataset.map(..., batched=True)
+
+        The candidate queries of each inference are found and pre-filtered by the extractor, and executed in the order of its strategy until one returns a result. The tables of each unique filler data within the batch are materialised once, only if an inference sharing them has a candidate.
+        Inferences without a valid candidate keep their inference and result, unless a candidate exceeded a limit of a SandboxedBackend, in which case the result is the status "Timeout" or "ResourceLimit".
+
+        :param batch: The batch of dataset items to parse.
+        :type batch: dict {column_name: list}
+        :param backend: The backend used to execute the parsed queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the results of the parsed queries are stored, either "string", "fingerprint" or "both", see validate_openai_query(), defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param extractor: The extractor finding the candidate queries and the strategy choosing between them, defaults to None (i.e., SQLExtractor())
+        :type extractor: Optional[SQLExtractor], optional
+        :return: The batch with the parsed queries and results
+        :rtype: dict {inference_label: List[str], result_label: List[str], valid_label: List[bool]}
+        """
+
+        extractor = extractor or SQLExtractor()
+        backend = get_backend(backend)
+        num_rows = len(batch[inference_label])
+        candidates = [extractor.candidates(inference) for inference in batch[inference_label]]
+
+        batch[inference_label] = list(batch[inference_label])
+        batch[result_label] = list(batch[result_label])
+        batch[valid_label] = [False] * num_rows
+        if result_format == "both":
+            batch[f"{result_label}_fingerprint"] = list(batch.get(f"{result_label}_fingerprint", [None] * num_rows))
+
+        for group in group_table_sets(batch[filler_data_label]):
+            pending = [index for index in group if candidates[index]]
+            if not pending:
+                continue
+
+            # Every candidate query of the group is executed against the same tables, materialised once
+            try:
+                session = backend.connect(load_filler_data(batch[filler_data_label][group[0]]))
+            except Exception:
+                continue
+
+            with session:
+                for index in pending:
+                    statement, rows, limit_status = extractor.run(candidates[index], session)
+
+                    if statement is not None:
+                        batch[inference_label][index] = statement
+                        for label, value in encode_result(rows, result_label, result_format, backend.format_result, statement, fingerprint_options).items():
+                            batch[label][index] = value
+                        batch[valid_label][index] = True
+                    elif limit_status is not None:
+                        for label, value in encode_error(limit_status, result_label, result_format).items():
+                            batch[label][index] = value
+
+        return batch
 
         
+
+    ########################################
+    # Multi-Model Evaluation Methods       #
+    ########################################
+
+    @staticmethod
+    def evaluate_models_batch(
+        batch: Dict[str, List],
+        models: Dict[str, str],
+        correct_label: str="query_result",
+        data_label: str="filler_data",
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        answer_label: Optional[str]=None,
+    ):
+        """Validates the inferences of several models against one table build per unique filler data, and checks their correctness and pairwise agreement, for use with dataset.map(..., batched=True)
+
+        For every model name, the columns name + "_result", name + "_valid" and name + "_correct" are added, and for every pair of models the column a + "_" + b + "_match". An inference is correct if it is valid and its result matches the correct result, and two inferences agree if both are valid and their results match.
+
+        :param batch: The batch of dataset items to evaluate.
+        :type batch: dict {column_name: list}
+        :param models: The column holding the inferences of each model, e.g. {"openai": "openai_inference", "replicate": "replicate_inference"}
+        :type models: Dict[str, str]
+        :param correct_label: The column holding the correct result, defaults to "query_result"
+        :type correct_label: str, optional
+        :param data_label: The column holding the filler data, defaults to "filler_data"
+        :type data_label: str, optional
+        :param backend: The backend used to execute the queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query results are stored, either "string", "fingerprint" or "both", see validate_openai_query(), defaults to "string". The correct results must be stored in the same format.
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param answer_label: The column holding the answers, whose inferences are given the correct result without being executed, see validate_queries_batch(). The method used for each inference is stored in the column name + "_result_method". Defaults to None (i.e., every inference is executed)
+        :type answer_label: Optional[str], optional
+        :return: The batch with the results, validity, correctness and agreement of the models
+        :rtype: dict {column_name: list}
+        """
+
+        names = list(models.keys())
+
+        batch = SQLEval.validate_queries_batch(
+            batch,
+            query_labels=[models[name] for name in names],
+            result_labels=[f"{name}_result" for name in names],
+            valid_labels=[f"{name}_valid" for name in names],
+            data_label=data_label,
+            backend=backend,
+            result_format=result_format,
+            fingerprint_options=fingerprint_options,
+            answer_label=answer_label,
+            correct_label=correct_label,
+        )
+
+        num_rows = len(batch[data_label])
+        labels = [correct_label] + [f"{name}_result" for name in names]
+        labels += [f"{label}_fingerprint" for label in labels if f"{label}_fingerprint" in batch]
+        rows = [{label: batch[label][index] for label in labels} for index in range(num_rows)]
+
+        for name in names:
+            batch[f"{name}_correct"] = [
+                bool(batch[f"{name}_valid"][index]) and results_match(row, f"{name}_result", correct_label, result_format)
+                for index, row in enumerate(rows)
+            ]
+
+        for a, b in itertools.combinations(names, 2):
+            batch[f"{a}_{b}_match"] = [
+                bool(batch[f"{a}_valid"][index] and batch[f"{b}_valid"][index])
+                and results_match(row, f"{a}_result", f"{b}_result", result_format)
+                for index, row in enumerate(rows)
+            ]
+
+        return batch
+
+    @staticmethod
+    def _region(names: List[str], flags: List[bool]) -> str:
+        """Returns the Venn diagram region of a row, i.e. the names of the models a flag holds for joined by "&", or "none" if there are none"""
+
+        return "&".join(name for name, flag in zip(names, flags) if flag) or "none"
+
+    @staticmethod
+    def evaluate_models(
+        dataset: Dataset,
+        models: Dict[str, str],
+        correct_label: str="query_result",
+        data_label: str="filler_data",
+        backend: Union[str, SQLBackend]="sqlglot",
+        result_format: str="string",
+        fingerprint_options: Optional[Dict[str, Any]]=None,
+        answer_label: Optional[str]=None,
+        batch_size: int=1000,
+    ) -> Tuple[Dataset, Dict[str, Any]]:
+        """Evaluates several models in a single pass over a dataset with evaluate_models_batch(batch), aggregating their accuracy, validity, pairwise agreement and Venn diagram regions as the batches are evaluated
+
+        :param dataset: The dataset to evaluate.
+        :type dataset: Dataset
+        :param models: The column holding the inferences of each model, e.g. {"openai": "openai_inference", "replicate": "replicate_inference"}
+        :type models: Dict[str, str]
+        :param correct_label: The column holding the correct result, defaults to "query_result"
+        :type correct_label: str, optional
+        :param data_label: The column holding the filler data, defaults to "filler_data"
+        :type data_label: str, optional
+        :param backend: The backend used to execute the queries, either "sqlglot", "sqlite", "duckdb" or a SQLBackend instance, defaults to "sqlglot"
+        :type backend: Union[str, SQLBackend], optional
+        :param result_format: How the query results are stored, either "string", "fingerprint" or "both", defaults to "string"
+        :type result_format: str, optional
+        :param fingerprint_options: The arguments of result_fingerprint() used to fingerprint results: "ordered" (overriding the detection of ORDER BY clauses), "float_precision" and "bits", see encode_result(), defaults to None
+        :type fingerprint_options: Optional[Dict[str, Any]], optional
+        :param answer_label: The column holding the answers, whose inferences are given the correct result without being executed, see evaluate_models_batch(), defaults to None
+        :type answer_label: Optional[str], optional
+        :param batch_size: The number of rows evaluated at once, defaults to 1000
+        :type batch_size: int, optional
+        :return: The dataset with the evaluation columns, and the summary of the evaluation. The Venn regions count the rows per set of models that are valid (or correct), keyed by their names joined by "&", e.g. {"openai&replicate": 10, "openai": 5, "none": 2}
+        :rtype: Tuple[Dataset, dict {"rows": int, "accuracy": {name: float}, "validity": {name: float}, "agreement": {"a&b": float}, "valid_regions": {region: int}, "correct_regions": {region: int}, "ast_matches": {name: int}}]
+        """
+
+        names = list(models.keys())
+        outputs = {f"{name}_{suffix}" for name in names for suffix in ("result", "valid", "correct")}
+        outputs |= {f"{a}_{b}_match" for a, b in itertools.combinations(names, 2)}
+        if answer_label is not None:
+            outputs |= {f"{name}_result_method" for name in names}
+        columns = {}
+        valid = Counter()
+        correct = Counter()
+        ast_matches = Counter()
+        agreement = Counter()
+        valid_regions = Counter()
+        correct_regions = Counter()
+        num_rows = 0
+
+        for batch in dataset.iter(batch_size=batch_size):
+            batch = SQLEval.evaluate_models_batch(
+                batch, models, correct_label, data_label, backend, result_format, fingerprint_options, answer_label
+            )
+            size = len(batch[data_label])
+            num_rows += size
+
+            for name in names:
+                valid[name] += sum(batch[f"{name}_valid"])
+                correct[name] += sum(batch[f"{name}_correct"])
+                if answer_label is not None:
+                    ast_matches[name] += batch[f"{name}_result_method"].count("ast_match")
+
+            for a, b in itertools.combinations(names, 2):
+                agreement[f"{a}&{b}"] += sum(batch[f"{a}_{b}_match"])
+
+            for index in range(size):
+                valid_regions[SQLEval._region(names, [batch[f"{name}_valid"][index] for name in names])] += 1
+                correct_regions[SQLEval._region(names, [batch[f"{name}_correct"][index] for name in names])] += 1
+
+            for label, values in batch.items():
+                if label in outputs or label.endswith("_fingerprint") and label[:-len("_fingerprint")] in outputs:
+                    columns.setdefault(label, []).extend(values)
+
+        for label, values in columns.items():
+            if label in dataset.column_names:
+                dataset = dataset.remove_columns(label)
+            dataset = dataset.add_column(label, values)
+
+        summary = {
+            "rows": num_rows,
+            "accuracy": {name: correct[name] / num_rows if num_rows else 0.0 for name in names},
+            "validity": {name: valid[name] / num_rows if num_rows else 0.0 for name in names},
+            "agreement": {pair: count / num_rows if num_rows else 0.0 for pair, count in agreement.items()},
+            "valid_regions": dict(valid_regions),
+            "correct_regions": dict(correct_regions),
+            "ast_matches": {name: ast_matches[name] for name in names},
+        }
+
+        return dataset, summary
+
+    ########################################
+    # Schema Pruning Methods               #
+    ########################################
+
+    @staticmethod
+    def _schema_names(context: str) -> set:
+        """Returns the lower case table and column names created by the CREATE table statements of a context"""
+
+        names = set()
+
+        for statement in sqlglot.parse(context):
+            names.add(statement.find(sqlglot.expressions.Identifier).this.lower())
+            for column in statement.this.expressions:
+                names.add(column.find(sqlglot.expressions.Identifier).this.lower())
+
+        return names
+
+    @staticmethod
+    def schema_linking_recall(
+        dataset,
+        context_label: str="context",
+        answer_label: str="answer",
+    ):
+        """Computes the share of the tables and columns referenced by the answer that the (pruned) context still contains, for use with dataset.map(...)
+
+        A recall below 1.0 means schema pruning removed a table or column the answer needs.
+
+        :param dataset: The dataset item to check.
+        :type dataset: dict
+        :param context_label: The column holding the context, defaults to "context"
+        :type context_label: str, optional
+        :param answer_label: The column holding the correct query, defaults to "answer"
+        :type answer_label: str, optional
+        :return: A dictionary containing the recall
+        :rtype: dict {schema_recall: float}
+        """
+
+        try:
+            answer = sqlglot.parse_one(dataset[answer_label])
+            referenced = {table.name.lower() for table in answer.find_all(sqlglot.expressions.Table)}
+            referenced |= {column.name.lower() for column in answer.find_all(sqlglot.expressions.Column)}
+            available = SQLEval._schema_names(dataset[context_label])
+        except Exception as e:
+            logger.warning(f"Schema linking recall failed with error: {e}")
+            return {"schema_recall": None}
+
+        if not referenced:
+            return {"schema_recall": 1.0}
+
+        return {"schema_recall": len(referenced & available) / len(referenced)}
+
+    @staticmethod
+    def schema_pruning_report(
+        dataset: Dataset,
+        context_label: str="context",
+        original_context_label: str="original_context",
+        answer_label: str="answer",
+    ) -> Dict[str, float]:
+        """Reports the prompt tokens saved by schema pruning (see SQLData.prune_schema) and whether the pruned contexts still contain the tables and columns of the answers
+
+        :param dataset: The pruned dataset.
+        :type dataset: Dataset
+        :param context_label: The column holding the pruned context, defaults to "context"
+        :type context_label: str, optional
+        :param original_context_label: The column holding the original context, defaults to "original_context"
+        :type original_context_label: str, optional
+        :param answer_label: The column holding the correct query, defaults to "answer"
+        :type answer_label: str, optional
+        :return: The number of rows, the context tokens before and after pruning, the tokens saved and their share, the mean schema recall and the share of rows whose pruned context contains every table and column of the answer
+        :rtype: dict {"rows": int, "original_tokens": int, "pruned_tokens": int, "token_savings": int, "savings_rate": float, "mean_recall": float, "complete_rate": float}
+        """
+
+        original_tokens = sum(count_tokens(context) for context in dataset[original_context_label])
+        pruned_tokens = sum(count_tokens(context) for context in dataset[context_label])
+
+        recalls = [
+            SQLEval.schema_linking_recall(row, context_label, answer_label)["schema_recall"]
+            for row in dataset
+        ]
+        recalls = [recall for recall in recalls if recall is not None]
+
+        return {
+            "rows": len(dataset),
+            "original_tokens": original_tokens,
+            "pruned_tokens": pruned_tokens,
+            "token_savings": original_tokens - pruned_tokens,
+            "savings_rate": (original_tokens - pruned_tokens) / original_tokens if original_tokens else 0.0,
+            "mean_recall": sum(recalls) / len(recalls) if recalls else 0.0,
+            "complete_rate": sum(recall == 1.0 for recall in recalls) / len(recalls) if recalls else 0.0,
+        }
+
+    @staticmethod
+    def compare_accuracy(
+        dataset: Dataset,
+        baseline_label: str,
+        candidate_label: str,
+        tolerance: float=0.0,
+    ) -> Dict[str, Union[float, bool]]:
+        """Compares the accuracy of two correctness columns, e.g. of inferences from full and pruned contexts, to confirm the candidate does not regress
+
+        :param dataset: The dataset with both correctness columns, see custom_inference_result_check(dataset).
+        :type dataset: Dataset
+        :param baseline_label: The column holding whether each baseline inference is correct
+        :type baseline_label: str
+        :param candidate_label: The column holding whether each candidate inference is correct
+        :type candidate_label: str
+        :param tolerance: The drop in accuracy allowed before the candidate counts as a regression, defaults to 0.0
+        :type tolerance: float, optional
+        :return: The accuracy of both columns, their difference, and whether the candidate regressed
+        :rtype: dict {"baseline_accuracy": float, "candidate_accuracy": float, "difference": float, "regressed": bool}
+        """
+
+        num_rows = len(dataset)
+        baseline_accuracy = sum(bool(value) for value in dataset[baseline_label]) / num_rows if num_rows else 0.0
+        candidate_accuracy = sum(bool(value) for value in dataset[candidate_label]) / num_rows if num_rows else 0.0
+        difference = candidate_accuracy - baseline_accuracy
+
+        if difference < -tolerance:
+            logger.warning(
+                f"The accuracy of {candidate_label} ({candidate_accuracy:.3f}) regressed from {baseline_label} ({baseline_accuracy:.3f})."
+            )
+
+        return {
+            "baseline_accuracy": baseline_accuracy,
+            "candidate_accuracy": candidate_accuracy,
+            "difference": difference,
+            "regressed": difference < -tolerance,
+        }
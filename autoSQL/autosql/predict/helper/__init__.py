@@ -1 +1,9 @@
-from .prompts import *
\ No newline at end of file
+from .batches import *
+from .cache import *
+from .dispatch import *
+from .jobs import *
+from .limits import *
+from .metrics import *
+from .prompts import *
+from .sessions import *
+from .streaming import *
\ No newline at end of file
@@ -0,0 +1,206 @@
+import json
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def batch_request_lines(
+    requests: Iterable[Tuple[str, Dict[str, Any]]],
+    endpoint: str = "/v1/chat/completions",
+) -> str:
+    """Writes requests in the JSONL input format of the OpenAI Batch API
+
+    :param requests: The custom id and the body of each request
+    :type requests: Iterable[Tuple[str, dict]]
+    :param endpoint: The endpoint every request is sent to, defaults to "/v1/chat/completions"
+    :type endpoint: str, optional
+    :return: The JSONL batch input
+    :rtype: str
+    """
+
+    return "\n".join(
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body})
+        for custom_id, body in requests
+    ) + "\n"
+
+
+class OpenAIBatchClient:
+    """Submits requests to the OpenAI Batch API, which processes them asynchronously within a completion window at a lower price and higher rate limits than synchronous requests
+
+    Requests are uploaded as a JSONL file, the batch is polled until it reaches a terminal status, and the responses are downloaded and mapped back to the custom id of each request.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        api_key: str,
+        api_base: str = "https://api.openai.com/v1",
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Initializes the class
+
+        :param session: The session to send the requests with
+        :type session: requests.Session
+        :param api_key: The OpenAI API key
+        :type api_key: str
+        :param api_base: The base URL of the API, defaults to "https://api.openai.com/v1"
+        :type api_base: str, optional
+        :param poll_interval: The number of seconds between two polls of a batch, defaults to 30.0
+        :type poll_interval: float, optional
+        :param timeout: The number of seconds to wait for a batch before raising a TimeoutError, defaults to None (i.e., until the batch expires)
+        :type timeout: Optional[float], optional
+        """
+
+        self.session = session
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def __repr__(self):
+        return "{}(api_base={!r}, poll_interval={!r}, timeout={!r})".format(
+            type(self).__name__, self.api_base, self.poll_interval, self.timeout
+        )
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Sends an authenticated request to the API, raising for error statuses"""
+
+        response = self.session.request(
+            method,
+            self.api_base + path,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            **kwargs,
+        )
+        response.raise_for_status()
+        return response
+
+    def submit(
+        self,
+        lines: str,
+        endpoint: str = "/v1/chat/completions",
+        completion_window: str = "24h",
+    ) -> Dict[str, Any]:
+        """Uploads a JSONL batch input and creates a batch processing it
+
+        :param lines: The JSONL batch input, see batch_request_lines()
+        :type lines: str
+        :param endpoint: The endpoint the requests are sent to, defaults to "/v1/chat/completions"
+        :type endpoint: str, optional
+        :param completion_window: The time frame within which the batch is processed, defaults to "24h"
+        :type completion_window: str, optional
+        :return: The batch
+        :rtype: dict
+        """
+
+        file = self._request(
+            "POST",
+            "/files",
+            files={"file": ("batch.jsonl", lines.encode("utf-8"), "application/jsonl")},
+            data={"purpose": "batch"},
+        ).json()
+
+        batch = self._request(
+            "POST",
+            "/batches",
+            json={"input_file_id": file["id"], "endpoint": endpoint, "completion_window": completion_window},
+        ).json()
+
+        logger.info(f"Submitted batch {batch['id']}, resume waiting for it with its id if interrupted.")
+        return batch
+
+    def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        """Returns the current state of a batch
+
+        :param batch_id: The id of the batch
+        :type batch_id: str
+        :return: The batch
+        :rtype: dict
+        """
+
+        return self._request("GET", f"/batches/{batch_id}").json()
+
+    def wait(self, batch_id: str) -> Dict[str, Any]:
+        """Polls a batch until it reaches a terminal status
+
+        :param batch_id: The id of the batch
+        :type batch_id: str
+        :return: The batch in its terminal status
+        :rtype: dict
+        """
+
+        start = time.monotonic()
+
+        while True:
+            batch = self.retrieve(batch_id)
+
+            if batch["status"] in BATCH_TERMINAL_STATUSES:
+                return batch
+
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise TimeoutError(
+                    f"The batch {batch_id} did not complete within {self.timeout} seconds, its status is {batch['status']}."
+                )
+
+            logger.info(f"Batch {batch_id} is {batch['status']}: {batch.get('request_counts')}")
+            time.sleep(self.poll_interval)
+
+    def results(self, batch: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Downloads the responses of a batch, mapped to the custom id of each request. Failed requests are logged and map to None.
+
+        :param batch: The batch in its terminal status
+        :type batch: dict
+        :return: The response body of each request
+        :rtype: dict {custom_id: Optional[dict]}
+        """
+
+        results = {}
+
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if not file_id:
+                continue
+
+            content = self._request("GET", f"/files/{file_id}/content").text
+
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[record["custom_id"]] = response["body"]
+                else:
+                    logger.warning(f"Batch request {record['custom_id']} failed with error: {record.get('error') or response}")
+                    results[record["custom_id"]] = None
+
+        if batch["status"] != "completed":
+            logger.warning(f"Batch {batch['id']} ended with status {batch['status']}.")
+
+        return results
+
+    def run(
+        self,
+        lines: str,
+        endpoint: str = "/v1/chat/completions",
+        completion_window: str = "24h",
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Submits a JSONL batch input, waits for the batch and returns its responses, see submit(lines), wait(batch_id) and results(batch)
+
+        :param lines: The JSONL batch input, see batch_request_lines()
+        :type lines: str
+        :param endpoint: The endpoint the requests are sent to, defaults to "/v1/chat/completions"
+        :type endpoint: str, optional
+        :param completion_window: The time frame within which the batch is processed, defaults to "24h"
+        :type completion_window: str, optional
+        :return: The response body of each request
+        :rtype: dict {custom_id: Optional[dict]}
+        """
+
+        batch = self.submit(lines, endpoint, completion_window)
+        return self.results(self.wait(batch["id"]))
@@ -0,0 +1,296 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("read_through", "write_only", "offline")
+
+
+class CacheMiss(Exception):
+    """Raised by an offline ResponseCache for a request that has not been cached"""
+
+
+class ResponseCache:
+    """A persistent cache of model responses within a SQLite database, keyed on a hash of the provider, model, request and generation parameters
+
+    The mode determines how the cache is used:
+        - "read_through": cached responses are returned, and missing responses are requested and cached
+        - "write_only": every response is requested and cached, e.g. to refresh the cache
+        - "offline": cached responses are returned, and missing responses raise a CacheMiss rather than being requested
+    """
+
+    def __init__(
+        self,
+        path: str = "responses.sqlite",
+        mode: str = "read_through",
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        """Initializes the class, creating the database if it does not exist
+
+        :param path: The path of the SQLite database, or ":memory:", defaults to "responses.sqlite"
+        :type path: str, optional
+        :param mode: How the cache is used, either "read_through", "write_only" or "offline", defaults to "read_through"
+        :type mode: str, optional
+        :param ttl: The number of seconds a response remains valid, defaults to None (i.e., indefinitely)
+        :type ttl: Optional[float], optional
+        :param max_entries: The maximum number of cached responses, evicting the least recently used, defaults to None (i.e., unlimited)
+        :type max_entries: Optional[int], optional
+        """
+
+        if mode not in CACHE_MODES:
+            raise ValueError(
+                f"The cache mode {mode} is not supported. Supported cache modes: {CACHE_MODES}"
+            )
+
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # Requests may be sent from worker threads, e.g. the Replicate client within a dispatch
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT, created REAL, accessed REAL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._connection.commit()
+
+    def __repr__(self):
+        return "{}(path={!r}, mode={!r}, ttl={!r}, max_entries={!r})".format(
+            type(self).__name__, self.path, self.mode, self.ttl, self.max_entries
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"], state["_connection"]
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def key(
+        provider: str,
+        model: str,
+        request: Any,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Returns the cache key of a request
+
+        :param provider: The provider of the model, e.g. "openai", "replicate" or "http"
+        :type provider: str
+        :param model: The model, including its version, or the endpoint
+        :type model: str
+        :param request: The full prompt or messages of the request
+        :type request: Any
+        :param params: The generation parameters of the request, defaults to None
+        :type params: Optional[dict], optional
+        :return: The hash of the request
+        :rtype: str
+        """
+
+        content = json.dumps(
+            {"provider": provider, "model": model, "request": request, "params": params or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns a cached response, or None if the response is not cached or has expired
+
+        :param key: The cache key of the request
+        :type key: str
+        :return: The cached response
+        :rtype: Optional[Any]
+        """
+
+        now = time.time()
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Any, provider: str = "", model: str = "") -> None:
+        """Caches a response, evicting the least recently used responses beyond max_entries
+
+        :param key: The cache key of the request
+        :type key: str
+        :param response: The JSON serialisable response
+        :type response: Any
+        :param provider: The provider of the model, stored for inspection, defaults to ""
+        :type provider: str, optional
+        :param model: The model, stored for inspection, defaults to ""
+        :type model: str, optional
+        """
+
+        now = time.time()
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, json.dumps(response), now, now),
+            )
+
+            if self.max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+            self._connection.commit()
+
+    def lookup(self, key: str) -> Optional[Any]:
+        """Returns the cached response of a request according to the mode: None in write_only mode, and a CacheMiss is raised for uncached requests in offline mode
+
+        Unlike get_or_call(), the request is not sent on a miss, so that callers sending requests themselves (e.g. in a batch) can still honour the mode.
+
+        :param key: The cache key of the request, see key()
+        :type key: str
+        :raises CacheMiss: If the response is not cached in offline mode
+        :return: The cached response, or None if the request has to be sent
+        :rtype: Optional[Any]
+        """
+
+        if self.mode == "write_only":
+            return None
+
+        response = self.get(key)
+
+        if response is None and self.mode == "offline":
+            raise CacheMiss(f"The response for the request {key} has not been cached.")
+
+        return response
+
+    def get_or_call(
+        self,
+        provider: str,
+        model: str,
+        request: Any,
+        params: Optional[Dict[str, Any]],
+        call: Callable[[], Any],
+    ) -> Any:
+        """Returns the cached response of a request, or calls the request and caches its response, according to the mode. Only the responses of requests that succeed are cached.
+
+        :param provider: The provider of the model
+        :type provider: str
+        :param model: The model, including its version, or the endpoint
+        :type model: str
+        :param request: The full prompt or messages of the request
+        :type request: Any
+        :param params: The generation parameters of the request
+        :type params: Optional[dict]
+        :param call: The function sending the request, returning a JSON serialisable response
+        :type call: Callable[[], Any]
+        :return: The response
+        :rtype: Any
+        """
+
+        key = ResponseCache.key(provider, model, request, params)
+        response = self.lookup(key)
+
+        if response is None:
+            response = call()
+            # A failed request raises before its response is cached, and an empty response is not cached as it reads as a miss
+            if response is not None:
+                self.put(key, response, provider, model)
+
+        return response
+
+    async def aget_or_call(
+        self,
+        provider: str,
+        model: str,
+        request: Any,
+        params: Optional[Dict[str, Any]],
+        call: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Asynchronous version of get_or_call(), awaiting the request on a miss
+
+        :param provider: The provider of the model
+        :type provider: str
+        :param model: The model, including its version, or the endpoint
+        :type model: str
+        :param request: The full prompt or messages of the request
+        :type request: Any
+        :param params: The generation parameters of the request
+        :type params: Optional[dict]
+        :param call: The coroutine function sending the request, returning a JSON serialisable response
+        :type call: Callable[[], Awaitable]
+        :return: The response
+        :rtype: Any
+        """
+
+        key = ResponseCache.key(provider, model, request, params)
+        response = self.lookup(key)
+
+        if response is None:
+            response = await call()
+            # A failed request raises before its response is cached, and an empty response is not cached as it reads as a miss
+            if response is not None:
+                self.put(key, response, provider, model)
+
+        return response
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit and miss statistics of the cache
+
+        :return: The statistics of the cache
+        :rtype: dict {"hits": int, "misses": int, "hit_rate": float, "size": int}
+        """
+
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+        }
+
+    def clear(self) -> None:
+        """Removes every cached response"""
+
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Closes the database connection"""
+
+        self._connection.close()
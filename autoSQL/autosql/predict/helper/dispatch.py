@@ -0,0 +1,362 @@
+import time
+import asyncio
+import logging
+import itertools
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .limits import AdaptiveConcurrency, RateLimiter, backoff_delay, is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchStats:
+    """Throughput and latency statistics of the requests sent by an AsyncDispatcher"""
+
+    def __init__(self) -> None:
+        """Initializes the class"""
+
+        self.reset()
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(k, v) for k, v in self.summary().items()),
+        )
+
+    def reset(self) -> None:
+        """Clears the recorded requests"""
+
+        self.latencies = []
+        self.failures = 0
+        self.retries = 0
+        self.started = None
+        self.finished = None
+
+    def start(self) -> None:
+        """Marks the start of a dispatch"""
+
+        self.started = time.perf_counter()
+
+    def finish(self) -> None:
+        """Marks the end of a dispatch"""
+
+        self.finished = time.perf_counter()
+
+    def record(self, latency: float, success: bool) -> None:
+        """Records a completed request
+
+        :param latency: The latency of the request in seconds
+        :type latency: float
+        :param success: Whether or not the request succeeded
+        :type success: bool
+        """
+
+        self.latencies.append(latency)
+
+        if not success:
+            self.failures += 1
+
+    @staticmethod
+    def _percentile(values: List[float], percentile: float) -> float:
+        """Returns the nearest rank percentile of sorted values"""
+
+        if not values:
+            return 0.0
+
+        index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the statistics of the recorded requests
+
+        :return: The number of requests, failures and throttled retries, the elapsed time in seconds, the throughput in requests per second, and the latency percentiles in seconds
+        :rtype: dict {"requests": int, "failures": int, "retries": int, "elapsed": float, "throughput": float, "mean_latency": float, "p50_latency": float, "p95_latency": float, "max_latency": float}
+        """
+
+        latencies = sorted(self.latencies)
+        end = self.finished if self.finished is not None else time.perf_counter()
+        elapsed = end - self.started if self.started is not None else 0.0
+
+        return {
+            "requests": len(latencies),
+            "failures": self.failures,
+            "retries": self.retries,
+            "elapsed": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "mean_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50_latency": DispatchStats._percentile(latencies, 50),
+            "p95_latency": DispatchStats._percentile(latencies, 95),
+            "max_latency": latencies[-1] if latencies else 0.0,
+        }
+
+
+class AsyncDispatcher:
+    """Runs requests concurrently with asyncio, keeping up to max_concurrency requests in flight and returning the results in the order of the requests
+
+    Optionally, requests wait for a RateLimiter budget and an AdaptiveConcurrency limit, and throttled requests (HTTP 429 or 5xx) are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        max_retries: int = 3,
+    ) -> None:
+        """Initializes the class
+
+        :param max_concurrency: The maximum number of requests in flight at once, defaults to 16
+        :type max_concurrency: int, optional
+        :param rate_limiter: The requests and tokens per minute budget, defaults to None (i.e., unlimited)
+        :type rate_limiter: Optional[RateLimiter], optional
+        :param concurrency: The adaptive limit of requests in flight, defaults to None (i.e., max_concurrency)
+        :type concurrency: Optional[AdaptiveConcurrency], optional
+        :param max_retries: The number of times a throttled request is retried, defaults to 3
+        :type max_retries: int, optional
+        """
+
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.stats = DispatchStats()
+
+    def __repr__(self):
+        return "{}(max_concurrency={!r}, rate_limiter={!r}, concurrency={!r})".format(
+            type(self).__name__, self.max_concurrency, self.rate_limiter, self.concurrency
+        )
+
+    async def _attempt(self, request: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """Awaits a request once within the rate and concurrency limits, releasing the concurrency limit with the outcome of the request"""
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(tokens)
+
+        if self.concurrency is None:
+            return await request()
+
+        await self.concurrency.acquire()
+        throttled = False
+
+        try:
+            return await request()
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            raise
+        finally:
+            await self.concurrency.release(throttled)
+
+    async def _request(
+        self,
+        request: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """Awaits a request, recording its latency and retrying it while it is throttled. A failed request is logged and returns None."""
+
+        attempt = 0
+
+        while True:
+            start = time.perf_counter()
+
+            try:
+                result = await self._attempt(request, tokens)
+            except Exception as e:
+                if is_throttle_error(e) and attempt < self.max_retries:
+                    attempt += 1
+                    self.stats.retries += 1
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+
+                self.stats.record(time.perf_counter() - start, False)
+                logger.warning(f"Request failed with error: {e}")
+                return None
+
+            self.stats.record(time.perf_counter() - start, True)
+
+            if usage is not None and self.rate_limiter is not None:
+                actual_tokens = usage(result)
+                if actual_tokens is not None:
+                    self.rate_limiter.record(actual_tokens, tokens)
+
+            return result
+
+    async def dispatch(
+        self,
+        requests: Iterable[Callable[[], Awaitable[Any]]],
+        tokens: Optional[Iterable[int]] = None,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+        on_result: Optional[Callable[[int, Any], None]] = None,
+    ) -> List[Any]:
+        """Runs requests concurrently, creating each request only once a slot is free so that memory use is bounded by max_concurrency
+
+        :param requests: Functions returning the awaitable of each request
+        :type requests: Iterable[Callable[[], Awaitable]]
+        :param tokens: The estimated number of tokens of each request, acquired from the tokens per minute budget, defaults to None
+        :type tokens: Optional[Iterable[int]], optional
+        :param usage: A function returning the actual number of tokens of a result, to correct the estimate, defaults to None
+        :type usage: Optional[Callable[[Any], Optional[int]]], optional
+        :param on_result: A function called with the index and result of every successful request as soon as it completes, e.g. to checkpoint it, defaults to None
+        :type on_result: Optional[Callable[[int, Any], None]], optional
+        :return: The result of each request in the order of the requests, None for failed requests
+        :rtype: List[Any]
+        """
+
+        results = {}
+        if tokens is None:
+            tokens = itertools.repeat(0)
+        pending = enumerate(zip(requests, tokens))
+
+        async def worker():
+            # The iterator is shared between the workers, each taking the next request once its previous request completes
+            for index, (request, estimate) in pending:
+                results[index] = await self._request(request, estimate, usage)
+                if on_result is not None and results[index] is not None:
+                    on_result(index, results[index])
+
+        self.stats.reset()
+        self.stats.start()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        finally:
+            self.stats.finish()
+
+        return [results[index] for index in range(len(results))]
+
+    def run(
+        self,
+        requests: Iterable[Callable[[], Awaitable[Any]]],
+        tokens: Optional[Iterable[int]] = None,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+        on_result: Optional[Callable[[int, Any], None]] = None,
+    ) -> List[Any]:
+        """Runs requests concurrently from synchronous code, see dispatch(requests). Within a running event loop (e.g. a notebook) the requests run on an event loop in a separate thread.
+
+        :param requests: Functions returning the awaitable of each request
+        :type requests: Iterable[Callable[[], Awaitable]]
+        :param tokens: The estimated number of tokens of each request, defaults to None
+        :type tokens: Optional[Iterable[int]], optional
+        :param usage: A function returning the actual number of tokens of a result, defaults to None
+        :type usage: Optional[Callable[[Any], Optional[int]]], optional
+        :param on_result: A function called with the index and result of every successful request as soon as it completes, defaults to None
+        :type on_result: Optional[Callable[[int, Any], None]], optional
+        :return: The result of each request in the order of the requests, None for failed requests
+        :rtype: List[Any]
+        """
+
+        return run_coroutine(self.dispatch(requests, tokens, usage, on_result))
+
+
+class MicroBatcher:
+    """Groups items submitted concurrently into batches, sending a batch once it holds max_batch_size items or its first item has waited max_wait seconds, and scattering the outputs back to the submitters"""
+
+    def __init__(
+        self,
+        send: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+    ) -> None:
+        """Initializes the class
+
+        :param send: The coroutine function sending a batch of items, returning one output per item in the same order
+        :type send: Callable[[List[Any]], Awaitable[List[Any]]]
+        :param max_batch_size: The maximum number of items per batch, defaults to 8
+        :type max_batch_size: int, optional
+        :param max_wait: The maximum number of seconds an item waits for its batch to fill, defaults to 0.05
+        :type max_wait: float, optional
+        """
+
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+
+        self.send = send
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    def __repr__(self):
+        return "{}(max_batch_size={!r}, max_wait={!r})".format(
+            type(self).__name__, self.max_batch_size, self.max_wait
+        )
+
+    async def submit(self, item: Any) -> Any:
+        """Adds an item to the next batch and waits for its output
+
+        :param item: The item to send
+        :type item: Any
+        :return: The output of the item
+        :rtype: Any
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Sends the pending items as a batch"""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+
+        if batch:
+            # Tasks are referenced until they complete, as the event loop only keeps weak references
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Any]) -> None:
+        """Sends a batch, resolving the future of every item with its output, or with the error of the batch"""
+
+        self.batches += 1
+
+        try:
+            outputs = await self.send([item for item, _ in batch])
+            if len(outputs) != len(batch):
+                raise ValueError(
+                    f"The batch of {len(batch)} items returned {len(outputs)} outputs."
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+
+def run_coroutine(coroutine: Awaitable[Any]) -> Any:
+    """Runs a coroutine to completion from synchronous code, on a separate thread if an event loop is already running in the current thread
+
+    :param coroutine: The coroutine to run
+    :type coroutine: Awaitable
+    :return: The result of the coroutine
+    :rtype: Any
+    """
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
@@ -0,0 +1,164 @@
+import os
+import json
+import glob
+import logging
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceJob:
+    """A resumable bulk inference job, appending every completed result to a durable shard log within a directory
+
+    Each line of a shard records the row id (the position of the row within the dataset) and its result. On restart the shards are read back so that completed rows are never requested again, and merge() collects the results of every row once the job is done.
+    Every run appends to new shards, so a line left incomplete by a crash never corrupts later results.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        shard_size: int = 1000,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """Initializes the class, creating the directory if it does not exist and loading the completed rows of previous runs
+
+        :param directory: The directory of the shard log
+        :type directory: str
+        :param shard_size: The number of results per shard, each full shard is synced to disk, defaults to 1000
+        :type shard_size: int, optional
+        :param fingerprint: The fingerprint of the dataset, resuming a job with a different fingerprint logs a warning as the row ids may no longer match, defaults to None
+        :type fingerprint: Optional[str], optional
+        """
+
+        self.directory = directory
+        self.shard_size = shard_size
+        self.fingerprint = fingerprint
+        self.results = {}
+        self._shard = None
+        self._shard_lines = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._check_manifest()
+        self._load()
+
+    def __repr__(self):
+        return "{}(directory={!r}, completed={!r})".format(
+            type(self).__name__, self.directory, len(self.results)
+        )
+
+    def __enter__(self) -> "InferenceJob":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _check_manifest(self) -> None:
+        """Records the fingerprint of the dataset of the job, warning if the job is resumed with another dataset"""
+
+        path = os.path.join(self.directory, "manifest.json")
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                manifest = json.load(f)
+            if self.fingerprint is not None and manifest.get("fingerprint") not in (None, self.fingerprint):
+                logger.warning(
+                    f"The job in {self.directory} was started with another dataset (fingerprint {manifest.get('fingerprint')}), completed row ids may not match."
+                )
+            return
+
+        with open(path, "w") as f:
+            json.dump({"fingerprint": self.fingerprint}, f)
+
+    def _shard_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "shard-*.jsonl")))
+
+    def _load(self) -> None:
+        """Loads the results of previous runs, skipping a final line left incomplete by a crash"""
+
+        for path in self._shard_paths():
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping an incomplete line within {path}.")
+                        continue
+                    self.results[record["row"]] = record["result"]
+
+        if self.results:
+            logger.info(f"Resuming the job in {self.directory} with {len(self.results)} completed rows.")
+
+    def _open_shard(self) -> None:
+        """Opens a new shard to append results to"""
+
+        paths = self._shard_paths()
+        number = int(os.path.basename(paths[-1])[6:-6]) + 1 if paths else 0
+        self._shard = open(os.path.join(self.directory, f"shard-{number:05d}.jsonl"), "a")
+        self._shard_lines = 0
+
+    def _sync(self) -> None:
+        if self._shard is not None:
+            self._shard.flush()
+            os.fsync(self._shard.fileno())
+
+    def completed(self, row: int) -> bool:
+        """Returns whether a row has been completed
+
+        :param row: The row id
+        :type row: int
+        :return: Whether the result of the row has been recorded
+        :rtype: bool
+        """
+
+        return row in self.results
+
+    def pending(self, num_rows: int) -> List[int]:
+        """Returns the ids of the rows that have not been completed
+
+        :param num_rows: The number of rows of the dataset
+        :type num_rows: int
+        :return: The pending row ids
+        :rtype: List[int]
+        """
+
+        return [row for row in range(num_rows) if row not in self.results]
+
+    def record(self, row: int, result: Any) -> None:
+        """Appends the result of a row to the shard log. Lines are flushed as they are written, and each full shard is synced to disk.
+
+        :param row: The row id
+        :type row: int
+        :param result: The JSON serialisable result of the row
+        :type result: Any
+        """
+
+        if self._shard is None or self._shard_lines >= self.shard_size:
+            self._sync()
+            if self._shard is not None:
+                self._shard.close()
+            self._open_shard()
+
+        self._shard.write(json.dumps({"row": row, "result": result}) + "\n")
+        self._shard.flush()
+        self._shard_lines += 1
+        self.results[row] = result
+
+    def merge(self, num_rows: int) -> List[Any]:
+        """Returns the results of every row in order, None for rows that have not been completed
+
+        :param num_rows: The number of rows of the dataset
+        :type num_rows: int
+        :return: The results of the rows
+        :rtype: List[Any]
+        """
+
+        return [self.results.get(row) for row in range(num_rows)]
+
+    def close(self) -> None:
+        """Syncs and closes the current shard"""
+
+        self._sync()
+
+        if self._shard is not None:
+            self._shard.close()
+            self._shard = None
@@ -0,0 +1,254 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Optional
+
+from ...data.helpers import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Returns whether an error signals that the provider is overloaded or rate limiting, i.e. an HTTP 429 or 5xx status
+
+    :param error: The error raised by a request
+    :type error: Exception
+    :return: Whether the request was throttled
+    :rtype: bool
+    """
+
+    if type(error).__name__ in ("RateLimitError", "ServiceUnavailableError", "TryAgain"):
+        return True
+
+    for attribute in ("http_status", "status", "status_code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status in THROTTLE_STATUSES
+
+    # A requests HTTPError holds its status within the response
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in THROTTLE_STATUSES
+
+    return False
+
+
+class TokenBucket:
+    """A token bucket refilling at a rate per minute, up to a capacity
+
+    An acquisition waits until the bucket holds the requested amount (or is full, for amounts larger than the capacity) and may leave the bucket in debt, so that the long run rate is enforced exactly.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        """Initializes the class with a full bucket
+
+        :param rate_per_minute: The number of tokens added per minute
+        :type rate_per_minute: float
+        :param capacity: The maximum number of tokens held, i.e. the largest burst, defaults to None (i.e., one second of tokens)
+        :type capacity: Optional[float], optional
+        """
+
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def __repr__(self):
+        return "{}(rate_per_minute={!r}, capacity={!r})".format(
+            type(self).__name__, self.rate * 60, self.capacity
+        )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Waits until the bucket holds an amount of tokens, then takes them
+
+        :param amount: The number of tokens to take, defaults to 1
+        :type amount: float, optional
+        """
+
+        while True:
+            self._refill()
+            required = min(amount, self.capacity)
+            if self.tokens >= required:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((required - self.tokens) / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Takes (or with a negative amount, returns) tokens without waiting, e.g. to correct an estimate once the actual amount is known
+
+        :param amount: The number of tokens to take
+        :type amount: float
+        """
+
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """Enforces a requests per minute and a tokens per minute budget with a token bucket each"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> None:
+        """Initializes the class
+
+        :param requests_per_minute: The request budget, defaults to None (i.e., unlimited)
+        :type requests_per_minute: Optional[float], optional
+        :param tokens_per_minute: The token budget, defaults to None (i.e., unlimited)
+        :type tokens_per_minute: Optional[float], optional
+        """
+
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def __repr__(self):
+        return "{}(requests_per_minute={!r}, tokens_per_minute={!r})".format(
+            type(self).__name__, self.requests_per_minute, self.tokens_per_minute
+        )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Waits until a request of an estimated number of tokens fits within the budgets
+
+        :param tokens: The estimated number of tokens of the request, defaults to 0
+        :type tokens: int, optional
+        """
+
+        if self.requests is not None:
+            await self.requests.acquire(1)
+
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+    def record(self, actual_tokens: int, estimated_tokens: int) -> None:
+        """Corrects the token budget once the actual number of tokens of a request is known
+
+        :param actual_tokens: The actual number of tokens of the request
+        :type actual_tokens: int
+        :param estimated_tokens: The number of tokens acquired for the request
+        :type estimated_tokens: int
+        """
+
+        if self.tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+class AdaptiveConcurrency:
+    """Limits the number of requests in flight, adapting the limit with additive increase, multiplicative decrease (AIMD)
+
+    Every successful request raises the limit by increase / limit, i.e. by increase once per limit requests, while a throttled request multiplies the limit by decrease, at most once per cooldown so that a burst of throttled requests in flight counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+    ) -> None:
+        """Initializes the class
+
+        :param initial: The initial limit, defaults to 4
+        :type initial: int, optional
+        :param minimum: The lowest limit, defaults to 1
+        :type minimum: int, optional
+        :param maximum: The highest limit, defaults to 64
+        :type maximum: int, optional
+        :param increase: The increase of the limit per limit successful requests, defaults to 1.0
+        :type increase: float, optional
+        :param decrease: The factor the limit is multiplied by on a throttled request, defaults to 0.5
+        :type decrease: float, optional
+        :param cooldown: The minimum number of seconds between two decreases, defaults to 1.0
+        :type cooldown: float, optional
+        """
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreased = float("-inf")
+        self._condition = None
+        self._loop = None
+
+    def __repr__(self):
+        return "{}(limit={!r}, minimum={!r}, maximum={!r})".format(
+            type(self).__name__, int(self.limit), self.minimum, self.maximum
+        )
+
+    def _get_condition(self) -> asyncio.Condition:
+        """Returns the condition of the running event loop, as every dispatch may run on a new event loop"""
+
+        loop = asyncio.get_running_loop()
+
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+
+        return self._condition
+
+    async def acquire(self) -> None:
+        """Waits until a request fits within the limit"""
+
+        condition = self._get_condition()
+
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False) -> None:
+        """Releases a request, adapting the limit to its outcome
+
+        :param throttled: Whether the request was throttled by the provider, defaults to False
+        :type throttled: bool, optional
+        """
+
+        condition = self._get_condition()
+
+        async with condition:
+            self.in_flight -= 1
+
+            if throttled:
+                now = time.monotonic()
+                if now - self.decreased >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit * self.decrease)
+                    self.decreased = now
+                    logger.info(f"Request throttled, reducing concurrency to {int(self.limit)}.")
+            else:
+                self.limit = min(float(self.maximum), self.limit + self.increase / self.limit)
+
+            condition.notify_all()
+
+
+def backoff_delay(attempt: int, base: float = 0.5, maximum: float = 30.0) -> float:
+    """Returns the delay before retrying a throttled request, growing exponentially with full jitter
+
+    :param attempt: The number of the retry, starting at 1
+    :type attempt: int
+    :param base: The delay of the first retry in seconds, defaults to 0.5
+    :type base: float, optional
+    :param maximum: The maximum delay in seconds, defaults to 30.0
+    :type maximum: float, optional
+    :return: The delay in seconds
+    :rtype: float
+    """
+
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
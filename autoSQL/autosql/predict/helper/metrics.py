@@ -0,0 +1,136 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from ...data.helpers import count_tokens
+from .dispatch import DispatchStats
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """Records the prompt and completion tokens and the latency of every request sent to a model, and reports the latency, throughput and cost per model
+
+    Costs are computed from per token rates, e.g. Prompts.rates, for the models that have rates.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        """Initializes the class
+
+        :param rates: The cost per input and output token of each model, as {model: {"input_token_rate": float, "output_token_rate": float}}, defaults to None
+        :type rates: Optional[Dict[str, Dict[str, float]]], optional
+        """
+
+        self.rates = rates or {}
+        # Requests may be recorded from worker threads, e.g. the Replicate client within a dispatch
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return "{}(models={!r})".format(type(self).__name__, list(self.requests.keys()))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Clears the recorded requests"""
+
+        self.requests = {}
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+        rows: int = 1,
+    ) -> None:
+        """Records a completed request
+
+        :param model: The model the request was sent to
+        :type model: str
+        :param prompt_tokens: The number of tokens of the prompt
+        :type prompt_tokens: int
+        :param completion_tokens: The number of tokens generated
+        :type completion_tokens: int
+        :param latency: The latency of the request in seconds
+        :type latency: float
+        :param rows: The number of dataset rows the request answered, defaults to 1
+        :type rows: int, optional
+        """
+
+        finished = time.perf_counter()
+
+        with self._lock:
+            self.requests.setdefault(model, []).append(
+                (finished - latency, finished, prompt_tokens, completion_tokens, rows)
+            )
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        """Returns the cost of an amount of tokens, or None if the model has no rates
+
+        :param model: The model
+        :type model: str
+        :param prompt_tokens: The number of prompt tokens
+        :type prompt_tokens: int
+        :param completion_tokens: The number of completion tokens
+        :type completion_tokens: int
+        :return: The cost in dollars
+        :rtype: Optional[float]
+        """
+
+        rates = self.rates.get(model)
+
+        if rates is None:
+            return None
+
+        return prompt_tokens * rates["input_token_rate"] + completion_tokens * rates["output_token_rate"]
+
+    def summary(self, model: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Returns the statistics of the recorded requests per model
+
+        The throughput is computed over the wall-clock time from the start of the first request to the end of the last request of the model, so that concurrent requests are accounted for.
+
+        :param model: The model to report, defaults to None (i.e., every model)
+        :type model: Optional[str], optional
+        :return: The statistics of each model
+        :rtype: dict {model: {"requests": int, "rows": int, "prompt_tokens": int, "completion_tokens": int, "p50_latency": float, "p95_latency": float, "p99_latency": float, "tokens_per_second": float, "rows_per_second": float, "cost": Optional[float], "cost_per_1k_rows": Optional[float]}}
+        """
+
+        with self._lock:
+            requests = {
+                name: list(records) for name, records in self.requests.items() if model is None or name == model
+            }
+
+        summary = {}
+
+        for name, records in requests.items():
+            latencies = sorted(finished - started for started, finished, _, _, _ in records)
+            elapsed = max(record[1] for record in records) - min(record[0] for record in records)
+            prompt_tokens = sum(record[2] for record in records)
+            completion_tokens = sum(record[3] for record in records)
+            rows = sum(record[4] for record in records)
+            cost = self.cost(name, prompt_tokens, completion_tokens)
+
+            summary[name] = {
+                "requests": len(records),
+                "rows": rows,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "p50_latency": DispatchStats._percentile(latencies, 50),
+                "p95_latency": DispatchStats._percentile(latencies, 95),
+                "p99_latency": DispatchStats._percentile(latencies, 99),
+                "tokens_per_second": completion_tokens / elapsed if elapsed else 0.0,
+                "rows_per_second": rows / elapsed if elapsed else 0.0,
+                "cost": cost,
+                "cost_per_1k_rows": cost / rows * 1000 if cost is not None and rows else None,
+            }
+
+        return summary
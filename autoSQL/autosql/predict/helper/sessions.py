@@ -0,0 +1,113 @@
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPool:
+    """Pooled HTTP sessions with keep-alive connections, so that requests to the same endpoint reuse their TCP and TLS connections
+
+    Synchronous requests share one requests.Session per endpoint host. Asynchronous requests share an aiohttp.ClientSession per dispatch, as aiohttp sessions are bound to the event loop they are created in.
+    Neither requests nor aiohttp support HTTP/2, so connections use HTTP/1.1 with keep-alive.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 16,
+        timeout: Optional[float] = 60.0,
+        keepalive_timeout: float = 30.0,
+    ) -> None:
+        """Initializes the class
+
+        :param pool_size: The maximum number of connections kept open per endpoint host, defaults to 16
+        :type pool_size: int, optional
+        :param timeout: The number of seconds before a request times out, defaults to 60.0
+        :type timeout: Optional[float], optional
+        :param keepalive_timeout: The number of seconds an idle asynchronous connection is kept open, defaults to 30.0
+        :type keepalive_timeout: float, optional
+        """
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.sessions = {}
+
+    def __repr__(self):
+        return "{}(pool_size={!r}, timeout={!r}, hosts={!r})".format(
+            type(self).__name__, self.pool_size, self.timeout, list(self.sessions.keys())
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["sessions"] = {}
+        return state
+
+    @staticmethod
+    def _host(endpoint: str) -> str:
+        """Returns the scheme and host of an endpoint, which its connections are pooled by"""
+
+        parts = urlsplit(endpoint)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session(self, endpoint: str) -> requests.Session:
+        """Returns the pooled synchronous session of the host of an endpoint, creating it on first use
+
+        :param endpoint: The URL of the endpoint
+        :type endpoint: str
+        :return: The session of the endpoint host
+        :rtype: requests.Session
+        """
+
+        host = SessionPool._host(endpoint)
+
+        if host not in self.sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.sessions[host] = session
+
+        return self.sessions[host]
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        """Sends a POST request with the pooled session of the endpoint host and the timeout of the class
+
+        :param endpoint: The URL of the endpoint
+        :type endpoint: str
+        :return: The response
+        :rtype: requests.Response
+        """
+
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(endpoint).post(endpoint, **kwargs)
+
+    def async_session(self) -> aiohttp.ClientSession:
+        """Creates an asynchronous session, pooling up to pool_size keep-alive connections per host, within the running event loop. The caller closes the session, e.g. with async with.
+
+        :return: The session
+        :rtype: aiohttp.ClientSession
+        """
+
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    def close(self) -> None:
+        """Closes the synchronous sessions"""
+
+        for session in self.sessions.values():
+            session.close()
+
+        self.sessions = {}
@@ -0,0 +1,96 @@
+import logging
+from typing import Iterable, Optional, Sequence, Tuple
+
+import sqlglot
+
+from ...data.helpers import SQL_STATEMENT_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# The instruction markers the fine-tuned Llama models keep generating past their answer
+DEFAULT_STOP_SEQUENCES = ("[INST]", "[/INST]", "</s>")
+
+
+class EarlyStop:
+    """Decides when a streamed generation can be stopped, i.e. once it contains a stop sequence or a complete SQL statement that parses"""
+
+    def __init__(
+        self,
+        stop_sequences: Sequence[str] = DEFAULT_STOP_SEQUENCES,
+        stop_on_statement: bool = True,
+    ) -> None:
+        """Initializes the class
+
+        :param stop_sequences: The sequences stopping the generation, defaults to DEFAULT_STOP_SEQUENCES
+        :type stop_sequences: Sequence[str], optional
+        :param stop_on_statement: Whether to stop the generation once it contains a complete SQL statement, defaults to True
+        :type stop_on_statement: bool, optional
+        """
+
+        self.stop_sequences = tuple(stop_sequences)
+        self.stop_on_statement = stop_on_statement
+        self._longest = max((len(sequence) for sequence in self.stop_sequences), default=0)
+
+    def __repr__(self):
+        return "{}(stop_sequences={!r}, stop_on_statement={!r})".format(
+            type(self).__name__, self.stop_sequences, self.stop_on_statement
+        )
+
+    def key(self) -> dict:
+        """Returns the parameters of the condition, which the response cache keys truncated generations on
+
+        :return: The parameters of the condition
+        :rtype: dict {"stop_sequences": list, "stop_on_statement": bool}
+        """
+
+        return {"stop_sequences": list(self.stop_sequences), "stop_on_statement": self.stop_on_statement}
+
+    def reached(self, text: str, received: int) -> bool:
+        """Returns whether the generation can be stopped. Only the end of the text that may complete a new stop is searched, so that checking every token stays cheap.
+
+        :param text: The text generated so far
+        :type text: str
+        :param received: The number of characters received since the previous check
+        :type received: int
+        :return: Whether the generation can be stopped
+        :rtype: bool
+        """
+
+        if self._longest:
+            tail = text[-(received + self._longest - 1):]
+            if any(sequence in tail for sequence in self.stop_sequences):
+                return True
+
+        if self.stop_on_statement:
+            for match in SQL_STATEMENT_PATTERN.finditer(text):
+                # Statements completed by an earlier check did not parse
+                if match.end() < len(text) - received:
+                    continue
+                try:
+                    sqlglot.parse_one(match.group())
+                    return True
+                except sqlglot.errors.SqlglotError:
+                    continue
+
+        return False
+
+
+def consume_stream(tokens: Iterable[str], stop: Optional[EarlyStop] = None) -> Tuple[str, bool]:
+    """Joins streamed tokens as they arrive, stopping as soon as the stop condition is reached
+
+    :param tokens: The streamed tokens
+    :type tokens: Iterable[str]
+    :param stop: The stop condition, defaults to None (i.e., the whole stream is consumed)
+    :type stop: Optional[EarlyStop], optional
+    :return: The generated text and whether the stream was stopped early
+    :rtype: Tuple[str, bool]
+    """
+
+    text = ""
+
+    for token in tokens:
+        text += token
+        if stop is not None and stop.reached(text, len(token)):
+            return text, True
+
+    return text, False
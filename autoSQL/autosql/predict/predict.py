@@ -1,8 +1,13 @@
 import json
+import time
+import asyncio
 import logging
 import requests
+import concurrent.futures
 from _decimal import Decimal
-from typing import Optional, Dict, List, Union
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple, Union
+
+import aiohttp
 
 import openai
 from openai.openai_object import OpenAIObject
@@ -13,11 +18,32 @@ from replicate import Client as rc
 import sqlglot
 from datasets import DatasetDict, Dataset
 
-# from .helper import Prompts
-from helper import Prompts
+from .helper import (
+    AdaptiveConcurrency,
+    AsyncDispatcher,
+    DispatchStats,
+    EarlyStop,
+    InferenceJob,
+    MicroBatcher,
+    OpenAIBatchClient,
+    Prompts,
+    RateLimiter,
+    RequestMetrics,
+    ResponseCache,
+    SessionPool,
+    batch_request_lines,
+    consume_stream,
+    count_tokens,
+    estimate_tokens,
+    run_coroutine,
+)
+from ..data.helpers import load_tuning_format
 
 logger = logging.getLogger(__name__)
 
+# The completion tokens reserved for an OpenAI request until its actual usage is known
+OPENAI_COMPLETION_TOKENS = 100
+
 class SQLPredict: 
     """This class handles the dispatching of inference requests to various models. 
     """
@@ -27,20 +53,51 @@ class SQLPredict:
         openai_api_key: str,
         replicate_api_key: str,
         hugging_face_api_key: Optional[str] = None,
+        response_cache: Optional[ResponseCache] = None,
+        pool_size: int = 16,
+        timeout: Optional[float] = 60.0,
     ) -> None:
-        """Initialize the class"""
+        """Initialize the class
+        
+        :param openai_api_key: The OpenAI API key.
+        :type openai_api_key: str
+        :param replicate_api_key: The Replicate API key.
+        :type replicate_api_key: str
+        :param hugging_face_api_key: The Hugging Face API key, defaults to None
+        :type hugging_face_api_key: Optional[str], optional
+        :param response_cache: The persistent cache of model responses, defaults to None (i.e., every request is sent)
+        :type response_cache: Optional[ResponseCache], optional
+        :param pool_size: The number of keep-alive connections pooled per endpoint host, defaults to 16
+        :type pool_size: int, optional
+        :param timeout: The number of seconds before an endpoint request times out, defaults to 60.0
+        :type timeout: Optional[float], optional
+        """
 
         openai.api_key = openai_api_key
 
         self.openai = openai
+        self.sessions = SessionPool(pool_size=pool_size, timeout=timeout)
+        # The openai module holds a single session for every request, so the session of another instance, or of the application, is never replaced
+        self._previous_requestssession = self.openai.requestssession
+        self._openai_session = None
+        if self.openai.requestssession is None:
+            self._openai_session = self.sessions.session(self.openai.api_base)
+            self.openai.requestssession = self._openai_session
+        else:
+            logger.info("The openai module already has a requests session, OpenAI requests use it instead of the pooled session of this instance.")
         self.prompts = Prompts()
         self.rc = rc(replicate_api_key)
         self.hf_key = hugging_face_api_key
+        self.response_cache = response_cache
 
         self.replicate_models = {}
         self.openai_api_models = {}
 
         self.model_endpoints = {}
+        self.dispatch_stats = DispatchStats()
+        self.metrics = RequestMetrics(self.prompts.rates)
+        self.rate_limiters = {}
+        self.concurrency_limiters = {}
 
     @classmethod
     def from_replicate_model(
@@ -107,6 +164,204 @@ class SQLPredict:
 
         self.model_endpoints[model_name] = model_endpoint
 
+    def set_rate_limit(
+        self,
+        model_name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> None:
+        """Sets the request and token budgets the dispatch methods enforce for a model, shared by every dispatch to the model.
+
+        :param model_name: The name of the model, e.g. "gpt-3.5-turbo" or a Replicate model name.
+        :type model_name: str
+        :param requests_per_minute: The requests per minute budget, defaults to None (i.e., unlimited)
+        :type requests_per_minute: Optional[float], optional
+        :param tokens_per_minute: The tokens per minute budget, defaults to None (i.e., unlimited)
+        :type tokens_per_minute: Optional[float], optional
+        """
+
+        self.rate_limiters[model_name] = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def close(self) -> None:
+        """Closes the pooled HTTP sessions of the class, restoring the previous requests session of the openai module if the session of this instance is still installed."""
+
+        self.sessions.close()
+        if self._openai_session is not None and self.openai.requestssession is self._openai_session:
+            self.openai.requestssession = self._previous_requestssession
+        self._openai_session = None
+
+    #########################################
+    # Response Cache Methods                #
+    #########################################
+
+    def _cached_request(
+        self, 
+        provider: str,
+        model: str,
+        request: Any,
+        call: Callable[[], Any],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """Sends a request through the response cache of the class, if any.
+
+        :param provider: The provider of the model, e.g. "openai", "replicate" or "http".
+        :type provider: str
+        :param model: The model, including its version, or the endpoint.
+        :type model: str
+        :param request: The full prompt or messages of the request.
+        :type request: Any
+        :param call: The function sending the request, returning a JSON serialisable response.
+        :type call: Callable[[], Any]
+        :param params: The generation parameters of the request, defaults to None
+        :type params: Optional[Dict[str, Any]], optional
+        :return: The response.
+        :rtype: Any
+        """
+
+        if self.response_cache is None:
+            return call()
+
+        return self.response_cache.get_or_call(provider, model, request, params, call)
+
+    async def _async_cached_request(
+        self, 
+        provider: str,
+        model: str,
+        request: Any,
+        call: Callable[[], Awaitable[Any]],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """Asynchronous version of _cached_request()
+
+        :param provider: The provider of the model, e.g. "openai", "replicate" or "http".
+        :type provider: str
+        :param model: The model, including its version, or the endpoint.
+        :type model: str
+        :param request: The full prompt or messages of the request.
+        :type request: Any
+        :param call: The coroutine function sending the request, returning a JSON serialisable response.
+        :type call: Callable[[], Awaitable]
+        :param params: The generation parameters of the request, defaults to None
+        :type params: Optional[Dict[str, Any]], optional
+        :return: The response.
+        :rtype: Any
+        """
+
+        if self.response_cache is None:
+            return await call()
+
+        return await self.response_cache.aget_or_call(provider, model, request, params, call)
+
+    #########################################
+    # Request Metrics Methods               #
+    #########################################
+
+    @staticmethod
+    def _openai_usage(response: Dict[str, Any], message: List[Dict[str, str]]) -> Tuple[int, int]:
+        """Returns the prompt and completion tokens of an OpenAI response from its usage, or counts them if the usage is missing.
+
+        :param response: The response.
+        :type response: dict
+        :param message: The messages of the request.
+        :type message: List[Dict[str, str]]
+        :return: The prompt and completion tokens.
+        :rtype: Tuple[int, int]
+        """
+
+        try:
+            return response["usage"]["prompt_tokens"], response["usage"]["completion_tokens"]
+        except (KeyError, TypeError):
+            completion = "".join(choice["message"]["content"] for choice in response.get("choices", []))
+            return sum(count_tokens(item["content"]) for item in message), count_tokens(completion)
+
+    @staticmethod
+    def _generated_text(prompt: str, output: Any) -> str:
+        """Returns the text generated by a model endpoint, without the prompt the endpoint may repeat.
+
+        :param prompt: The prompt of the request.
+        :type prompt: str
+        :param output: The response of the endpoint, e.g. [{"generated_text": ...}].
+        :type output: Any
+        :return: The generated text.
+        :rtype: str
+        """
+
+        if isinstance(output, list) and all(isinstance(item, dict) and "generated_text" in item for item in output):
+            text = "".join(item["generated_text"] for item in output)
+        else:
+            text = output if isinstance(output, str) else json.dumps(output)
+
+        return text[len(prompt):] if text.startswith(prompt) else text
+
+    def _metered(
+        self, 
+        model: str,
+        call: Callable[[], Any],
+        usage: Callable[[Any], Tuple[int, int]],
+    ) -> Callable[[], Any]:
+        """Wraps the function sending a request to record its tokens and latency within the metrics of the class. Responses served by the response cache are not recorded.
+
+        :param model: The model the request is sent to.
+        :type model: str
+        :param call: The function sending the request.
+        :type call: Callable[[], Any]
+        :param usage: A function returning the prompt and completion tokens of the response.
+        :type usage: Callable[[Any], Tuple[int, int]]
+        :return: The wrapped function.
+        :rtype: Callable[[], Any]
+        """
+
+        def metered():
+            start = time.perf_counter()
+            response = call()
+            self._record_metrics(model, response, usage, time.perf_counter() - start)
+            return response
+
+        return metered
+
+    def _async_metered(
+        self, 
+        model: str,
+        call: Callable[[], Awaitable[Any]],
+        usage: Callable[[Any], Tuple[int, int]],
+    ) -> Callable[[], Awaitable[Any]]:
+        """Asynchronous version of _metered()
+
+        :param model: The model the request is sent to.
+        :type model: str
+        :param call: The coroutine function sending the request.
+        :type call: Callable[[], Awaitable]
+        :param usage: A function returning the prompt and completion tokens of the response.
+        :type usage: Callable[[Any], Tuple[int, int]]
+        :return: The wrapped coroutine function.
+        :rtype: Callable[[], Awaitable]
+        """
+
+        async def metered():
+            start = time.perf_counter()
+            response = await call()
+            self._record_metrics(model, response, usage, time.perf_counter() - start)
+            return response
+
+        return metered
+
+    def _record_metrics(
+        self, 
+        model: str,
+        response: Any,
+        usage: Callable[[Any], Tuple[int, int]],
+        latency: float,
+    ) -> None:
+        """Records the tokens and latency of a response, logging rather than raising if its tokens cannot be counted."""
+
+        try:
+            prompt_tokens, completion_tokens = usage(response)
+        except Exception as e:
+            logger.warning(f"Counting the tokens of a {model} response failed with error: {e}")
+            return
+
+        self.metrics.record(model, prompt_tokens, completion_tokens, latency)
+
     #########################################
     # Request Construction Methods          #
     #########################################
@@ -232,10 +487,16 @@ class SQLPredict:
         message = self._openai_sql_request_structure(user_context, user_question, system_context)
 
         try: 
-            request = self.openai.ChatCompletion.create(
-                model=model, 
-                messages=message,
-            )
+            request = OpenAIObject.construct_from(self._cached_request(
+                "openai", 
+                model, 
+                message, 
+                self._metered(
+                    model,
+                    lambda: self.openai.ChatCompletion.create(model=model, messages=message).to_dict_recursive(),
+                    lambda response: SQLPredict._openai_usage(response, message),
+                ),
+            ))
         except Exception as e:
             logger.warning(f"OpenAI request failed with error: {e}")
             raise e    
@@ -256,6 +517,8 @@ class SQLPredict:
         :return: The constructed SQL request.
         :rtype: OpenAIObject
         """
+        inference = None
+
         try:
             context = dataset['context']
             question = dataset['question']
@@ -269,24 +532,84 @@ class SQLPredict:
         self, 
         prompt: str,
         model_name: str,
+        stream: bool = False,
+        stop: Optional[EarlyStop] = None,
     ) -> str:
         """Constructs a prompt to request a SQL query from Replicate's API.
 
         :param prompt: The prompt to use for the request.
         :type prompt: str
+        :param model_name: The name of the Replicate model.
+        :type model_name: str
+        :param stream: Whether to inspect the output as it is generated and cancel the prediction once the stop condition is reached, defaults to False
+        :type stream: bool, optional
+        :param stop: The stop condition of a streamed request, defaults to None (i.e., a stop sequence or a complete SQL statement)
+        :type stop: Optional[EarlyStop], optional
         :return: The constructed SQL request.
         :rtype: str
         """
         
         try: 
-            request = self.rc.run(
-                self.replicate_models[model_name],
-                input={"prompt": prompt},
+            model_id = self.replicate_models[model_name]
+
+            def usage(text):
+                return count_tokens(prompt), count_tokens(text)
+
+            if stream:
+                stop = stop or EarlyStop()
+                return self._cached_request(
+                    "replicate", 
+                    model_id, 
+                    {"prompt": prompt}, 
+                    self._metered(model_name, lambda: self._replicate_stream(model_id, prompt, stop), usage),
+                    params=stop.key(),
+                )
+            return self._cached_request(
+                "replicate", 
+                model_id, 
+                {"prompt": prompt}, 
+                self._metered(
+                    model_name,
+                    lambda: ''.join(item for item in self.rc.run(model_id, input={"prompt": prompt})),
+                    usage,
+                ),
             )
-            return ''.join(item for item in request)
         except Exception as e:
             logger.warning(f"Replicate request failed with error: {e}")
             raise e    
+
+    def _replicate_stream(
+        self, 
+        model_id: str,
+        prompt: str,
+        stop: EarlyStop,
+    ) -> str:
+        """Creates a Replicate prediction and consumes its output as it is generated, cancelling the prediction once the stop condition is reached so that it is no longer billed.
+
+        :param model_id: The ID of the Replicate model, in the format owner/name:version.
+        :type model_id: str
+        :param prompt: The prompt to use for the request.
+        :type prompt: str
+        :param stop: The stop condition.
+        :type stop: EarlyStop
+        :return: The output generated until the stop condition was reached.
+        :rtype: str
+        """
+
+        model, version = model_id.split(":", 1)
+        version = self.rc.models.get(model).versions.get(version)
+        prediction = self.rc.predictions.create(version=version, input={"prompt": prompt})
+
+        output = prediction.output_iterator()
+        text, stopped = consume_stream(output, stop)
+
+        if stopped:
+            try:
+                prediction.cancel()
+            except Exception as e:
+                logger.warning(f"Cancelling Replicate prediction {prediction.id} failed with error: {e}")
+
+        return text
         
     def replicate_dataset_request(
         self, 
@@ -294,27 +617,31 @@ class SQLPredict:
         model_name: Optional[str] = "llama_2_13b_sql",
         column_name: Optional[str] = "replicate_inference",
         prompt_type: Optional[str] = "tuning_format",
+        stream: bool = False,
     ):
         """Constructs a prompt and requests a SQL query from Replicate's API.
 
         :param dataset: The dataset item to request.
         :type dataset: Dataset
+        :param stream: Whether to stop the prediction once it contains a stop sequence or a complete SQL statement, see replicate_sql_request(), defaults to False
+        :type stream: bool, optional
         :return: The constructed SQL request.
         :rtype: str
         """
 
         if prompt_type == "tuning_format":
-            prompt = json.loads(dataset['tuning_format'])['prompt']
+            prompt = load_tuning_format(dataset['tuning_format'])['prompt']
         if prompt_type == "basic_text_generation":
             prompt = self.basic_text_generation_prompt(dataset['context'], dataset['question'])
         
         # assumes the prompt is in the dataset, contained within 'tuning_format'
         try:
             # prompt = json.loads(dataset['tuning_format'])['prompt']
-            inference = self.replicate_sql_request(prompt, model_name=model_name)
+            inference = self.replicate_sql_request(prompt, model_name=model_name, stream=stream)
             return {column_name: inference}
         except Exception as e:
             logger.warning(f"Replicate request failed with error: {e}")
+            return {column_name: None}
 
     def basic_text_generation_prompt(
         self, 
@@ -363,12 +690,23 @@ class SQLPredict:
         prompt = self.basic_text_generation_prompt(context, question)
         
         try: 
-            response = requests.post(
-                self.model_endpoints[model_name], 
-                headers=headers,
-                json={"inputs": prompt},
+            endpoint = self.model_endpoints[model_name]
+
+            def call():
+                response = self.sessions.post(endpoint, headers=headers, json={"inputs": prompt})
+                response.raise_for_status()
+                return response.json()
+
+            return self._cached_request(
+                "http", 
+                endpoint, 
+                {"inputs": prompt}, 
+                self._metered(
+                    model_name,
+                    call,
+                    lambda output: (count_tokens(prompt), count_tokens(SQLPredict._generated_text(prompt, output))),
+                ),
             )
-            return response.json()
         except Exception as e:
             logger.warning(f"Basic text generation request failed with error: {e}")
             raise e
@@ -391,4 +729,531 @@ class SQLPredict:
             inference = self.basic_text_generation_request(context, question, model_name, api_key)
             return {response_column_name: inference}
         except Exception as e:
-            logger.warning(f"Basic text generation request failed with error: {e}")
\ No newline at end of file
+            logger.warning(f"Basic text generation request failed with error: {e}")
+
+    #########################################
+    # Concurrent Request Methods            #
+    #########################################
+
+    async def async_openai_sql_request(
+        self, 
+        user_context: str,
+        user_question: str,
+        model: Optional[str] = "gpt-3.5-turbo",
+        system_context: Optional[str] = None,
+    ) -> OpenAIObject:
+        """Asynchronous version of openai_sql_request()
+
+        :param user_context: The context of the SQL query.
+        :type user_context: str
+        :param user_question: The question of the SQL query.
+        :type user_question: str
+        :param model: The model to use for the request, defaults to "gpt-3.5-turbo"
+        :type model: Optional[str], optional
+        :param system_context: The context of the SQL query, None results in class default
+        :type system_context: Optional[str], optional
+        :return: The constructed SQL request.
+        :rtype: OpenAIObject
+        """
+
+        message = self._openai_sql_request_structure(user_context, user_question, system_context)
+
+        async def call():
+            response = await self.openai.ChatCompletion.acreate(model=model, messages=message)
+            return response.to_dict_recursive()
+
+        call = self._async_metered(model, call, lambda response: SQLPredict._openai_usage(response, message))
+
+        return OpenAIObject.construct_from(
+            await self._async_cached_request("openai", model, message, call)
+        )
+
+    async def async_replicate_sql_request(
+        self, 
+        prompt: str,
+        model_name: str,
+        executor: Optional[concurrent.futures.Executor] = None,
+        stream: bool = False,
+    ) -> str:
+        """Asynchronous version of replicate_sql_request(), running the blocking Replicate client within an executor
+
+        :param prompt: The prompt to use for the request.
+        :type prompt: str
+        :param model_name: The name of the Replicate model.
+        :type model_name: str
+        :param executor: The executor to run the request in, defaults to None (i.e., the default executor of the event loop)
+        :type executor: Optional[concurrent.futures.Executor], optional
+        :param stream: Whether to stop the prediction once it contains a stop sequence or a complete SQL statement, defaults to False
+        :type stream: bool, optional
+        :return: The constructed SQL request.
+        :rtype: str
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.replicate_sql_request, prompt, model_name, stream)
+
+    async def async_basic_text_generation_request(
+        self, 
+        context: str,
+        question: str,
+        model_name: str,
+        session: aiohttp.ClientSession,
+        api_key: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        batcher: Optional[MicroBatcher] = None,
+    ) -> Any:
+        """Asynchronous version of basic_text_generation_request()
+
+        :param context: The context of the SQL query.
+        :type context: str
+        :param question: The question of the SQL query.
+        :type question: str
+        :param model_name: The name of the model.
+        :type model_name: str
+        :param session: The session to send the request with.
+        :type session: aiohttp.ClientSession
+        :param api_key: The API key to use for the request, defaults to None. Defaults to class default.
+        :type api_key: Optional[str], optional
+        :param headers: The headers to use for the request, defaults to None. Defaults to class default.
+        :type headers: Optional[Dict[str, str]], optional
+        :param batcher: The micro batcher to send the prompt within a batch of prompts with, defaults to None (i.e., a request of its own)
+        :type batcher: Optional[MicroBatcher], optional
+        :return: The response of the endpoint.
+        :rtype: Any
+        """
+
+        if api_key is None:
+            api_key = self.hf_key
+
+        if headers is None:
+            headers = {"Authorization": api_key} if api_key is not None else {}
+
+        prompt = self.basic_text_generation_prompt(context, question)
+
+        endpoint = self.model_endpoints[model_name]
+
+        async def call():
+            if batcher is not None:
+                return await batcher.submit(prompt)
+            async with session.post(endpoint, headers=headers, json={"inputs": prompt}) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+        call = self._async_metered(
+            model_name, call, lambda output: (count_tokens(prompt), count_tokens(SQLPredict._generated_text(prompt, output)))
+        )
+
+        return await self._async_cached_request("http", endpoint, {"inputs": prompt}, call)
+
+    async def async_basic_text_generation_batch_request(
+        self, 
+        prompts: List[str],
+        model_name: str,
+        session: aiohttp.ClientSession,
+        api_key: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> List[Any]:
+        """Requests a batch of prompts from a model endpoint accepting a list of inputs (e.g. TGI or the Hugging Face inference API) in a single request.
+
+        :param prompts: The prompts to request.
+        :type prompts: List[str]
+        :param model_name: The name of the model.
+        :type model_name: str
+        :param session: The session to send the request with.
+        :type session: aiohttp.ClientSession
+        :param api_key: The API key to use for the request, defaults to None. Defaults to class default.
+        :type api_key: Optional[str], optional
+        :param headers: The headers to use for the request, defaults to None. Defaults to class default.
+        :type headers: Optional[Dict[str, str]], optional
+        :return: The response of each prompt, shaped as the response of a single prompt request.
+        :rtype: List[Any]
+        """
+
+        if api_key is None:
+            api_key = self.hf_key
+
+        if headers is None:
+            headers = {"Authorization": api_key} if api_key is not None else {}
+
+        async with session.post(
+            self.model_endpoints[model_name], headers=headers, json={"inputs": prompts}
+        ) as response:
+            response.raise_for_status()
+            outputs = await response.json(content_type=None)
+
+        if not isinstance(outputs, list) or len(outputs) != len(prompts):
+            raise ValueError(f"The endpoint returned {outputs!r} for a batch of {len(prompts)} prompts.")
+
+        # A single prompt request returns a list of generations, e.g. [{"generated_text": ...}]
+        return [output if isinstance(output, list) else [output] for output in outputs]
+
+    def _concurrency_limiter(
+        self, 
+        model_name: Optional[str],
+        max_concurrency: int,
+        initial_concurrency: Optional[int] = None,
+    ) -> AdaptiveConcurrency:
+        """Returns the adaptive concurrency limit of a model, kept across dispatches so that the limit learned for the model carries over
+
+        :param model_name: The name of the model.
+        :type model_name: Optional[str]
+        :param max_concurrency: The maximum number of requests in flight at once.
+        :type max_concurrency: int
+        :param initial_concurrency: The initial limit of a model without a limit yet, defaults to None (i.e., a quarter of max_concurrency)
+        :type initial_concurrency: Optional[int], optional
+        :return: The adaptive concurrency limit of the model.
+        :rtype: AdaptiveConcurrency
+        """
+
+        if initial_concurrency is None:
+            initial_concurrency = max(1, max_concurrency // 4)
+
+        if model_name not in self.concurrency_limiters:
+            self.concurrency_limiters[model_name] = AdaptiveConcurrency(
+                initial=initial_concurrency, maximum=max_concurrency
+            )
+
+        limiter = self.concurrency_limiters[model_name]
+        limiter.maximum = max_concurrency
+        limiter.limit = min(limiter.limit, float(max_concurrency))
+        return limiter
+
+    def _dispatch_dataset(
+        self, 
+        dataset: Dataset,
+        column_name: str,
+        request: Callable[[Dict[str, Any], aiohttp.ClientSession], Awaitable[Any]],
+        max_concurrency: int = 16,
+        model_name: Optional[str] = None,
+        estimate: Optional[Callable[[Dict[str, Any]], int]] = None,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+        adaptive: bool = True,
+        job_directory: Optional[str] = None,
+        initial_concurrency: Optional[int] = None,
+    ) -> Dataset:
+        """Sends a request for every row of a dataset concurrently and writes the results into a column, in the order of the rows
+
+        With a job_directory, every completed result is appended to the shard log of an InferenceJob as soon as it arrives. Rerunning the dispatch with the same directory after a crash or interruption only requests the rows without a result, then merges the results of every run into the column.
+
+        :param dataset: The dataset to request.
+        :type dataset: Dataset
+        :param column_name: The column to write the results to, replaced if it exists. Failed requests result in None.
+        :type column_name: str
+        :param request: The coroutine function sending the request of a row with a shared HTTP session.
+        :type request: Callable[[dict, aiohttp.ClientSession], Awaitable]
+        :param max_concurrency: The maximum number of requests in flight at once, defaults to 16
+        :type max_concurrency: int, optional
+        :param model_name: The model the requests are sent to, whose rate limit (see set_rate_limit()) and adaptive concurrency apply, defaults to None
+        :type model_name: Optional[str], optional
+        :param estimate: A function estimating the tokens of the request of a row, defaults to None
+        :type estimate: Optional[Callable[[dict], int]], optional
+        :param usage: A function returning the actual tokens of a result, defaults to None
+        :type usage: Optional[Callable[[Any], Optional[int]]], optional
+        :param adaptive: Whether to adapt the number of requests in flight to throttling by the provider, up to max_concurrency, defaults to True
+        :type adaptive: bool, optional
+        :param job_directory: The directory of the shard log checkpointing the results, defaults to None (i.e., results are only kept in memory)
+        :type job_directory: Optional[str], optional
+        :param initial_concurrency: The initial adaptive limit of a model without a limit yet, defaults to None (i.e., a quarter of max_concurrency)
+        :type initial_concurrency: Optional[int], optional
+        :return: The dataset with the results.
+        :rtype: Dataset
+        """
+
+        def to_dict(result):
+            return result.to_dict_recursive() if isinstance(result, OpenAIObject) else result
+
+        job = None
+        rows = dataset
+        if job_directory is not None:
+            # Row ids are the positions of the rows, so a job must be resumed with the same dataset
+            job = InferenceJob(job_directory, fingerprint=dataset._fingerprint)
+            pending = job.pending(len(dataset))
+            rows = dataset.select(pending)
+            logger.info(f"Requesting {len(pending)} of {len(dataset)} rows, the others were completed by a previous run.")
+
+        dispatcher = AsyncDispatcher(
+            max_concurrency=max_concurrency,
+            rate_limiter=self.rate_limiters.get(model_name),
+            concurrency=self._concurrency_limiter(model_name, max_concurrency, initial_concurrency) if adaptive else None,
+        )
+
+        async def dispatch():
+            async with self.sessions.async_session() as session:
+                # OpenAI requests share the pooled session of the dispatch
+                self.openai.aiosession.set(session)
+                return await dispatcher.dispatch(
+                    ((lambda row=row: request(row, session)) for row in rows),
+                    tokens=(estimate(row) for row in rows) if estimate is not None else None,
+                    usage=usage,
+                    on_result=(lambda index, result: job.record(pending[index], to_dict(result))) if job is not None else None,
+                )
+
+        try:
+            results = [to_dict(result) for result in run_coroutine(dispatch())]
+        finally:
+            if job is not None:
+                job.close()
+
+        self.dispatch_stats = dispatcher.stats
+        logger.info(f"Dispatched {len(results)} requests: {dispatcher.stats.summary()}")
+
+        if job is not None:
+            results = job.merge(len(dataset))
+
+        if column_name in dataset.column_names:
+            dataset = dataset.remove_columns(column_name)
+
+        return dataset.add_column(column_name, results)
+
+    def openai_dataset_dispatch(
+        self, 
+        dataset: Dataset,
+        column_name: Optional[str] = "openai_inference",
+        model: Optional[str] = "gpt-3.5-turbo",
+        max_concurrency: int = 16,
+        job_directory: Optional[str] = None,
+    ) -> Dataset:
+        """Concurrent version of openai_dataset_request(), requesting a SQL query from OpenAI's API for every row of a dataset with up to max_concurrency requests in flight
+
+        :param dataset: The dataset to request.
+        :type dataset: Dataset
+        :param column_name: The column to write the responses to, defaults to "openai_inference"
+        :type column_name: Optional[str], optional
+        :param model: The model to use for the requests, defaults to "gpt-3.5-turbo"
+        :type model: Optional[str], optional
+        :param max_concurrency: The maximum number of requests in flight at once, defaults to 16
+        :type max_concurrency: int, optional
+        :param job_directory: The directory checkpointing the responses, so that an interrupted dispatch resumes where it stopped, defaults to None
+        :type job_directory: Optional[str], optional
+        :return: The dataset with the responses, None for failed requests.
+        :rtype: Dataset
+        """
+
+        async def request(row, session):
+            return await self.async_openai_sql_request(
+                user_context=row['context'], user_question=row['question'], model=model
+            )
+
+        def estimate(row):
+            message = self._openai_sql_request_structure(row['context'], row['question'])
+            return sum(estimate_tokens(item["content"]) for item in message) + OPENAI_COMPLETION_TOKENS
+
+        def usage(result):
+            try:
+                return result["usage"]["total_tokens"]
+            except (KeyError, TypeError):
+                return None
+
+        return self._dispatch_dataset(
+            dataset, column_name, request, max_concurrency, model_name=model, estimate=estimate, usage=usage,
+            job_directory=job_directory,
+        )
+
+    def replicate_dataset_dispatch(
+        self, 
+        dataset: Dataset,
+        model_name: Optional[str] = "llama_2_13b_sql",
+        column_name: Optional[str] = "replicate_inference",
+        prompt_type: Optional[str] = "tuning_format",
+        max_concurrency: int = 16,
+        job_directory: Optional[str] = None,
+        stream: bool = False,
+    ) -> Dataset:
+        """Concurrent version of replicate_dataset_request(), requesting a SQL query from Replicate's API for every row of a dataset with up to max_concurrency requests in flight
+
+        :param dataset: The dataset to request.
+        :type dataset: Dataset
+        :param model_name: The name of the Replicate model, defaults to "llama_2_13b_sql"
+        :type model_name: Optional[str], optional
+        :param column_name: The column to write the inferences to, defaults to "replicate_inference"
+        :type column_name: Optional[str], optional
+        :param prompt_type: The prompt to use, either "tuning_format" or "basic_text_generation", defaults to "tuning_format"
+        :type prompt_type: Optional[str], optional
+        :param max_concurrency: The maximum number of requests in flight at once, defaults to 16
+        :type max_concurrency: int, optional
+        :param job_directory: The directory checkpointing the responses, so that an interrupted dispatch resumes where it stopped, defaults to None
+        :type job_directory: Optional[str], optional
+        :param stream: Whether to stop each prediction once it contains a stop sequence or a complete SQL statement, defaults to False
+        :type stream: bool, optional
+        :return: The dataset with the inferences, None for failed requests.
+        :rtype: Dataset
+        """
+
+        # The Replicate client blocks, so every request in flight needs a thread of its own
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+        async def request(row, session):
+            if prompt_type == "basic_text_generation":
+                prompt = self.basic_text_generation_prompt(row['context'], row['question'])
+            else:
+                prompt = load_tuning_format(row['tuning_format'])['prompt']
+            return await self.async_replicate_sql_request(prompt, model_name, executor, stream)
+
+        try:
+            return self._dispatch_dataset(
+                dataset, column_name, request, max_concurrency, model_name=model_name, job_directory=job_directory
+            )
+        finally:
+            executor.shutdown(wait=False)
+
+    def basic_text_generation_dataset_dispatch(
+        self, 
+        dataset: Dataset,
+        model_name: str,
+        response_column_name: str,
+        context_column_name: Optional[str] = "context",
+        question_column_name: Optional[str] = "question",
+        api_key: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        max_concurrency: int = 16,
+        batch_size: Optional[int] = None,
+        max_wait: float = 0.05,
+        job_directory: Optional[str] = None,
+    ) -> Dataset:
+        """Concurrent version of basic_text_generation_dataset_request(), requesting a SQL query from a model endpoint for every row of a dataset with up to max_concurrency requests in flight
+
+        With a batch_size, the prompts of up to batch_size rows are sent within a single request and the outputs scattered back to their rows, for endpoints accepting a list of inputs. Rate limits and the adaptive concurrency then count prompts rather than requests, and the adaptive concurrency starts at its maximum so that the first batches are filled.
+
+        :param dataset: The dataset to request.
+        :type dataset: Dataset
+        :param model_name: The name of the model, see add_model_endpoint().
+        :type model_name: str
+        :param response_column_name: The column to write the responses to.
+        :type response_column_name: str
+        :param context_column_name: The column of the contexts, defaults to "context"
+        :type context_column_name: Optional[str], optional
+        :param question_column_name: The column of the questions, defaults to "question"
+        :type question_column_name: Optional[str], optional
+        :param api_key: The API key to use for the requests, defaults to None. Defaults to class default.
+        :type api_key: Optional[str], optional
+        :param headers: The headers to use for the requests, defaults to None. Defaults to class default.
+        :type headers: Optional[Dict[str, str]], optional
+        :param max_concurrency: The maximum number of requests in flight at once, defaults to 16
+        :type max_concurrency: int, optional
+        :param batch_size: The maximum number of prompts per request, defaults to None (i.e., one prompt per request)
+        :type batch_size: Optional[int], optional
+        :param max_wait: The maximum number of seconds a prompt waits for its batch to fill, defaults to 0.05
+        :type max_wait: float, optional
+        :param job_directory: The directory checkpointing the responses, so that an interrupted dispatch resumes where it stopped, defaults to None
+        :type job_directory: Optional[str], optional
+        :return: The dataset with the responses, None for failed requests.
+        :rtype: Dataset
+        """
+
+        batchers = {}
+
+        async def request(row, session):
+            if batch_size is not None and session not in batchers:
+                batchers[session] = MicroBatcher(
+                    lambda prompts: self.async_basic_text_generation_batch_request(
+                        prompts, model_name, session, api_key, headers
+                    ),
+                    max_batch_size=batch_size,
+                    max_wait=max_wait,
+                )
+            return await self.async_basic_text_generation_request(
+                row[context_column_name], row[question_column_name], model_name, session, api_key, headers,
+                batcher=batchers.get(session),
+            )
+
+        # Every request in flight holds up to batch_size prompts, and batches only fill if every prompt they hold is in flight from the start
+        return self._dispatch_dataset(
+            dataset, response_column_name, request, max_concurrency * (batch_size or 1), model_name=model_name,
+            job_directory=job_directory, initial_concurrency=max_concurrency * batch_size if batch_size is not None else None,
+        )
+
+    #########################################
+    # Batch Request Methods                 #
+    #########################################
+
+    def openai_dataset_batch(
+        self, 
+        dataset: Dataset,
+        column_name: Optional[str] = "openai_inference",
+        model: Optional[str] = "gpt-3.5-turbo",
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None,
+        completion_window: str = "24h",
+        batch_id: Optional[str] = None,
+    ) -> Dataset:
+        """Batch version of openai_dataset_request(), submitting the requests of every row of a dataset to the OpenAI Batch API, waiting for the batch and writing the responses into a column. Batches are processed asynchronously at a lower price and with higher rate limits, which suits non-interactive evaluation runs.
+
+        Requests are ordered by their messages, so that requests sharing a prefix (the system prompt, then the context) are adjacent and benefit from prompt caching. Rows with a response in the response cache are not submitted, and the responses of the batch are cached.
+
+        :param dataset: The dataset to request.
+        :type dataset: Dataset
+        :param column_name: The column to write the responses to, defaults to "openai_inference"
+        :type column_name: Optional[str], optional
+        :param model: The model to use for the requests, defaults to "gpt-3.5-turbo"
+        :type model: Optional[str], optional
+        :param poll_interval: The number of seconds between two polls of the batch, defaults to 30.0
+        :type poll_interval: float, optional
+        :param timeout: The number of seconds to wait for the batch before raising a TimeoutError, defaults to None (i.e., until the batch expires)
+        :type timeout: Optional[float], optional
+        :param completion_window: The time frame within which the batch is processed, defaults to "24h"
+        :type completion_window: str, optional
+        :param batch_id: The id of a batch submitted for the same dataset by a previous, interrupted call, to wait for instead of submitting a new batch, defaults to None
+        :type batch_id: Optional[str], optional
+        :return: The dataset with the responses, None for failed requests.
+        :rtype: Dataset
+        """
+
+        messages = [self._openai_sql_request_structure(row['context'], row['question']) for row in dataset]
+        results = [None] * len(messages)
+        pending = []
+
+        for index, message in enumerate(messages):
+            if self.response_cache is not None:
+                results[index] = self.response_cache.lookup(ResponseCache.key("openai", model, message))
+            if results[index] is None:
+                pending.append(index)
+
+        pending.sort(key=lambda index: json.dumps(messages[index]))
+
+        client = OpenAIBatchClient(
+            self.sessions.session(self.openai.api_base),
+            self.openai.api_key,
+            self.openai.api_base,
+            poll_interval=poll_interval,
+            timeout=timeout,
+        )
+
+        if pending or batch_id is not None:
+            start = time.perf_counter()
+
+            if batch_id is None:
+                lines = batch_request_lines(
+                    (f"row-{index}", {"model": model, "messages": messages[index]}) for index in pending
+                )
+                batch_id = client.submit(lines, completion_window=completion_window)["id"]
+
+            responses = client.results(client.wait(batch_id))
+            latency = time.perf_counter() - start
+            prompt_tokens, completion_tokens, rows = 0, 0, 0
+
+            for custom_id, response in responses.items():
+                index = int(custom_id.split("-", 1)[1])
+                results[index] = response
+                if response is None:
+                    continue
+                if self.response_cache is not None:
+                    self.response_cache.put(
+                        ResponseCache.key("openai", model, messages[index]), response, "openai", model
+                    )
+                try:
+                    tokens = SQLPredict._openai_usage(response, messages[index])
+                except Exception as e:
+                    logger.warning(f"Counting the tokens of a {model} response failed with error: {e}")
+                    continue
+                prompt_tokens, completion_tokens, rows = prompt_tokens + tokens[0], completion_tokens + tokens[1], rows + 1
+
+            # The batch is recorded as a single request answering its rows, as its turnaround is not the latency of any row
+            if rows:
+                self.metrics.record(model, prompt_tokens, completion_tokens, latency, rows=rows)
+
+        logger.info(f"Batched {len(pending)} of {len(messages)} requests, the others were cached.")
+
+        if column_name in dataset.column_names:
+            dataset = dataset.remove_columns(column_name)
+
+        return dataset.add_column(column_name, results)
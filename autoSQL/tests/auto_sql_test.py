@@ -1,6 +1,147 @@
+import io
+import gzip
 import json
+import time
 import pickle
-from autosql.data import SQLData
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from datasets import Dataset, DatasetDict
+from autosql.data import (
+    SQLData, SchemaCache, SQLBackend, SandboxedBackend, SQLiteBackend, SQLExtractor, QueryTimeout, ResourceLimitExceeded, queries_equivalent, mine_literals, prune_context
+)
+from autosql.eval import SQLEval
+from autosql.predict import SQLPredict
+from autosql.predict.helper import ResponseCache, CacheMiss, InferenceJob, EarlyStop, consume_stream, is_throttle_error
+
+
+def sample_dataset():
+    return DatasetDict(
+        {
+            "train": Dataset.from_dict(
+                {
+                    "answer": [
+                        "SELECT COUNT(*) FROM head WHERE age > 56",
+                        'SELECT name FROM station WHERE installation_date LIKE "12/%"',
+                        "SELECT T1.name FROM station AS T1 JOIN status AS T2 ON T1.id = T2.station_id",
+                    ],
+                    "context": [
+                        "CREATE TABLE head (age INTEGER)",
+                        "CREATE TABLE station (name VARCHAR, installation_date VARCHAR)",
+                        "CREATE TABLE station (name VARCHAR, id VARCHAR); CREATE TABLE status (station_id VARCHAR, bikes_available INT); CREATE TABLE station (name VARCHAR, id VARCHAR)",
+                    ],
+                    "question": [
+                        "How many heads of the departments are older than 56 ?",
+                        "What are the names of stations installed in December?",
+                        "What are the names of stations with a status?",
+                    ],
+                }
+            )
+        }
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Echoes the inputs of a text generation request after a short delay"""
+
+    delay = 0.1
+    throttled = 0
+    requests = 0
+    batch_sizes = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StubHandler.requests += 1
+        time.sleep(self.delay)
+        if StubHandler.throttled > 0:
+            StubHandler.throttled -= 1
+            self.send_response(429)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if isinstance(body["inputs"], list):
+            StubHandler.batch_sizes.append(len(body["inputs"]))
+            response = json.dumps([{"generated_text": inputs} for inputs in body["inputs"]]).encode()
+        else:
+            response = json.dumps([{"generated_text": body["inputs"]}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubBatchHandler(BaseHTTPRequestHandler):
+    """Processes OpenAI Batch API requests, completing a batch on its second poll"""
+
+    lines = []
+    polls = 0
+
+    def _respond(self, body, content_type="application/json"):
+        response = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        if self.path.endswith("/files"):
+            StubBatchHandler.lines = [json.loads(line) for line in body.splitlines() if line.startswith('{"custom_id"')]
+            self._respond({"id": "file-input"})
+        else:
+            StubBatchHandler.polls = 0
+            self._respond({"id": "batch-1", "status": "validating"})
+
+    def do_GET(self):
+        if self.path.endswith("/content"):
+            outputs = [
+                {
+                    "custom_id": line["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"content": "SELECT " + line["body"]["messages"][-1]["content"]}}],
+                            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                        },
+                    },
+                }
+                for line in StubBatchHandler.lines
+            ]
+            self._respond("\n".join(json.dumps(output) for output in outputs), "application/jsonl")
+        else:
+            StubBatchHandler.polls += 1
+            status = "completed" if StubBatchHandler.polls > 1 else "in_progress"
+            self._respond({"id": "batch-1", "status": status, "output_file_id": "file-output"})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/generate"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub_openai_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBatchHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
 
 
 class TestSQLData:
@@ -50,6 +191,43 @@ class TestSQLData:
         assert isinstance(filler_data["table_name"][0]["column_var"], str)
         assert isinstance(filler_data["table_name"][0]["column_int"], int)
 
+    def test_bulk_data_generator(self):
+        # Test that bulk generation is reproducible and honours num_records
+        columns = {"table_name": {"column_var": "VARCHAR", "column_int": "INT"}}
+        filler_data = []
+        for _ in range(2):
+            sd = SQLData(seed=42, generation_method="bulk", num_records=50)
+            sd.data_generator.seed_record("key")
+            filler_data.append(sd.data_generator.generate_filler_data(columns))
+        assert filler_data[0] == filler_data[1]
+        assert len(filler_data[0]["table_name"]) == 50
+        assert isinstance(filler_data[0]["table_name"][0]["column_var"], str)
+        assert isinstance(filler_data[0]["table_name"][0]["column_int"], int)
+
+    def test_literal_mining(self):
+        # Test that the literals filtered on by the answers are placed within the filler data
+        sd = SQLData(seed=42, mine_literals=True)
+        sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+        sd.preprocess_data(dataset_name="test_dataset")
+        train = sd.data["test_dataset"]["train"]
+        assert json.loads(train[0]["filler_data"])["head"][0]["age"] == 57
+        assert train[0]["query_result"] != "[(0,)]"
+        assert train[1]["query_result"] != "[]"
+
+        # Test that strict bounds are stepped over whichever side the column is on
+        assert mine_literals("SELECT * FROM head WHERE age > 56") == {"age": [57]}
+        assert mine_literals("SELECT * FROM head WHERE 56 < age") == {"age": [57]}
+        assert mine_literals("SELECT * FROM head WHERE age < 56") == {"age": [55]}
+        assert mine_literals("SELECT * FROM head WHERE 56 > age") == {"age": [55]}
+
+        # Test generation of the remaining sqlglot data types
+        columns = {"t": {"price": "DECIMAL", "flag": "BOOLEAN", "day": "DATE", "blob": "ARRAY"}}
+        record = sd.data_generator.generate_filler_data(columns, num_records=1)["t"][0]
+        assert isinstance(record["price"], float)
+        assert isinstance(record["flag"], bool)
+        assert isinstance(record["day"], str)
+        assert record["blob"] is None
+
     def test_data_transformations(self):
         sd = SQLData()
         dataset = pickle.load(open("test_sql_data.pkl", "rb"))
@@ -232,3 +410,623 @@ class TestSQLData:
         )
         assert test_set == None
         assert sd.data["test_dataset"]["train"].num_rows == 95
+
+    def test_fused_preprocessing(self):
+        sd = SQLData()
+        sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+
+        # Test that a single fused pass matches the function by function passes
+        unfused_set = sd.preprocess_data(
+            dataset_name="test_dataset", populate_data=False, validate_query=False, update_class_dataset=False
+        )
+        fused_set = sd.preprocess_data(
+            dataset_name="test_dataset", populate_data=False, validate_query=False, update_class_dataset=False, fused=True
+        )
+        assert fused_set["train"].to_dict() == unfused_set["train"].to_dict()
+        assert fused_set["train"][1]["answer"] == "SELECT name FROM station WHERE installation_date LIKE '12/%'"
+        assert fused_set["train"][2]["duplicate_create_table"] == True
+
+        # Test that filler data generated within the fused pass is validated within the same pass
+        fused_set = sd.preprocess_data(dataset_name="test_dataset", update_class_dataset=False, fused=True)
+        assert fused_set["train"]["valid_query"] == [True, True, True]
+        assert len(json.loads(fused_set["train"][0]["filler_data"])["head"]) == 5
+
+    def test_batched_transformations(self):
+        sd = SQLData()
+        sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+
+        # Test that the batched functions match the row functions
+        row_set = sd.preprocess_data(
+            dataset_name="test_dataset", populate_data=False, validate_query=False, update_class_dataset=False, batched=False
+        )
+        batched_set = sd.preprocess_data(
+            dataset_name="test_dataset", populate_data=False, validate_query=False, update_class_dataset=False, batch_size=2
+        )
+        assert batched_set["train"].features == row_set["train"].features
+        assert batched_set["train"].to_dict() == row_set["train"].to_dict()
+
+        # Test the batched filters
+        sd.preprocess_data(dataset_name="test_dataset", fused=True)
+        test_set = sd.filter_data(
+            dataset_name="test_dataset",
+            drop_invalid_query=True,
+            drop_duplicate_tables=True,
+            drop_empty_query_result=False,
+            update_class_dataset=False,
+        )
+        assert len(test_set["train"]) == 2
+
+        # Test create_jsonl_object
+        assert sd.create_jsonl_object("test_dataset") == sd.create_jsonl_object("test_dataset", batched=False)
+
+    def test_multiprocess_preprocessing(self):
+        sd = SQLData(seed=42)
+        sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+
+        # Test that seeded filler data is reproducible regardless of the number of processes
+        single_set = sd.preprocess_data(dataset_name="test_dataset", update_class_dataset=False)
+        multi_set = sd.preprocess_data(dataset_name="test_dataset", update_class_dataset=False, num_proc=2)
+        assert multi_set["train"].to_dict() == single_set["train"].to_dict()
+
+        # Test that the data generator survives pickling into a worker process
+        data_generator = pickle.loads(pickle.dumps(sd.data_generator))
+        assert data_generator.seed == 42
+        assert isinstance(data_generator.generate_random_data(data_type="VARCHAR"), str)
+
+        # Test filter_data with multiple processes
+        sd.preprocess_data(dataset_name="test_dataset", num_proc=2)
+        test_set = sd.filter_data(dataset_name="test_dataset", update_class_dataset=False, num_proc=2)
+        assert len(test_set["train"]) == 2
+
+    def test_native_storage_format(self):
+        json_sd = SQLData(seed=42)
+        json_sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+        json_sd.preprocess_data(dataset_name="test_dataset")
+
+        native_sd = SQLData(seed=42, storage_format="native")
+        native_sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+        native_sd.preprocess_data(dataset_name="test_dataset")
+
+        # Test that the native columns are stored as nested arrow columns
+        native_row = native_sd.data["test_dataset"]["train"][0]
+        assert native_row["column_types"] == [
+            {"table_name": "head", "column_names": ["age"], "column_types": ["INT"]}
+        ]
+        assert native_row["filler_data"][0]["columns"][0]["value_type"] == "int"
+
+        # Test that the JSON view of the native dataset matches the JSON dataset
+        json_view = native_sd.convert_storage_format(dataset_name="test_dataset")
+        assert json_view["train"].to_dict() == json_sd.data["test_dataset"]["train"].to_dict()
+        assert native_sd.create_jsonl_object("test_dataset") == json_sd.create_jsonl_object("test_dataset")
+
+        # Test that the columnar transforms match the row functions for repeated contexts and duplicated tables
+        context = ["CREATE TABLE head (age INTEGER)", "CREATE TABLE head (age INTEGER); CREATE TABLE head (age INTEGER)"] * 2
+        dataset = DatasetDict({"train": Dataset.from_dict({"context": context, "question": ["q"] * 4, "answer": ["SELECT age FROM head"] * 4})})
+        results = {}
+        for storage_format, batched in (("json", True), ("json", False), ("native", True)):
+            sd = SQLData(seed=42, storage_format=storage_format)
+            sd.import_data(dataset=dataset, dataset_name="test_dataset")
+            sd.preprocess_data(dataset_name="test_dataset", batched=batched, batch_size=3)
+            if storage_format == "native":
+                sd.data["test_dataset"] = sd.convert_storage_format(dataset_name="test_dataset")
+            results[(storage_format, batched)] = sd.data["test_dataset"]["train"].to_dict()
+        assert results[("json", True)] == results[("json", False)] == results[("native", True)]
+        assert results[("json", True)]["duplicate_create_table"] == [False, True, False, True]
+
+    def test_query_backends(self):
+        # Test that the sqlite backend results match the sqlglot executor results
+        results = {}
+        for backend in ["sqlglot", "sqlite"]:
+            sd = SQLData(seed=42, backend=backend)
+            sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+            sd.preprocess_data(dataset_name="test_dataset")
+            results[backend] = sd.data["test_dataset"]["train"]["query_result"]
+        assert results["sqlite"] == results["sqlglot"]
+
+        # Test an invalid query with the sqlite backend
+        tables = '{"head": [{"age": 57}]}'
+        result = SQLData.validate_query({"filler_data": tables, "answer": "SELECT name FROM head"}, backend="sqlite")
+        assert result["valid_query"] == False
+        result = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head"}, backend="sqlite")
+        assert result == {"query_result": "[(57,)]", "valid_query": True}
+
+        # Test that booleans, divisions and LIKE match the sqlglot executor
+        tables = '{"head": [{"age": 10, "name": "Bob", "temporary": true}, {"age": 3, "name": "al", "temporary": false}]}'
+        for query in ("SELECT temporary FROM head", "SELECT age / 2 FROM head", "SELECT name FROM head WHERE name LIKE 'b%'", "SELECT age FROM head WHERE temporary"):
+            results = [SQLData.validate_query({"filler_data": tables, "answer": query}, backend=backend) for backend in ("sqlglot", "sqlite")]
+            assert results[0] == results[1]
+
+        # Test that boolean expressions match too, without registering a converter for every sqlite3 user of the process
+        for query in ("SELECT NOT temporary FROM head", "SELECT age > 5, age FROM head", "SELECT * FROM head"):
+            results = [SQLData.validate_query({"filler_data": tables, "answer": query}, backend=backend) for backend in ("sqlglot", "sqlite")]
+            assert results[0] == results[1]
+        assert "BOOLEAN" not in sqlite3.converters
+
+        # Test that backends and sessions must implement their abstract methods
+        with pytest.raises(TypeError):
+            SQLBackend()
+
+    def test_shared_table_sets(self):
+        # Test that rows sharing filler data are validated against one table set without leaking modifications
+        tables = '{"head": [{"age": 57}, {"age": 3}]}'
+        batch = {
+            "filler_data": [tables, tables, '{"head": [{"age": 1}]}'],
+            "answer": ["DELETE FROM head", "SELECT COUNT(*) FROM head", "SELECT age FROM head"],
+        }
+        for backend in ["sqlglot", "sqlite"]:
+            result = SQLData.validate_query_batch(batch, backend=backend)
+            assert result["query_result"][1:] == ["[(2,)]", "[(1,)]"]
+            assert result["valid_query"][1:] == [True, True]
+
+    def test_result_fingerprints(self):
+        # Test that fingerprints match across row orders and backends, and that checks compare them
+        tables = '{"head": [{"age": 57}, {"age": 3}]}'
+        ordered = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head ORDER BY age"}, result_format="both")
+        unordered = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head"}, backend="sqlite", result_format="both")
+        assert ordered["query_result"] != unordered["query_result"]
+        # Ordered fingerprints hold the multiset fingerprint, so they still match unordered answers
+        assert ordered["query_result_fingerprint"].startswith(unordered["query_result_fingerprint"] + ":")
+
+        result = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head WHERE age > 100"}, result_format="fingerprint")
+        assert result == {"query_result": "0" * 16, "valid_query": True}
+
+        row = {**unordered, "model_result": ordered["query_result"], "model_result_fingerprint": ordered["query_result_fingerprint"]}
+        assert SQLEval.custom_inference_result_check(row, column_result_label="model_result")["model_correct"]
+
+        # Test that empty results are dropped whatever the size of their fingerprints
+        sd = SQLData(fingerprint_options={"bits": 128})
+        answers = ["SELECT age FROM head WHERE age > 100", "SELECT age FROM head"]
+        results = [
+            SQLData.validate_query({"filler_data": tables, "answer": answer}, result_format="fingerprint", fingerprint_options=sd.fingerprint_options)
+            for answer in answers
+        ]
+        assert results[0]["query_result"] == "0" * 32
+        sd.data["fingerprints"] = DatasetDict({"train": Dataset.from_dict({"answer": answers, "query_result": [result["query_result"] for result in results]})})
+        for batched in (True, False):
+            filtered = sd.filter_data(
+                "fingerprints", drop_invalid_query=False, drop_duplicate_tables=False, drop_empty_query_result=True,
+                update_class_dataset=False, batched=batched,
+            )
+            assert filtered["train"]["answer"] == answers[1:]
+
+    def test_ordered_result_fingerprints(self):
+        # Test that the rows of an answer with an ORDER BY clause must be returned in its order
+        tables = '{"head": [{"age": 57}, {"age": 3}]}'
+        answer = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head ORDER BY age"}, result_format="fingerprint")
+        for inference, correct in (
+            ("SELECT age FROM head ORDER BY age", True),
+            ("SELECT age FROM head ORDER BY age DESC", False),
+            ("SELECT age FROM head", False),
+        ):
+            row = SQLEval.validate_replicate_query({"filler_data": tables, "replicate_inference": inference, **answer}, result_format="fingerprint")
+            assert SQLEval.custom_inference_result_check(row, column_result_label="replicate_result", result_format="fingerprint")["model_correct"] == correct
+
+        # Without ordering, results are compared as a multiset
+        unordered = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head ORDER BY age"}, result_format="fingerprint", fingerprint_options={"ordered": False})
+        row = SQLEval.validate_replicate_query({"filler_data": tables, "replicate_inference": "SELECT age FROM head ORDER BY age DESC", **unordered}, result_format="fingerprint")
+        assert SQLEval.custom_inference_result_check(row, column_result_label="replicate_result", result_format="fingerprint")["model_correct"]
+
+    def test_sql_extraction(self):
+        # Test that the extraction strategies keep the expected candidate and that unparseable candidates are never executed
+        tables = '{"head": [{"age": 57}, {"age": 3}]}'
+        inference = "SELECT MAX(age) FROM head\nSELECT FROM\nSELECT age FROM head WHERE age > 56\n[/INST]"
+        assert SQLExtractor().candidates(inference) == ["SELECT age FROM head WHERE age > 56", "SELECT MAX(age) FROM head"]
+
+        row = {"filler_data": tables, "replicate_inference": inference, "replicate_result": None}
+        for strategy, query in (("first-valid", "SELECT MAX(age) FROM head"), ("last-valid", "SELECT age FROM head WHERE age > 56"), ("longest", "SELECT age FROM head WHERE age > 56")):
+            result = SQLEval.replicate_response_parser(dict(row), extractor=SQLExtractor(strategy=strategy))
+            assert result["replicate_inference"] == query
+            assert result["replicate_valid"]
+
+        batch = {"filler_data": [tables, tables], "replicate_inference": [inference, "no query"], "replicate_result": [None, None]}
+        batch = SQLEval.replicate_response_parser_batch(batch, result_format="both")
+        assert batch["replicate_result"] == ["[(57,)]", None]
+        assert batch["replicate_valid"] == [True, False]
+        assert batch["replicate_result_fingerprint"][1] is None
+
+    def test_ast_match_fast_path(self):
+        # Test that inferences equivalent to the answer are marked correct without executing, and that the method is recorded
+        assert queries_equivalent('select  T1."name" from HEAD as T1 where T1.age>56', "SELECT name FROM head WHERE age > 56")
+        assert not queries_equivalent("SELECT name FROM head WHERE age > 57", "SELECT name FROM head WHERE age > 56")
+
+        dataset = Dataset.from_dict({
+            # The filler data cannot be loaded, so only inferences matched to the answer are valid
+            "filler_data": ["not json", "not json"],
+            "answer": ["SELECT age FROM head WHERE age > 56", "SELECT COUNT(*) FROM head"],
+            "query_result": ["[(57,)]", "[(2,)]"],
+            "model_inference": ["select H.age from head as H where H.age > 56", "SELECT COUNT(age) FROM head"],
+        })
+        dataset, summary = SQLEval.evaluate_models(dataset, {"model": "model_inference"}, answer_label="answer")
+        assert dataset["model_result_method"] == ["ast_match", "execution"]
+        assert dataset["model_correct"] == [True, False]
+        assert summary["ast_matches"] == {"model": 1}
+
+        # Test that inferences matching an invalid answer are executed rather than marked correct
+        tables = '{"head": [{"age": 57}]}'
+        for row in (
+            {"answer": "SELECT name FROM head", "query_result": "ExecuteError", "valid_query": False},
+            {"answer": "SELECT name FROM head", "query_result": "ExecuteError"},
+        ):
+            result = SQLEval.validate_replicate_query(
+                {"filler_data": tables, "replicate_inference": "select NAME from head", **row}, answer_label="answer"
+            )
+            assert result["replicate_result_method"] == "execution"
+            assert not result["replicate_valid"]
+
+    def test_sandboxed_execution(self):
+        # Test that queries exceeding the time or row limit are marked with a status instead of stalling validation
+        tables = json.dumps({"head": [{"age": age} for age in range(300)]})
+        backend = SandboxedBackend("sqlglot", timeout=1.0, max_rows=100)
+        result = SQLData.validate_query({"filler_data": tables, "answer": "SELECT COUNT(*) FROM head"}, backend=backend)
+        assert result == {"query_result": "[(300,)]", "valid_query": True}
+
+        result = SQLData.validate_query({"filler_data": tables, "answer": "SELECT age FROM head"}, backend=backend)
+        assert result == {"query_result": "ResourceLimit", "valid_query": False}
+
+        batch = {
+            "filler_data": [tables, tables],
+            "openai_inference": ["SELECT COUNT(*) FROM head AS a, head AS b, head AS c", "SELECT MAX(age) FROM head"],
+        }
+        batch = SQLEval.validate_queries_batch(
+            batch, query_labels=["openai_inference"], result_labels=["openai_result"], valid_labels=["openai_valid"], backend=backend
+        )
+        assert batch["openai_result"] == ["Timeout", "[(299,)]"]
+        assert batch["openai_valid"] == [False, True]
+
+        # Test that a single worker process serves every session, and is only restarted after it was killed
+        with backend.connect(json.loads(tables)) as first:
+            pid = backend._process.pid
+            with backend.connect({"head": [{"age": 2}]}) as second:
+                assert second.execute("SELECT age FROM head") == [(2,)]
+                assert first.execute("SELECT COUNT(*) FROM head") == [(300,)]
+            assert backend._process.pid == pid
+            with pytest.raises(QueryTimeout):
+                first.execute("SELECT COUNT(*) FROM head AS a, head AS b, head AS c")
+            assert backend._process is None
+            assert first.execute("SELECT COUNT(*) FROM head") == [(300,)]
+            assert backend._process.pid != pid
+        backend.close()
+
+        # Test that connection backends stop fetching rows beyond the row limit
+        with SQLiteBackend().connect(json.loads(tables)) as session:
+            assert len(session.execute("SELECT age FROM head", max_rows=300)) == 300
+            with pytest.raises(ResourceLimitExceeded):
+                session.execute("SELECT a.age FROM head AS a, head AS b, head AS c", max_rows=100)
+
+    def test_model_evaluation(self):
+        # Test that correctness, agreement and the Venn regions of several models are computed in one pass
+        tables = '{"head": [{"age": 57}, {"age": 3}]}'
+        dataset = Dataset.from_dict({
+            "filler_data": [tables] * 3,
+            "query_result": ["[(57,)]", "[(3,)]", "[(2,)]"],
+            "a_inference": ["SELECT age FROM head WHERE age > 56", "SELECT age FROM head WHERE age < 5", "SELECT age FROM missing"],
+            "b_inference": ["SELECT age FROM head WHERE age > 56", "SELECT age FROM head WHERE age > 5", "SELECT COUNT(*) FROM head"],
+        })
+        dataset, summary = SQLEval.evaluate_models(dataset, {"a": "a_inference", "b": "b_inference"}, batch_size=2)
+        assert dataset["a_correct"] == [True, True, False]
+        assert dataset["b_correct"] == [True, False, True]
+        assert dataset["a_b_match"] == [True, False, False]
+        assert summary["rows"] == 3
+        assert summary["validity"] == {"a": 2 / 3, "b": 1.0}
+        assert summary["agreement"] == {"a&b": 1 / 3}
+        assert summary["correct_regions"] == {"a&b": 1, "a": 1, "b": 1}
+        assert summary["valid_regions"] == {"a&b": 2, "b": 1}
+
+    def test_streaming_jsonl_export(self, tmp_path):
+        # Test that the streamed lines match the jsonl object, with and without compression
+        sd = SQLData()
+        sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+        jsonl = sd.create_jsonl_object(dataset_name="test_dataset")
+        assert "\n".join(sd.iter_jsonl("test_dataset", batch_size=2)) == jsonl
+
+        path = str(tmp_path / "train.jsonl.gz")
+        assert sd.write_jsonl("test_dataset", path, batch_size=2) == 3
+        with gzip.open(path, "rt") as f:
+            assert f.read() == jsonl + "\n"
+
+        buffer = io.StringIO()
+        sd.write_jsonl("test_dataset", buffer)
+        assert buffer.getvalue() == jsonl + "\n"
+
+        # Test that a missing dataset raises instead of writing an empty file
+        with pytest.raises(KeyError):
+            sd.write_jsonl("missing_dataset", str(tmp_path / "missing.jsonl"))
+        assert not (tmp_path / "missing.jsonl").exists()
+
+        # Test that the gist upload streams the jsonl object within its request
+        class StubSession:
+            def post(self, url, headers, data, timeout):
+                self.body = json.loads(b"".join(data))
+                return StubResponse()
+
+        class StubResponse:
+            def json(self):
+                return {"files": {"train.jsonl": {"raw_url": "https://example.com/train.jsonl"}}}
+
+        session = StubSession()
+        sd.upload_jsonl_gist("test_dataset", token="test", filename="train.jsonl", session=session, batch_size=2)
+        assert session.body["files"]["train.jsonl"]["content"] == jsonl
+        assert sd.uploaded_gists == "https://example.com/train.jsonl"
+
+    def test_schema_pruning(self):
+        # Test that tables unrelated to the question are pruned while the tables of the answer are kept
+        context = "CREATE TABLE head (age INTEGER, name VARCHAR); CREATE TABLE department (department_id INTEGER, budget_in_billions INTEGER)"
+        dataset = Dataset.from_dict({
+            "context": [context, context],
+            "question": ["What are the names of the heads older than 56?", "What is the budget of every department?"],
+            "answer": ["SELECT name FROM head WHERE age > 56", "SELECT budget_in_billions FROM department"],
+        })
+        sd = SQLData()
+        sd.import_data(dataset=DatasetDict({"train": dataset}), dataset_name="test_dataset")
+        sd.preprocess_data(dataset_name="test_dataset", populate_data=False, validate_query=False)
+        sd.prune_schema(dataset_name="test_dataset")
+        pruned = sd.data["test_dataset"]["train"]
+        assert pruned["context"] == [
+            "CREATE TABLE head (age INTEGER, name VARCHAR)",
+            "CREATE TABLE department (department_id INTEGER, budget_in_billions INTEGER)",
+        ]
+        assert pruned["original_context"] == [context, context]
+
+        report = SQLEval.schema_pruning_report(pruned)
+        assert report["token_savings"] > 0 and report["complete_rate"] == 1.0
+
+        # Column pruning misses the age column, which the recall reveals
+        sd.prune_schema(dataset_name="test_dataset", prune_columns=True)
+        report = SQLEval.schema_pruning_report(sd.data["test_dataset"]["train"])
+        assert report["complete_rate"] == 0.5
+
+        # Test that pruned columns are cut out of the original text, keeping the type names and quoting of the other columns
+        context = 'CREATE TABLE head (age INTEGER, "Name" VARCHAR(20), price DECIMAL(10, 2), head_id INTEGER); CREATE TABLE department (department_id INTEGER)'
+        column_types = {"head": {"age": "INT", "Name": "VARCHAR", "price": "DECIMAL", "head_id": "INT"}, "department": {"department_id": "INT"}}
+        assert prune_context(context, "What is the price of every head?", column_types, prune_columns=True) == (
+            "CREATE TABLE head (price DECIMAL(10, 2), head_id INTEGER)"
+        )
+
+    def test_schema_cache(self, tmp_path):
+        sd = SQLData(schema_cache_path=str(tmp_path / "schema_cache.json"))
+        sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+
+        # Test that every unique context is parsed once
+        sd.preprocess_data(dataset_name="test_dataset", populate_data=False, validate_query=False)
+        sd.preprocess_data(dataset_name="test_dataset", populate_data=False, validate_query=False)
+        assert sd.schema_cache.stats()["misses"] == 3
+        assert sd.schema_cache.stats()["hits"] == 3
+
+        # Test that a repeat run loads the persisted cache
+        sd = SQLData(schema_cache_path=str(tmp_path / "schema_cache.json"))
+        assert len(sd.schema_cache) == 3
+
+        # Test that the contexts parsed by the processes of a parallel map are merged and persisted
+        for batched in (True, False):
+            path = str(tmp_path / f"parallel_schema_cache_{batched}.json")
+            sd = SQLData(schema_cache_path=path)
+            sd.import_data(dataset=sample_dataset(), dataset_name="test_dataset")
+            sd.preprocess_data(dataset_name="test_dataset", populate_data=False, validate_query=False, batched=batched, num_proc=2)
+            assert len(sd.schema_cache) == 3
+            assert len(SQLData(schema_cache_path=path).schema_cache) == 3
+
+        # Test least recently used eviction
+        schema_cache = SchemaCache(maxsize=2)
+        schema_cache.put("a", {"a": {}})
+        schema_cache.put("b", {"b": {}})
+        schema_cache.get("a")
+        schema_cache.put("c", {"c": {}})
+        assert schema_cache.get("b") is None
+        assert schema_cache.get("a") == {"a": {}}
+
+
+class TestSQLPredict:
+    def test_concurrent_dispatch(self, stub_endpoint):
+        # Test that requests run concurrently against a stub endpoint and results keep the order of the rows
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test")
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        dataset = Dataset.from_dict(
+            {"context": [f"context {i}" for i in range(20)], "question": [f"question {i}" for i in range(20)]}
+        )
+
+        dataset = sp.basic_text_generation_dataset_dispatch(
+            dataset, model_name="stub", response_column_name="inference", max_concurrency=10
+        )
+        for i, row in enumerate(dataset):
+            assert f"context {i} #" in row["inference"][0]["generated_text"]
+
+        stats = sp.dispatch_stats.summary()
+        assert stats["requests"] == 20
+        assert stats["failures"] == 0
+        assert stats["elapsed"] < 20 * StubHandler.delay
+        assert stats["p50_latency"] >= StubHandler.delay
+
+    def test_rate_limits(self, stub_endpoint):
+        # Test that throttled requests are retried and reduce the adaptive concurrency
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test")
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        dataset = Dataset.from_dict({"context": ["context"] * 8, "question": ["question"] * 8})
+        StubHandler.throttled = 2
+
+        dataset = sp.basic_text_generation_dataset_dispatch(
+            dataset, model_name="stub", response_column_name="inference", max_concurrency=8
+        )
+        assert all("context" in row["inference"][0]["generated_text"] for row in dataset)
+        assert sp.dispatch_stats.summary()["retries"] == 2
+        assert sp.concurrency_limiters["stub"].limit < 8
+
+        # Test that a throttled request raises an error recognised as throttling rather than returning the error body
+        StubHandler.throttled = 1
+        with pytest.raises(Exception) as error:
+            sp.basic_text_generation_request("context", "question", "stub")
+        assert is_throttle_error(error.value)
+
+        # Test that the requests per minute budget spaces out requests beyond the burst capacity
+        sp.set_rate_limit("stub", requests_per_minute=240)
+        dataset = sp.basic_text_generation_dataset_dispatch(
+            dataset, model_name="stub", response_column_name="inference", max_concurrency=8
+        )
+        assert sp.dispatch_stats.summary()["elapsed"] >= 0.9
+
+    def test_response_cache(self, stub_endpoint, tmp_path):
+        # Test that repeated requests are served from the cache, across instances of the cache
+        path = str(tmp_path / "responses.sqlite")
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test", response_cache=ResponseCache(path))
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        StubHandler.requests = 0
+        first = sp.basic_text_generation_request("context", "question", "stub")
+        assert sp.basic_text_generation_request("context", "question", "stub") == first
+        assert StubHandler.requests == 1
+
+        # Test the offline and write only modes
+        sp.response_cache = ResponseCache(path, mode="offline")
+        assert sp.basic_text_generation_request("context", "question", "stub") == first
+        with pytest.raises(CacheMiss):
+            sp.basic_text_generation_request("other context", "question", "stub")
+        sp.response_cache = ResponseCache(path, mode="write_only", max_entries=1)
+        sp.basic_text_generation_request("other context", "question", "stub")
+        assert StubHandler.requests == 2
+        assert len(sp.response_cache) == 1
+
+        # Test that throttled responses are not cached, so that the request is sent again
+        sp.response_cache = ResponseCache(path)
+        StubHandler.throttled = 1
+        with pytest.raises(Exception):
+            sp.basic_text_generation_request("throttled context", "question", "stub")
+        assert "throttled context" in sp.basic_text_generation_request("throttled context", "question", "stub")[0]["generated_text"]
+        assert StubHandler.requests == 4
+
+    def test_pooled_sessions(self, stub_endpoint):
+        # Test that requests to an endpoint reuse one pooled session
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test", pool_size=4, timeout=5)
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        for _ in range(3):
+            sp.basic_text_generation_request("context", "question", "stub")
+        assert sp.sessions.session(stub_endpoint) is sp.sessions.sessions[stub_endpoint.rsplit("/", 1)[0]]
+        sp.close()
+        assert sp.sessions.sessions == {}
+
+    def test_openai_session_ownership(self):
+        # Test that instances neither replace nor clear the openai session installed by another instance
+        import openai
+        previous = openai.requestssession
+        openai.requestssession = None
+        try:
+            first = SQLPredict(openai_api_key="test", replicate_api_key="test")
+            installed = openai.requestssession
+            assert installed is not None
+            second = SQLPredict(openai_api_key="test", replicate_api_key="test")
+            assert openai.requestssession is installed
+            second.close()
+            assert openai.requestssession is installed
+            first.close()
+            assert openai.requestssession is None
+        finally:
+            openai.requestssession = previous
+
+    def test_micro_batched_dispatch(self, stub_endpoint):
+        # Test that prompts are grouped into fewer requests and scattered back to their rows
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test")
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        dataset = Dataset.from_dict(
+            {"context": [f"context {i}" for i in range(16)], "question": [f"question {i}" for i in range(16)]}
+        )
+        StubHandler.requests = 0
+        StubHandler.batch_sizes = []
+
+        dataset = sp.basic_text_generation_dataset_dispatch(
+            dataset, model_name="stub", response_column_name="inference", max_concurrency=2, batch_size=8
+        )
+        for i, row in enumerate(dataset):
+            assert f"context {i} #" in row["inference"][0]["generated_text"]
+        # Every prompt is in flight from the start, so the batches are full
+        assert StubHandler.requests == 2
+        assert StubHandler.batch_sizes == [8, 8]
+
+    def test_resumable_dispatch(self, stub_endpoint, tmp_path):
+        # Test that a job resumes from its shard log without re-issuing completed requests
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test")
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        dataset = Dataset.from_dict(
+            {"context": [f"context {i}" for i in range(8)], "question": [f"question {i}" for i in range(8)]}
+        )
+        # Simulate a run interrupted after half of the rows
+        job = InferenceJob(str(tmp_path / "job"), fingerprint=dataset._fingerprint)
+        for i in range(4):
+            job.record(i, [{"generated_text": f"checkpointed {i}"}])
+        job.close()
+        StubHandler.requests = 0
+
+        dataset = sp.basic_text_generation_dataset_dispatch(
+            dataset, model_name="stub", response_column_name="inference", job_directory=str(tmp_path / "job")
+        )
+        assert StubHandler.requests == 4
+        for i, row in enumerate(dataset):
+            expected = f"checkpointed {i}" if i < 4 else f"context {i} #"
+            assert expected in row["inference"][0]["generated_text"]
+
+        # A completed job sends no requests at all
+        sp.basic_text_generation_dataset_dispatch(
+            dataset, model_name="stub", response_column_name="inference", job_directory=str(tmp_path / "job")
+        )
+        assert StubHandler.requests == 4
+
+    def test_streaming_early_stop(self):
+        # Test that a stream is stopped once it contains a complete SQL statement or a stop sequence
+        consumed = []
+
+        def tokens(text):
+            for token in text.split(" "):
+                consumed.append(token)
+                yield token + " "
+
+        text, stopped = consume_stream(tokens("SELECT name FROM head WHERE age > 56 \n [INST] and more rambling"), EarlyStop())
+        assert stopped and text.startswith("SELECT name FROM head WHERE age > 56")
+        assert "rambling" not in consumed
+
+        text, stopped = consume_stream(tokens("I do not know [/INST] SELECT"), EarlyStop(stop_on_statement=False))
+        assert stopped and text.endswith("[/INST] ")
+
+        text, stopped = consume_stream(tokens("no statement here"), EarlyStop())
+        assert not stopped and text == "no statement here "
+
+    def test_request_metrics(self, stub_endpoint):
+        # Test that requests record their tokens and latency, and that costs follow Prompts.rates
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test")
+        sp.add_model_endpoint(model_name="stub", model_endpoint=stub_endpoint)
+        dataset = Dataset.from_dict(
+            {"context": [f"context {i}" for i in range(8)], "question": [f"question {i}" for i in range(8)]}
+        )
+
+        sp.basic_text_generation_dataset_dispatch(dataset, model_name="stub", response_column_name="inference")
+        summary = sp.metrics.summary()["stub"]
+        assert summary["requests"] == 8 and summary["rows"] == 8
+        assert summary["prompt_tokens"] > 0 and summary["completion_tokens"] > 0
+        assert 0 < summary["p50_latency"] <= summary["p95_latency"] <= summary["p99_latency"]
+        assert summary["cost"] is None
+
+        sp.metrics.record("gpt-3.5-turbo", prompt_tokens=1000, completion_tokens=1000, latency=0.5)
+        summary = sp.metrics.summary("gpt-3.5-turbo")["gpt-3.5-turbo"]
+        assert summary["cost"] == pytest.approx(0.043)
+        assert summary["cost_per_1k_rows"] == pytest.approx(43.0)
+
+    def test_openai_batch(self, stub_openai_api):
+        # Test that a batch is submitted with shared prefixes adjacent and its responses mapped back to the rows
+        sp = SQLPredict(openai_api_key="test", replicate_api_key="test", response_cache=ResponseCache(":memory:"))
+        api_base, sp.openai.api_base = sp.openai.api_base, stub_openai_api
+        dataset = Dataset.from_dict(
+            {"context": ["context b", "context a", "context b"], "question": ["question 0", "question 1", "question 2"]}
+        )
+        try:
+            dataset = sp.openai_dataset_batch(dataset, poll_interval=0.01)
+        finally:
+            sp.openai.api_base = api_base
+
+        assert [line["custom_id"] for line in StubBatchHandler.lines] == ["row-1", "row-0", "row-2"]
+        for i, row in enumerate(dataset):
+            assert row["openai_inference"]["choices"][0]["message"]["content"].endswith(f"question {i}")
+        assert StubBatchHandler.polls == 2
+        summary = sp.metrics.summary()["gpt-3.5-turbo"]
+        assert summary["prompt_tokens"] == 30
+        # The batch is recorded as a single request answering every row
+        assert (summary["requests"], summary["rows"]) == (1, 3)
+
+        # Cached responses are not submitted again
+        StubBatchHandler.lines = []
+        sp.openai_dataset_batch(dataset.remove_columns("openai_inference"))
+        assert StubBatchHandler.lines == []